@@ -4,25 +4,35 @@ import asyncio
 import fcntl
 import hashlib
 import importlib.metadata
-import json
 import logging
 import os
+import re
 import shutil
 import signal
 import sys
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 import click
 
+from ship.cache import ResponseCache, project_scope
 from ship.claude_code import ClaudeCodeClient, ClaudeError
 from ship.config import Config
-from ship.display import display
+from ship.display import display, progress_log_path, set_log_path
 from ship.judge import Judge
+from ship.metrics import MetricsExporter, metrics
 from ship.planner import Planner
+from ship.precheck import PreCheck
+from ship.scheduler import TaskQueue
+from ship.slots import HostSlots
 from ship.state import StateManager
-from ship.types_ import Task, TaskStatus
+from ship.status import SOCKET_NAME, StatusServer
+from ship.trace import TraceQuery, follow, query, resolve_blobs, tracer
+from ship.types_ import Task, TaskStatus, Usage
 from ship.validator import Validator
 from ship.worker import Worker
+from ship.worktree import Worktrees
 
 
 VERSION = importlib.metadata.version("ship")
@@ -74,44 +84,73 @@ def discover_spec(context: tuple[str, ...]) -> list[Path]:
     return []
 
 
-def _dump_log(verbose: int) -> None:
-    """print transcript from trace.jl"""
-    trace = Path(".ship/log/trace.jl")
-    if not trace.exists():
-        print("no transcript found (.ship/log/trace.jl)")
-        return
-    for line in trace.read_text().splitlines():
-        if not line.strip():
-            continue
+def _parse_when(text: str) -> str:
+    """'30s'/'10m'/'2h'/'1d' ago or an ISO local time -> trace ts (UTC)"""
+    if not text:
+        return ""
+    m = re.fullmatch(r"(\d+)([smhd])", text.strip())
+    if m:
+        unit = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}
+        when = datetime.now(timezone.utc) - timedelta(
+            **{unit[m.group(2)]: int(m.group(1))}
+        )
+    else:
         try:
-            e = json.loads(line)
-        except json.JSONDecodeError:
-            continue
-        ts = e.get("ts", "?")[11:19]  # HH:MM:SS
-        role = e.get("role", "?")
-        model = e.get("model", "?")
-        ok = e.get("ok", False)
-        plen = e.get("prompt_len", 0)
-        rlen = e.get("response_len", 0)
-        mark = "\033[32m✓\033[0m" if ok else "\033[31m✗\033[0m"
-        print(f"\033[1m═══ [{ts}] {role} ({model}) ═══\033[0m")
-        prompt_text = e.get("prompt", "")
-        response_text = e.get("response", "")
-        if verbose >= 1 and prompt_text:
-            trunc = prompt_text if verbose >= 2 else prompt_text[:200]
-            suffix = "..." if verbose < 2 and len(prompt_text) > 200 else ""
-            print(f"PROMPT ({plen} chars):")
-            print(f"  {trunc}{suffix}")
-        else:
-            print(f"PROMPT ({plen} chars)")
-        if verbose >= 1 and response_text:
-            trunc = response_text if verbose >= 2 else response_text[:200]
-            suffix = "..." if verbose < 2 and len(response_text) > 200 else ""
-            print(f"RESPONSE ({rlen} chars): {mark}")
-            print(f"  {trunc}{suffix}")
-        else:
-            print(f"RESPONSE ({rlen} chars): {mark}")
-        print()
+            when = datetime.fromisoformat(text.strip())
+        except ValueError as e:
+            raise click.BadParameter(f"bad time {text!r}: {e}") from e
+        when = when.astimezone(timezone.utc)
+    return when.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _dump_log(verbose: int, q: TraceQuery, tail: bool = False) -> None:
+    """print transcript entries matching q; tail=True follows a live run"""
+    try:
+        log_dir = Path(Config.load().log_dir)
+    except RuntimeError:
+        log_dir = Path(".ship/log")
+    found = False
+    for e in query(log_dir, q):
+        found = True
+        _print_entry(log_dir, e, verbose)
+    if tail:
+        try:
+            for e in follow(log_dir, q):
+                _print_entry(log_dir, e, verbose)
+        except KeyboardInterrupt:
+            return
+    elif not found:
+        print(f"no matching transcript entries ({log_dir})")
+
+
+def _print_entry(log_dir: Path, e: dict, verbose: int) -> None:
+    if verbose >= 1:
+        resolve_blobs(log_dir, e)
+    ts = e.get("ts", "?")[11:19]  # HH:MM:SS
+    role = e.get("role", "?")
+    model = e.get("model", "?")
+    ok = e.get("ok", False)
+    plen = e.get("prompt_len", 0)
+    rlen = e.get("response_len", 0)
+    mark = "\033[32m✓\033[0m" if ok else "\033[31m✗\033[0m"
+    print(f"\033[1m═══ [{ts}] {role} ({model}) ═══\033[0m")
+    prompt_text = e.get("prompt", "")
+    response_text = e.get("response", "")
+    if verbose >= 1 and prompt_text:
+        trunc = prompt_text if verbose >= 2 else prompt_text[:200]
+        suffix = "..." if verbose < 2 and len(prompt_text) > 200 else ""
+        print(f"PROMPT ({plen} chars):")
+        print(f"  {trunc}{suffix}")
+    else:
+        print(f"PROMPT ({plen} chars)")
+    if verbose >= 1 and response_text:
+        trunc = response_text if verbose >= 2 else response_text[:200]
+        suffix = "..." if verbose < 2 and len(response_text) > 200 else ""
+        print(f"RESPONSE ({rlen} chars): {mark}")
+        print(f"  {trunc}{suffix}")
+    else:
+        print(f"RESPONSE ({rlen} chars): {mark}")
+    print()
 
 
 @click.command(context_settings={"help_option_names": ["-h", "--help"]})
@@ -145,7 +184,61 @@ def _dump_log(verbose: int) -> None:
 @click.option(
     "-x", "--codex", is_flag=True, help="enable codex refiner (off by default)"
 )
+@click.option(
+    "--host-slots",
+    type=int,
+    help="cap concurrent agents across all ship runs on this host",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="disable the planner/validator response cache",
+)
+@click.option("--max-cost", type=float, help="stop dispatching past this USD spend")
+@click.option(
+    "--max-task-cost",
+    type=float,
+    help="stop retrying a task past this USD spend",
+)
+@click.option(
+    "--adaptive",
+    is_flag=True,
+    default=None,
+    help="learn per-task timeout/turns from completed tasks (caps: -t, -m)",
+)
+@click.option(
+    "--isolate",
+    is_flag=True,
+    default=None,
+    help="run each worker in its own git worktree, merge results back",
+)
+@click.option(
+    "--checkpoint",
+    type=click.Choice(["off", "rollback", "keep"]),
+    help="failed attempts: roll back their edits, or keep them (default off)",
+)
+@click.option(
+    "--speculative-replan",
+    type=float,
+    help="start the replanner once this share of tasks is done (e.g. 0.8)",
+)
+@click.option(
+    "--check-cmd",
+    default=None,
+    help="shell command (build/lint/tests) run after each task; settles its verdict",
+)
 @click.option("-l", "--log", "show_log", is_flag=True, help="dump transcript and exit")
+@click.option("--role", "log_roles", multiple=True, help="-l: only this role (prefix)")
+@click.option("--since", "log_since", default="", help="-l: from time (10m, 2h, ISO)")
+@click.option("--until", "log_until", default="", help="-l: up to time (10m, 2h, ISO)")
+@click.option(
+    "--ok/--failed",
+    "log_ok",
+    default=None,
+    help="-l: only successful / failed calls",
+)
+@click.option("--task", "log_task", default="", help="-l: only this task id (prefix)")
+@click.option("-F", "--follow", "log_follow", is_flag=True, help="-l: tail a live run")
 @click.option(
     "-p",
     "--prompt",
@@ -166,7 +259,22 @@ def run(
     verbose: int,
     quiet: bool,
     codex: bool,
+    host_slots: int | None,
+    no_cache: bool,
+    max_cost: float | None,
+    max_task_cost: float | None,
+    adaptive: bool | None,
+    isolate: bool | None,
+    checkpoint: str | None,
+    speculative_replan: float | None,
+    check_cmd: str | None,
     show_log: bool,
+    log_roles: tuple[str, ...],
+    log_since: str,
+    log_until: str,
+    log_ok: bool | None,
+    log_task: str,
+    log_follow: bool,
     override_prompt: str,
 ) -> None:
     """autonomous coding agent
@@ -176,7 +284,14 @@ def run(
     os.environ.pop("CLAUDECODE", None)
 
     if show_log:
-        _dump_log(verbose)
+        q = TraceQuery(
+            roles=log_roles,
+            since=_parse_when(log_since),
+            until=_parse_when(log_until),
+            ok=log_ok,
+            task=log_task,
+        )
+        _dump_log(verbose, q, tail=log_follow)
         sys.exit(0)
 
     def _sigterm(signum, frame):
@@ -205,6 +320,15 @@ def run(
                 verbosity,
                 codex,
                 override_prompt,
+                host_slots,
+                not no_cache,
+                max_cost,
+                max_task_cost,
+                adaptive,
+                isolate,
+                checkpoint,
+                speculative_replan,
+                check_cmd,
             )
         )
     except KeyboardInterrupt:
@@ -218,8 +342,15 @@ async def _reeval_spec_change(
     old_tasks: list[Task],
     new_spec: str,
     verbosity: int,
+    cache: ResponseCache | None = None,
+    state: StateManager | None = None,
+    model: str = "haiku",
+    escalate_model: str = "sonnet",
 ) -> str:
-    """ask LLM to evaluate spec change: returns 'keep' or 'replan'"""
+    """ask LLM to evaluate spec change: returns 'keep' or 'replan'
+
+    an answer with neither tag is asked again on escalate_model
+    """
     plan_path = data_dir / "PLAN.md"
     old_plan = ""
     try:
@@ -249,15 +380,26 @@ async def _reeval_spec_change(
         print("\n[spec-change re-evaluation prompt]")
         print(prompt[:500] + "..." if len(prompt) > 500 else prompt)
 
-    client = ClaudeCodeClient(model="sonnet", role="replanner")
-    try:
-        result, _ = await client.execute(prompt, timeout=120)
-    except Exception as e:
-        logging.warning(f"spec-change eval failed: {e}, defaulting to replan")
-        return "replan"
-
-    if "<keep" in result:
-        return "keep"
+    models = [model]
+    if escalate_model and escalate_model != model:
+        models.append(escalate_model)
+    for name in models:
+        client = ClaudeCodeClient(model=name, role="reeval", cache=cache)
+        try:
+            result, _ = await client.execute(prompt, timeout=120)
+        except Exception as e:
+            logging.warning(f"spec-change eval failed: {e}, defaulting to replan")
+            return "replan"
+        finally:
+            if state:
+                await state.add_usage("reeval", client.last_usage)
+
+        if "<keep" in result:
+            return "keep"
+        if "<replan" in result:
+            return "replan"
+        client.forget(prompt)
+        logging.info(f"spec-change eval unparseable on {name}")
     return "replan"
 
 
@@ -272,6 +414,15 @@ async def _main(
     verbosity: int,
     use_codex: bool = False,
     override_prompt: str = "",
+    host_slots: int | None = None,
+    use_cache: bool = True,
+    max_cost: float | None = None,
+    max_task_cost: float | None = None,
+    adaptive: bool | None = None,
+    isolate: bool | None = None,
+    checkpoint: str | None = None,
+    speculative_replan: float | None = None,
+    check_cmd: str | None = None,
 ) -> None:
     slug = _spec_slug(context)
     data_dir_arg = f".ship/{slug}" if slug else None
@@ -284,6 +435,15 @@ async def _main(
             verbosity=verbosity,
             use_codex=use_codex,
             data_dir=data_dir_arg,
+            host_slots=host_slots,
+            use_cache=use_cache,
+            max_cost=max_cost,
+            max_task_cost=max_task_cost,
+            adaptive=adaptive,
+            isolate=isolate,
+            checkpoint=checkpoint,
+            speculative_replan=speculative_replan,
+            check_cmd=check_cmd,
         )
     except RuntimeError as e:
         display.error(f"error: {e}")
@@ -292,6 +452,7 @@ async def _main(
     display.verbosity = cfg.verbosity
 
     Path(cfg.log_dir).mkdir(parents=True, exist_ok=True)
+    tracer.configure(cfg.log_dir)
     logging.basicConfig(
         filename=f"{cfg.log_dir}/ship.log",
         level=logging.INFO,
@@ -301,6 +462,16 @@ async def _main(
 
     logging.info("starting ship")
 
+    if cfg.cache_dir:
+        # answers depend on the repo too: key the cache by this tree
+        churn = (cfg.data_dir, cfg.log_dir)
+        cfg = replace(
+            cfg,
+            cache_scope=await project_scope(
+                exclude=tuple(p for p in churn if not Path(p).is_absolute())
+            ),
+        )
+
     data_dir = Path(cfg.data_dir)
 
     # state detection: implicit continuation / spec-change / fresh
@@ -377,7 +548,14 @@ async def _main(
         # re-evaluation path: LLM decides keep vs replan
         _old_tasks = await state.get_all_tasks()
         _decision = await _reeval_spec_change(
-            data_dir, _old_tasks, _new_spec_text, verbosity
+            data_dir,
+            _old_tasks,
+            _new_spec_text,
+            verbosity,
+            cache=ResponseCache.from_config(cfg),
+            state=state,
+            model=cfg.model("reeval"),
+            escalate_model=cfg.escalate_model,
         )
         if _decision == "keep":
             display.event("spec changed: keeping completed tasks, adding new tasks")
@@ -438,6 +616,7 @@ async def _main(
         # skip validation if spec unchanged since last accepted run
         spec_h = _spec_hash(goal_text)
         already_validated = _load_validated_hash(data_dir) == spec_h
+        validation_usage = Usage()
 
         if skip_validation:
             _save_validated_hash(data_dir, spec_h)
@@ -448,7 +627,11 @@ async def _main(
             validation_project_md = ""
         else:
             display.event("\033[36m⟳\033[0m validating spec...")
-            validator = Validator(verbosity=cfg.verbosity)
+            validator = Validator(
+                verbosity=cfg.verbosity,
+                cache=ResponseCache.from_config(cfg),
+                model=cfg.model("validator"),
+            )
             try:
                 validation = await validator.validate(
                     goal_text,
@@ -489,6 +672,7 @@ async def _main(
             _save_validated_hash(data_dir, spec_h)
             display.event("\033[32m✓\033[0m spec ok")
             validation_project_md = validation.project_md
+            validation_usage = validator.claude.last_usage
 
         if check:
             sys.exit(0)
@@ -513,6 +697,7 @@ async def _main(
             spec_hash=spec_h,
             override_prompt=override_prompt,
         )
+        await state.add_usage("validator", validation_usage)
 
         display.event("\033[36m⟳\033[0m planning tasks...")
         planner = Planner(cfg, state)
@@ -525,7 +710,7 @@ async def _main(
         logging.info(f"generated {len(tasks)} tasks")
         display.event(f"\033[32m✓\033[0m generated {len(tasks)} tasks")
 
-    queue: asyncio.Queue[Task] = asyncio.Queue()
+    queue = TaskQueue()
 
     pending = await state.get_pending_tasks()
     for task in pending:
@@ -558,24 +743,82 @@ async def _main(
     display.banner(
         f"ship v{VERSION} | {num_workers} workers"
         f" | {exec_mode} | timeout {cfg.task_timeout}s"
+        + (" adaptive" if cfg.adaptive else "")
     )
     if completed > 0:
         display.event(f"progress: {completed}/{total} tasks completed")
     display.event(f"\033[36m⟳\033[0m starting {num_workers} workers...")
 
+    progress_path = str(Path(cfg.data_dir) / "PROGRESS.md")
+    set_log_path(progress_log_path(progress_path))
+    status = (
+        StatusServer(Path(cfg.data_dir) / SOCKET_NAME) if cfg.status_socket else None
+    )
     judge = Judge(
         state,
         queue,
         project_context=project_context,
         verbosity=cfg.verbosity,
         use_codex=cfg.use_codex,
-        progress_path=str(Path(cfg.data_dir) / "PROGRESS.md"),
+        progress_path=progress_path,
+        max_cost=cfg.max_cost,
+        max_task_cost=cfg.max_task_cost,
+        num_workers=num_workers,
+        speculative_replan=cfg.speculative_replan,
+        models=cfg.role_models(),
+        escalate_model=cfg.escalate_model,
+        status=status,
     )
     spec_label_for_workers = (
         (work.design_file if work else "")
         if _auto_cont
         else (spec_label if spec_files else "")
     )
+    slots = HostSlots(cfg.host_slots) if cfg.host_slots else None
+    if slots:
+        logging.info(f"host slot pool: {cfg.host_slots} at {slots.slot_dir}")
+    worktrees = Worktrees(Path.cwd()) if cfg.isolate else None
+    if worktrees:
+        reason = await worktrees.check()
+        if reason:
+            display.error(f"error: --isolate: {reason}")
+            sys.exit(1)
+        logging.info(f"worktree isolation at {worktrees.root}")
+    precheck = None
+    if cfg.check_cmd:
+        # the data dir changes on every task; keep it out of the tree hash
+        data_rel = Path(cfg.data_dir)
+        precheck = PreCheck(
+            cfg.check_cmd,
+            timeout=cfg.check_timeout,
+            exclude=() if data_rel.is_absolute() else (str(data_rel),),
+        )
+        logging.info(f"check command: {cfg.check_cmd}")
+    # after the startup checks: an early exit leaves no socket behind
+    if status:
+        try:
+            await status.start(judge.status_snapshot)
+        except (RuntimeError, OSError) as e:
+            logging.warning(f"status socket disabled: {e}")
+            status = judge.status = None
+        else:
+            server = status
+            state.on_change = lambda t: server.publish(
+                "task", task_id=t.id, status=t.status.value, task=t.description
+            )
+            logging.info(f"status socket at {status.path}")
+    exporter = None
+    if cfg.metrics_addr or cfg.metrics_file:
+        exporter = MetricsExporter(metrics, cfg.metrics_addr, cfg.metrics_file)
+        try:
+            await exporter.start()
+        except OSError as e:
+            logging.warning(f"metrics exporter disabled: {e}")
+            exporter = None
+        else:
+            if exporter.port:
+                logging.info(f"metrics on port {exporter.port} (GET /metrics)")
+    metrics.workers.set(num_workers)
     worker_list = [
         Worker(
             f"w{i}",
@@ -585,12 +828,16 @@ async def _main(
             override_prompt=effective_override,
             judge=judge,
             spec_files=spec_label_for_workers,
+            slots=slots,
+            worktrees=worktrees,
+            precheck=precheck,
         )
         for i in range(num_workers)
     ]
 
     worker_tasks = [asyncio.create_task(w.run(queue)) for w in worker_list]
     judge_task = asyncio.create_task(judge.run())
+    display.start_render_loop(cfg.render_hz)
 
     all_async = [judge_task, *worker_tasks]
 
@@ -604,6 +851,12 @@ async def _main(
         for t in worker_tasks:
             t.cancel()
         await asyncio.gather(*worker_tasks, return_exceptions=True)
+        if status:
+            await status.stop()
+        if exporter:
+            await exporter.stop()
+        if worktrees:
+            await worktrees.remove_all()
         display.finish()
         display.error("\ninterrupted")
         sys.exit(130)
@@ -612,6 +865,12 @@ async def _main(
         task.cancel()
 
     await asyncio.gather(*worker_tasks, return_exceptions=True)
+    if status:
+        await status.stop()
+    if exporter:
+        await exporter.stop()
+    if worktrees:
+        await worktrees.remove_all()
 
     final_tasks = await state.get_all_tasks()
     completed = sum(1 for t in final_tasks if t.status is TaskStatus.COMPLETED)
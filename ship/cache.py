@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from ship.checkpoint import tree_hash
+
+if TYPE_CHECKING:
+    from ship.config import Config
+
+
+def default_cache_dir() -> Path:
+    """$XDG_CACHE_HOME/ship/responses, else ~/.cache/ship/responses
+
+    lives outside the data dir so `-f` (which wipes it) keeps the cache
+    """
+    base = os.getenv("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "ship" / "responses"
+
+
+async def project_scope(cwd: Path | None = None, exclude: tuple[str, ...] = ()) -> str:
+    """identity of the project an answer was given for
+
+    the resolved cwd plus the working tree hash (untracked files in,
+    `exclude` paths such as the data dir out): agentic roles read the
+    repo, so the same prompt in another repo, or after the tree
+    changed, must miss. outside git only the path counts.
+    """
+    root = str((cwd or Path.cwd()).resolve())
+    tree = await tree_hash(cwd, exclude)
+    return hashlib.sha256(f"{root}\0{tree}".encode()).hexdigest()
+
+
+class ResponseCache:
+    """content-addressed LLM response cache with size-bounded LRU eviction
+
+    one file per entry named by sha256(scope, role, model, prompt), where
+    scope is the project_scope() of the run. a hit bumps the file mtime;
+    once the dir grows past max_bytes the least recently used entries
+    are dropped.
+    """
+
+    def __init__(
+        self, cache_dir: Path, max_bytes: int = 64 * 1024 * 1024, scope: str = ""
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.scope = scope
+
+    @staticmethod
+    def from_config(cfg: Config) -> ResponseCache | None:
+        if not cfg.cache_dir:
+            return None
+        return ResponseCache(
+            Path(cfg.cache_dir), cfg.cache_max_bytes, scope=cfg.cache_scope
+        )
+
+    def key(self, role: str, model: str, prompt: str) -> str:
+        h = hashlib.sha256()
+        for part in (self.scope, role, model, prompt):
+            h.update(part.encode())
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _path(self, role: str, model: str, prompt: str) -> Path:
+        return self.cache_dir / f"{self.key(role, model, prompt)}.json"
+
+    def get(self, role: str, model: str, prompt: str) -> str | None:
+        path = self._path(role, model, prompt)
+        try:
+            entry = json.loads(path.read_text())
+            os.utime(path)
+        except (OSError, json.JSONDecodeError):
+            return None
+        response = entry.get("response")
+        return response if isinstance(response, str) else None
+
+    def put(self, role: str, model: str, prompt: str, response: str) -> None:
+        path = self._path(role, model, prompt)
+        entry = {"role": role, "model": model, "response": response}
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(entry))
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.warning(f"response cache write failed: {e}")
+            return
+        self._evict()
+
+    def delete(self, role: str, model: str, prompt: str) -> None:
+        try:
+            self._path(role, model, prompt).unlink(missing_ok=True)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """drop least recently used entries until under max_bytes"""
+        entries: list[tuple[float, int, Path]] = []
+        total = 0
+        try:
+            for p in self.cache_dir.glob("*.json"):
+                st = p.stat()
+                entries.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+        except OSError:
+            return
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+                total -= size
+            except OSError:
+                pass
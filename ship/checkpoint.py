@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+POLICIES = ("off", "rollback", "keep")
+REF_PREFIX = "refs/ship/checkpoints"
+# ignored files (.env, local config) saved into a checkpoint; bigger or
+# further ones are only listed, which keeps rollback from deleting them
+IGNORED_MAX_BYTES = 1024 * 1024
+IGNORED_MAX_FILES = 200
+
+
+async def _git(
+    *args: str, cwd: Path | None = None, env: dict[str, str] | None = None
+) -> tuple[int, str]:
+    proc = await asyncio.create_subprocess_exec(
+        "git",
+        *args,
+        cwd=cwd,
+        env=env,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    out, _ = await proc.communicate()
+    return proc.returncode or 0, out.decode(errors="replace").strip()
+
+
+def ref_name(task_id: str) -> str:
+    return f"{REF_PREFIX}/{task_id}"
+
+
+async def tree_hash(
+    cwd: Path | None = None,
+    exclude: tuple[str, ...] = (),
+    force: tuple[str, ...] = (),
+) -> str:
+    """git tree sha of the whole working tree, untracked files included
+
+    never touches the real index: a copy of it (keeping its stat cache,
+    so only changed files are hashed) is staged with `add -A` and
+    written as a tree. exclude takes repo-relative paths left out of
+    the tree; force takes ignored files to add anyway. "" outside a
+    git repo.
+    """
+    rc, index = await _git(
+        "rev-parse", "--path-format=absolute", "--git-path", "index", cwd=cwd
+    )
+    if rc != 0:
+        return ""
+    pathspec = [":/", *(f":(exclude){p}" for p in exclude)]
+    with tempfile.TemporaryDirectory(prefix="ship-ckpt-") as tmp:
+        tmp_index = Path(tmp) / "index"
+        if index and Path(index).exists():
+            shutil.copyfile(index, tmp_index)
+        env = {**os.environ, "GIT_INDEX_FILE": str(tmp_index)}
+        if (await _git("add", "-A", "--", *pathspec, cwd=cwd, env=env))[0] != 0:
+            return ""
+        if force and (await _git("add", "-f", "--", *force, cwd=cwd, env=env))[0]:
+            return ""
+        rc, tree = await _git("write-tree", cwd=cwd, env=env)
+    return tree if rc == 0 else ""
+
+
+async def snapshot(task_id: str, cwd: Path | None = None) -> str:
+    """commit the whole working tree (untracked files too) under a shadow ref
+
+    works like `git stash create` but also captures untracked files:
+    tree_hash() on top of HEAD. `add -A` skips ignored files, so small
+    ignored files are force-added too, and every ignored path that
+    exists (ignored dirs collapsed to one `dir/` entry) is listed in the
+    commit body for rollback(). returns the commit sha, or "" outside a
+    git repo or before the first commit.
+    """
+    rc, head = await _git("rev-parse", "--verify", "-q", "HEAD", cwd=cwd)
+    if rc != 0:
+        return ""
+    ignored = await _ignored(cwd)
+    tree = await tree_hash(cwd, force=_small_files(ignored, cwd))
+    if not tree:
+        return ""
+    message = f"ship checkpoint {task_id}"
+    if ignored:
+        message += "\n\n" + "\n".join(ignored)
+    rc, sha = await _git("commit-tree", tree, "-p", head, "-m", message, cwd=cwd)
+    if rc != 0:
+        return ""
+    await _git("update-ref", ref_name(task_id), sha, cwd=cwd)
+    return sha
+
+
+async def _ignored(cwd: Path | None) -> list[str]:
+    """ignored paths that exist, an ignored dir as one `dir/` entry"""
+    rc, out = await _git(
+        "ls-files",
+        "-z",
+        "--others",
+        "--ignored",
+        "--exclude-standard",
+        "--directory",
+        cwd=cwd,
+    )
+    if rc != 0:
+        return []
+    return [p for p in out.split("\0") if p and "\n" not in p]
+
+
+def _small_files(paths: list[str], cwd: Path | None) -> tuple[str, ...]:
+    base = cwd or Path(".")
+    keep = []
+    for p in paths:
+        if p.endswith("/"):
+            continue
+        try:
+            st = (base / p).lstat()
+        except OSError:
+            continue
+        if st.st_size <= IGNORED_MAX_BYTES:
+            keep.append(p)
+        if len(keep) >= IGNORED_MAX_FILES:
+            break
+    return tuple(keep)
+
+
+def _listed(path: str, entries: list[str]) -> bool:
+    return any(path == e or (e.endswith("/") and path.startswith(e)) for e in entries)
+
+
+async def rollback(sha: str, files: list[str], cwd: Path | None = None) -> list[str]:
+    """put files back the way they were at checkpoint sha
+
+    only the given (repo-relative) files are touched, so other workers'
+    edits in the shared tree survive. files in the checkpoint tree are
+    restored; of the rest only those the attempt created are deleted:
+    an ignored path that existed at snapshot time (listed in the commit
+    body) is never removed. returns the paths restored or removed.
+    """
+    paths = [f for f in files if not Path(f).is_absolute()]
+    if not sha or not paths:
+        return []
+    _, listed = await _git("ls-tree", "-r", "--name-only", sha, "--", *paths, cwd=cwd)
+    present = set(listed.splitlines())
+    _, body = await _git("show", "-s", "--format=%b", sha, cwd=cwd)
+    existed = body.splitlines()
+    restore = [f for f in paths if f in present]
+    if restore:
+        rc, _ = await _git(
+            "restore", f"--source={sha}", "--worktree", "--", *restore, cwd=cwd
+        )
+        if rc != 0:
+            restore = []
+    removed = []
+    base = cwd or Path(".")
+    for f in paths:
+        if f in present or _listed(f, existed):
+            continue
+        p = base / f
+        if p.is_file() or p.is_symlink():
+            p.unlink()
+            removed.append(f)
+    return [*restore, *removed]
+
+
+async def drop(task_id: str, cwd: Path | None = None) -> None:
+    await _git("update-ref", "-d", ref_name(task_id), cwd=cwd)
@@ -5,10 +5,42 @@ import json
 import os
 import re
 import signal
+import time
 from collections.abc import Callable
 from datetime import datetime, timezone
 from pathlib import Path
 
+from ship.cache import ResponseCache
+from ship.metrics import metrics
+from ship.trace import tracer
+from ship.types_ import Usage
+
+
+async def kill_process_group(proc: asyncio.subprocess.Process) -> None:
+    """SIGTERM the process group, SIGKILL after 10s"""
+    if proc.returncode is not None:
+        return
+    try:
+        os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
+    except (OSError, ProcessLookupError):
+        return
+    try:
+        await asyncio.wait_for(proc.wait(), timeout=10)
+    except asyncio.TimeoutError:
+        try:
+            os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
+        except (OSError, ProcessLookupError):
+            pass
+
+
+# file-editing tools and the input field naming their target
+EDIT_TOOLS = {
+    "Write": "file_path",
+    "Edit": "file_path",
+    "MultiEdit": "file_path",
+    "NotebookEdit": "notebook_path",
+}
+
 
 class ClaudeError(RuntimeError):
     def __init__(self, msg: str, partial: str = "", session_id: str = ""):
@@ -18,7 +50,12 @@ class ClaudeError(RuntimeError):
 
 
 class ClaudeCodeClient:
-    """claude CLI wrapper; returns (output, session_id)"""
+    """claude CLI wrapper; returns (output, session_id)
+
+    pass a ResponseCache only for roles whose answer depends on the
+    prompt alone (validator, planner, spec re-evaluation); cache hits
+    skip the CLI and return an empty session_id.
+    """
 
     # common dev tools to allow in sandbox
     DEFAULT_ALLOWED_TOOLS = [
@@ -65,6 +102,7 @@ class ClaudeCodeClient:
         max_turns: int | None = None,
         allowed_tools: list[str] | None = None,
         role: str = "unknown",
+        cache: ResponseCache | None = None,
     ):
         self.model = model
         self.cwd = cwd
@@ -72,6 +110,10 @@ class ClaudeCodeClient:
         self.max_turns = max_turns
         self.allowed_tools = allowed_tools or self.DEFAULT_ALLOWED_TOOLS
         self.role = role
+        self.cache = cache
+        self.last_cached = False
+        self.last_usage = Usage()
+        self.last_files: list[str] = []
         self._proc: asyncio.subprocess.Process | None = None
 
     async def execute(
@@ -79,8 +121,34 @@ class ClaudeCodeClient:
         prompt: str,
         timeout: int = 120,
         on_progress: Callable[[str], None] | None = None,
+        task_id: str = "",
+        max_turns: int | None = None,
     ) -> tuple[str, str]:
-        """returns (output, session_id); raises ClaudeError on failure/timeout"""
+        """returns (output, session_id); raises ClaudeError on failure/timeout
+
+        token/cost/duration of the call land in self.last_usage, files
+        the agent wrote or edited in self.last_files; task_id only tags
+        the trace entry; max_turns overrides the client's limit for
+        this call
+        """
+        self.last_cached = False
+        self.last_usage = Usage()
+        self.last_files = []
+        if self.cache:
+            hit = self.cache.get(self.role, self.model, prompt)
+            if hit is not None:
+                self.last_cached = True
+                self._trace(
+                    len(prompt),
+                    len(hit),
+                    timeout,
+                    True,
+                    prompt=prompt,
+                    response=hit,
+                    cached=True,
+                    task_id=task_id,
+                )
+                return hit, ""
         args = [
             "claude",
             "-p",
@@ -94,11 +162,13 @@ class ClaudeCodeClient:
             "--verbose",
             "--no-session-persistence",
         ]
-        if self.max_turns is not None:
-            args.extend(["--max-turns", str(self.max_turns)])
+        turns = max_turns if max_turns is not None else self.max_turns
+        if turns is not None:
+            args.extend(["--max-turns", str(turns)])
         if self.allowed_tools:
             args.extend(["--allowedTools", " ".join(self.allowed_tools)])
         env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
+        started = time.monotonic()
         proc = await asyncio.create_subprocess_exec(
             *args,
             cwd=self.cwd,
@@ -114,6 +184,7 @@ class ClaudeCodeClient:
         result_text = ""
         session_id = ""
         subtype = ""
+        first_event = True
         try:
             async with asyncio.timeout(timeout):
                 assert proc.stdout is not None
@@ -122,15 +193,23 @@ class ClaudeCodeClient:
                     line = raw.decode().strip()
                     if not line:
                         continue
+                    if first_event:
+                        first_event = False
+                        metrics.llm_first_event.observe(
+                            time.monotonic() - started, role=self._role_label()
+                        )
                     try:
                         event = json.loads(line)
                     except json.JSONDecodeError:
                         continue
                     etype = event.get("type", "")
-                    if etype == "assistant" and on_progress:
+                    if etype == "assistant":
                         msg = event.get("message", {})
                         for block in msg.get("content", []):
-                            if block.get("type") == "text":
+                            btype = block.get("type")
+                            if btype == "tool_use":
+                                self._note_file(block)
+                            elif btype == "text" and on_progress:
                                 text = block.get("text", "")
                                 for m in re.finditer(
                                     r"<progress>(.*?)</progress>",
@@ -141,6 +220,7 @@ class ClaudeCodeClient:
                         result_text = event.get("result", "")
                         session_id = event.get("session_id", "")
                         subtype = event.get("subtype", "")
+                        self.last_usage = self._parse_usage(event)
                 stderr_bytes = await proc.stderr.read()
                 await proc.wait()
         except asyncio.CancelledError:
@@ -148,6 +228,8 @@ class ClaudeCodeClient:
             raise
         except TimeoutError:
             await self._kill_proc(proc)
+            self._stamp_usage(started)
+            self._observe(started, "timeout")
             self._trace(
                 len(prompt),
                 len(result_text),
@@ -155,6 +237,7 @@ class ClaudeCodeClient:
                 False,
                 prompt=prompt,
                 response=result_text,
+                task_id=task_id,
             )
             raise ClaudeError(
                 f"claude CLI timeout after {timeout}s",
@@ -163,7 +246,9 @@ class ClaudeCodeClient:
             )
         finally:
             self._proc = None
+            self._stamp_usage(started)
 
+        self._observe(started, "ok" if proc.returncode == 0 else "error")
         if proc.returncode != 0:
             stderr_text = stderr_bytes.decode().strip()
             error = stderr_text or result_text or f"exit {proc.returncode}"
@@ -174,6 +259,7 @@ class ClaudeCodeClient:
                 False,
                 prompt=prompt,
                 response=result_text,
+                task_id=task_id,
             )
             raise ClaudeError(
                 f"claude CLI failed (exit {proc.returncode}): {error}",
@@ -201,25 +287,72 @@ class ClaudeCodeClient:
             True,
             prompt=prompt,
             response=result_text,
+            task_id=task_id,
         )
+        if self.cache:
+            self.cache.put(self.role, self.model, prompt, result_text)
         return result_text, session_id
 
-    @staticmethod
-    async def _kill_proc(proc: asyncio.subprocess.Process) -> None:
-        """SIGTERM the process group, SIGKILL after 10s"""
-        if proc.returncode is not None:
+    def _note_file(self, block: dict) -> None:
+        """record the target of a file-editing tool_use block
+
+        paths under cwd are stored relative to it, so they match git
+        pathspecs in the main tree and in a worktree alike
+        """
+        key = EDIT_TOOLS.get(block.get("name", ""))
+        if not key:
             return
-        try:
-            os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
-        except (OSError, ProcessLookupError):
+        raw = (block.get("input") or {}).get(key)
+        if not isinstance(raw, str) or not raw:
             return
-        try:
-            await asyncio.wait_for(proc.wait(), timeout=10)
-        except asyncio.TimeoutError:
+        path = Path(raw)
+        if path.is_absolute():
             try:
-                os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
-            except (OSError, ProcessLookupError):
+                path = path.resolve().relative_to(Path(self.cwd).resolve())
+            except ValueError:
                 pass
+        name = os.path.normpath(path)
+        if name not in self.last_files:
+            self.last_files.append(name)
+
+    def _stamp_usage(self, started: float) -> None:
+        """count the call; fall back to wall time when no result event"""
+        self.last_usage.calls = 1
+        if not self.last_usage.duration_ms:
+            self.last_usage.duration_ms = int((time.monotonic() - started) * 1000)
+
+    def _role_label(self) -> str:
+        """metric label; worker-w3 counts as worker"""
+        return self.role.partition("-")[0]
+
+    def _observe(self, started: float, outcome: str) -> None:
+        metrics.llm_call.observe(
+            time.monotonic() - started, role=self._role_label(), outcome=outcome
+        )
+
+    @staticmethod
+    def _parse_usage(event: dict) -> Usage:
+        """usage, cost and duration fields of a stream-json result event"""
+        usage = event.get("usage") or {}
+        cost = event.get("total_cost_usd", event.get("cost_usd", 0.0))
+        return Usage(
+            input_tokens=int(usage.get("input_tokens", 0) or 0),
+            output_tokens=int(usage.get("output_tokens", 0) or 0),
+            cache_read_tokens=int(usage.get("cache_read_input_tokens", 0) or 0),
+            cache_write_tokens=int(usage.get("cache_creation_input_tokens", 0) or 0),
+            cost_usd=float(cost or 0.0),
+            duration_ms=int(event.get("duration_ms", 0) or 0),
+            turns=int(event.get("num_turns", 0) or 0),
+        )
+
+    def forget(self, prompt: str) -> None:
+        """drop a cached response the caller could not use"""
+        if self.cache:
+            self.cache.delete(self.role, self.model, prompt)
+
+    @staticmethod
+    async def _kill_proc(proc: asyncio.subprocess.Process) -> None:
+        await kill_process_group(proc)
 
     def _trace(
         self,
@@ -229,22 +362,26 @@ class ClaudeCodeClient:
         ok: bool,
         prompt: str = "",
         response: str = "",
+        cached: bool = False,
+        task_id: str = "",
     ) -> None:
-        trace_path = Path(".ship/log/trace.jl")
-        try:
-            trace_path.parent.mkdir(parents=True, exist_ok=True)
-            entry = {
-                "ts": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
-                "role": self.role,
-                "model": self.model,
-                "prompt_len": prompt_len,
-                "response_len": response_len,
-                "timeout": timeout,
-                "ok": ok,
-                "prompt": prompt,
-                "response": response,
-            }
-            with open(trace_path, "a") as f:
-                f.write(json.dumps(entry) + "\n")
-        except OSError:
-            pass
+        entry = {
+            "ts": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+            "role": self.role,
+            "model": self.model,
+            "prompt_len": prompt_len,
+            "response_len": response_len,
+            "timeout": timeout,
+            "ok": ok,
+            "tokens_in": self.last_usage.input_tokens,
+            "tokens_out": self.last_usage.output_tokens,
+            "cost_usd": round(self.last_usage.cost_usd, 6),
+            "duration_ms": self.last_usage.duration_ms,
+            "prompt": prompt,
+            "response": response,
+        }
+        if cached:
+            entry["cached"] = True
+        if task_id:
+            entry["task_id"] = task_id
+        tracer.write(entry)
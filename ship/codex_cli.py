@@ -1,27 +1,92 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
 import os
+import re
 import signal
 import shutil
 import tempfile
+from collections.abc import Callable
 from pathlib import Path
+from typing import Any
+
+from ship.claude_code import kill_process_group
+
+_PROGRESS_RE = re.compile(r"<progress>(.*?)</progress>", re.DOTALL)
+LINE_LIMIT = 4 * 1024 * 1024  # longest single JSON event we buffer
+STDERR_TAIL = 64 * 1024  # stderr bytes kept for error messages
+
+
+def parse_event(event: dict[str, Any]) -> tuple[str, str]:
+    """(kind, text) of one `codex exec --json` event
+
+    kind is "message" (agent message), "command" (shell command
+    started), "error", or "" for events we ignore. understands both the
+    item-based stream ({"type": "item.completed", "item": {...}}) and
+    the older {"msg": {"type": ...}} one.
+    """
+    etype = event.get("type", "")
+    item = event.get("item")
+    if isinstance(item, dict):
+        itype = item.get("type") or item.get("item_type", "")
+        if etype == "item.completed" and itype in (
+            "agent_message",
+            "assistant_message",
+        ):
+            return "message", str(item.get("text", ""))
+        if etype == "item.started" and itype == "command_execution":
+            return "command", _command_text(item.get("command", ""))
+        return "", ""
+    if etype == "turn.failed":
+        err = event.get("error")
+        return "error", str(err.get("message", "") if isinstance(err, dict) else err)
+    if etype == "error":
+        return "error", str(event.get("message", ""))
+
+    msg = event.get("msg")
+    if not isinstance(msg, dict):
+        return "", ""
+    mtype = msg.get("type", "")
+    if mtype == "agent_message":
+        return "message", str(msg.get("message", ""))
+    if mtype == "task_complete" and msg.get("last_agent_message"):
+        return "message", str(msg["last_agent_message"])
+    if mtype == "exec_command_begin":
+        return "command", _command_text(msg.get("command", ""))
+    if mtype in ("error", "stream_error"):
+        return "error", str(msg.get("message", ""))
+    return "", ""
+
+
+def _command_text(cmd: Any) -> str:
+    text = " ".join(map(str, cmd)) if isinstance(cmd, list) else str(cmd)
+    return " ".join(text.split())
 
 
 class CodexClient:
-    """client for calling Codex CLI non-interactively"""
+    """client for calling Codex CLI non-interactively
+
+    stream=True (default) parses the `--json` event stream as it
+    arrives; stream=False keeps the old buffered path that reads the
+    answer back from an --output-last-message temp file.
+    """
 
     def __init__(
         self,
         model: str | None = None,
         cwd: str = ".",
         sandbox: str = "read-only",
+        stream: bool = True,
     ):
         self.model = model
         self.cwd = cwd
         self.sandbox = sandbox
+        self.stream = stream
         self.binary = self._find_codex()
+        self._proc: asyncio.subprocess.Process | None = None
+        self._cancelled = False
 
     def _find_codex(self) -> str:
         """locate codex CLI binary (PATH or bun default)"""
@@ -49,13 +114,155 @@ class CodexClient:
             args.extend(["--model", self.model])
         return args
 
-    async def execute(self, prompt: str, timeout: int = 120) -> str:
+    def _build_stream_args(self) -> list[str]:
+        args = [self.binary, "exec", "--json", "--sandbox", self.sandbox]
+        if self.model:
+            args.extend(["--model", self.model])
+        return args
+
+    async def execute(
+        self,
+        prompt: str,
+        timeout: int = 120,
+        on_progress: Callable[[str], None] | None = None,
+    ) -> str:
         """execute prompt via codex CLI
 
-        runs: codex exec --output-last-message <file> --sandbox <mode>
         uses: stdin for prompt
-        returns: final message from codex agent
+        returns: final message from codex agent; on timeout the last
+        agent message seen, if any
         """
+        self._cancelled = False
+        if self.stream:
+            return await self._execute_stream(prompt, timeout, on_progress)
+        return await self._execute_buffered(prompt, timeout)
+
+    async def cancel(self) -> None:
+        """kill the running call; execute raises RuntimeError"""
+        self._cancelled = True
+        if self._proc is not None:
+            await kill_process_group(self._proc)
+
+    async def _execute_stream(
+        self,
+        prompt: str,
+        timeout: int,
+        on_progress: Callable[[str], None] | None,
+    ) -> str:
+        """runs: codex exec --json --sandbox <mode>
+
+        events are read one line at a time (at most LINE_LIMIT buffered)
+        and only the latest agent message is kept; stderr is drained
+        concurrently into a bounded tail
+        """
+        proc = await asyncio.create_subprocess_exec(
+            *self._build_stream_args(),
+            cwd=self.cwd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+            limit=LINE_LIMIT,
+        )
+        self._proc = proc
+        assert proc.stdout is not None
+        assert proc.stderr is not None
+        feeder = asyncio.create_task(self._feed(proc, prompt.encode()))
+        drainer = asyncio.create_task(self._drain(proc.stderr))
+
+        message = ""
+        error = ""
+        timed_out = False
+        try:
+            async with asyncio.timeout(timeout):
+                while True:
+                    try:
+                        raw = await proc.stdout.readline()
+                    except ValueError:
+                        logging.warning("codex event over line limit, skipped")
+                        continue
+                    if not raw:
+                        break
+                    try:
+                        event = json.loads(raw)
+                    except json.JSONDecodeError:
+                        continue
+                    if not isinstance(event, dict):
+                        continue
+                    kind, text = parse_event(event)
+                    if kind == "message" and text:
+                        message = text
+                        if on_progress:
+                            for m in _PROGRESS_RE.finditer(text):
+                                on_progress(m.group(1).strip())
+                    elif kind == "command" and text and on_progress:
+                        on_progress(f"$ {text[:80]}")
+                    elif kind == "error" and text:
+                        error = text
+                await proc.wait()
+        except asyncio.CancelledError:
+            await kill_process_group(proc)
+            feeder.cancel()
+            drainer.cancel()
+            raise
+        except TimeoutError:
+            timed_out = True
+            await kill_process_group(proc)
+        finally:
+            self._proc = None
+
+        feeder.cancel()
+        try:
+            stderr = (await asyncio.wait_for(drainer, timeout=5)).decode(
+                errors="replace"
+            )
+        except asyncio.TimeoutError:
+            stderr = ""
+
+        if self._cancelled:
+            raise RuntimeError("codex CLI cancelled")
+
+        if timed_out:
+            if message:
+                logging.warning(
+                    f"codex CLI timeout after {timeout}s, "
+                    f"returning partial output ({len(message)} chars)"
+                )
+                return message.strip()
+            raise RuntimeError(f"codex CLI timeout after {timeout}s")
+
+        if proc.returncode != 0:
+            detail = error or stderr.strip() or f"exit {proc.returncode}"
+            raise RuntimeError(f"codex CLI failed: {detail}")
+
+        if not message.strip():
+            detail = f": {error}" if error else ""
+            raise RuntimeError(f"codex CLI returned empty output{detail}")
+
+        return message.strip()
+
+    @staticmethod
+    async def _feed(proc: asyncio.subprocess.Process, data: bytes) -> None:
+        assert proc.stdin is not None
+        try:
+            proc.stdin.write(data)
+            await proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            proc.stdin.close()
+
+    @staticmethod
+    async def _drain(stream: asyncio.StreamReader) -> bytes:
+        """read a stream to EOF keeping only the last STDERR_TAIL bytes"""
+        tail = bytearray()
+        while chunk := await stream.read(8192):
+            tail += chunk
+            del tail[:-STDERR_TAIL]
+        return bytes(tail)
+
+    async def _execute_buffered(self, prompt: str, timeout: int) -> str:
+        """runs: codex exec --output-last-message <file> --sandbox <mode>"""
         tmp = tempfile.NamedTemporaryFile(delete=False)
         tmp.close()
         output_path = tmp.name
@@ -6,6 +6,20 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 
+from ship.cache import default_cache_dir
+from ship.checkpoint import POLICIES
+from ship.metrics import parse_addr
+
+# claude CLI roles with a configurable model (MODEL_<ROLE>). short
+# yes/no calls default to the small model and escalate to
+# Config.escalate_model when the answer does not parse
+ROLES = ("planner", "validator", "worker", "judge", "replanner", "verifier", "reeval")
+DEFAULT_MODELS = {
+    **{role: "sonnet" for role in ROLES},
+    "judge": "haiku",
+    "reeval": "haiku",
+}
+
 
 @dataclass(frozen=True, slots=True)
 class Config:
@@ -22,6 +36,31 @@ class Config:
     task_timeout: int
     verbosity: int
     use_codex: bool
+    host_slots: int = 0  # 0 = no host-wide cap
+    cache_dir: str = ""  # "" = response cache disabled
+    cache_max_bytes: int = 64 * 1024 * 1024
+    cache_scope: str = ""  # project_scope() of the run, part of cache keys
+    max_cost: float = 0.0  # USD per run, 0 = unlimited
+    max_task_cost: float = 0.0  # USD per task across retries, 0 = unlimited
+    adaptive: bool = False  # learn per-task timeout/turns from history
+    isolate: bool = False  # per-worker git worktrees + merge queue
+    checkpoint: str = "off"  # failed attempts: off | rollback | keep
+    speculative_replan: float = 0.0  # done share that starts replan early, 0 = off
+    models: tuple[tuple[str, str], ...] = ()  # (role, model) overrides
+    escalate_model: str = "sonnet"  # retry model for unparseable answers, "" = off
+    check_cmd: str = ""  # shell command run after each task, "" = off
+    check_timeout: int = 600
+    render_hz: float = 5.0  # TUI redraws per second at most, 0 = judge cadence
+    status_socket: bool = True  # serve live status on <data_dir>/ship.sock
+    metrics_addr: str = ""  # "[host:]port" serving GET /metrics, "" = off
+    metrics_file: str = ""  # textfile-collector file rewritten during the run
+
+    def model(self, role: str) -> str:
+        """model for a role: MODEL_<ROLE> override, else DEFAULT_MODELS"""
+        return self.role_models()[role]
+
+    def role_models(self) -> dict[str, str]:
+        return {**DEFAULT_MODELS, **dict(self.models)}
 
     @staticmethod
     def load(
@@ -31,6 +70,15 @@ class Config:
         verbosity: int = 1,
         use_codex: bool = False,
         data_dir: str | None = None,
+        host_slots: int | None = None,
+        use_cache: bool = True,
+        max_cost: float | None = None,
+        max_task_cost: float | None = None,
+        adaptive: bool | None = None,
+        isolate: bool | None = None,
+        checkpoint: str | None = None,
+        speculative_replan: float | None = None,
+        check_cmd: str | None = None,
     ) -> Config:
         """load config from .env file and environment variables
 
@@ -53,8 +101,37 @@ class Config:
             )
             if max_turns is None:
                 max_turns = int(os.getenv("MAX_TURNS", "50"))
+            if host_slots is None:
+                host_slots = int(os.getenv("HOST_SLOTS", "0"))
+            cache_max_mb = int(os.getenv("CACHE_MAX_MB", "64"))
+            if max_cost is None:
+                max_cost = float(os.getenv("MAX_COST", "0"))
+            if max_task_cost is None:
+                max_task_cost = float(os.getenv("MAX_TASK_COST", "0"))
+            if adaptive is None:
+                adaptive = os.getenv("ADAPTIVE_LIMITS", "0") == "1"
+            if isolate is None:
+                isolate = os.getenv("ISOLATE", "0") == "1"
+            if checkpoint is None:
+                checkpoint = os.getenv("CHECKPOINT", "off")
+            if speculative_replan is None:
+                speculative_replan = float(os.getenv("SPECULATIVE_REPLAN", "0"))
+            if check_cmd is None:
+                check_cmd = os.getenv("CHECK_CMD", "")
+            check_timeout = int(os.getenv("CHECK_TIMEOUT", "600"))
+            render_hz = float(os.getenv("RENDER_HZ", "5"))
+            status_socket = os.getenv("STATUS_SOCKET", "1") != "0"
+            metrics_addr = os.getenv("METRICS_ADDR", "").strip()
+            if metrics_addr:
+                parse_addr(metrics_addr)
         except ValueError as e:
             raise RuntimeError(f"invalid config value: {e}") from e
+        models = tuple(
+            (role, os.environ[f"MODEL_{role.upper()}"])
+            for role in ROLES
+            if os.getenv(f"MODEL_{role.upper()}")
+        )
+        escalate_model = os.getenv("MODEL_ESCALATE", "sonnet")
 
         # validate positive integers
         if num_workers < 1:
@@ -63,9 +140,35 @@ class Config:
             raise RuntimeError(f"TASK_TIMEOUT must be positive, got {task_timeout}")
         if max_turns < 1:
             raise RuntimeError(f"MAX_TURNS must be positive, got {max_turns}")
+        if host_slots < 0:
+            raise RuntimeError(f"HOST_SLOTS must not be negative, got {host_slots}")
+        if cache_max_mb < 1:
+            raise RuntimeError(f"CACHE_MAX_MB must be positive, got {cache_max_mb}")
+        if check_timeout < 1:
+            raise RuntimeError(f"CHECK_TIMEOUT must be positive, got {check_timeout}")
+        if render_hz < 0:
+            raise RuntimeError(f"RENDER_HZ must not be negative, got {render_hz}")
+        if max_cost < 0:
+            raise RuntimeError(f"MAX_COST must not be negative, got {max_cost}")
+        if not 0 <= speculative_replan <= 1:
+            raise RuntimeError(
+                f"SPECULATIVE_REPLAN must be a share in [0, 1], got {speculative_replan}"
+            )
+        if checkpoint not in POLICIES:
+            raise RuntimeError(
+                f"CHECKPOINT must be one of {', '.join(POLICIES)}, got {checkpoint}"
+            )
+        if max_task_cost < 0:
+            raise RuntimeError(
+                f"MAX_TASK_COST must not be negative, got {max_task_cost}"
+            )
 
         resolved_data_dir = os.getenv("DATA_DIR") or data_dir or ".ship"
         resolved_log_dir = os.getenv("LOG_DIR") or f"{resolved_data_dir}/log"
+        if use_cache and os.getenv("RESPONSE_CACHE", "1") != "0":
+            resolved_cache_dir = os.getenv("CACHE_DIR") or str(default_cache_dir())
+        else:
+            resolved_cache_dir = ""
 
         return Config(
             num_workers=num_workers,
@@ -75,4 +178,21 @@ class Config:
             task_timeout=task_timeout,
             verbosity=verbosity,
             use_codex=use_codex,
+            host_slots=host_slots,
+            cache_dir=resolved_cache_dir,
+            cache_max_bytes=cache_max_mb * 1024 * 1024,
+            max_cost=max_cost,
+            max_task_cost=max_task_cost,
+            adaptive=adaptive,
+            isolate=isolate,
+            checkpoint=checkpoint,
+            speculative_replan=speculative_replan,
+            models=models,
+            escalate_model=escalate_model,
+            check_cmd=check_cmd.strip(),
+            check_timeout=check_timeout,
+            render_hz=render_hz,
+            status_socket=status_socket,
+            metrics_addr=metrics_addr,
+            metrics_file=os.getenv("METRICS_FILE", "").strip(),
         )
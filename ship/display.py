@@ -1,12 +1,26 @@
 from __future__ import annotations
 
+import asyncio
+import os
 import shutil
 import sys
+from collections import deque
 from datetime import datetime
+from pathlib import Path
 
+from ship.prompt_builder import fit_tokens
 from ship.types_ import TaskStatus
 
 
+def _fmt_tokens(n: int) -> str:
+    """compact token count: 950, 12.3k, 1.2M"""
+    if n >= 1_000_000:
+        return f"{n / 1_000_000:.1f}M"
+    if n >= 1_000:
+        return f"{n / 1_000:.1f}k"
+    return str(n)
+
+
 def _truncate(text: str, max_words: int = 8, max_chars: int = 50) -> str:
     """first N words, capped at max_chars"""
     words = text.split()
@@ -18,6 +32,12 @@ def _truncate(text: str, max_words: int = 8, max_chars: int = 50) -> str:
     return out
 
 
+# one panel row: (task id, description, status, worker, summary, error)
+PanelEntry = tuple[str, str, TaskStatus, str, str, str]
+
+# terminal rows the panel leaves free, so it never fills the screen
+PANEL_HEADROOM = 2
+
 _STATUS_ICON = {
     TaskStatus.COMPLETED: ("\033[32m\u2713\033[0m", "\u2713"),
     TaskStatus.FAILED: ("\033[31m\u2717\033[0m", "\u2717"),
@@ -31,6 +51,8 @@ class Display:
 
     tty: redraws panel in place using ANSI escape codes.
     events buffer between refreshes and flush above the panel.
+    with a render loop running, setters only mark the panel dirty and
+    the loop redraws at most `hz` times a second.
     non-tty: prints one line per state change.
     quiet (verbosity=0): errors only.
     """
@@ -38,20 +60,26 @@ class Display:
     def __init__(self):
         self.is_tty = sys.stdout.isatty()
         self.verbosity = 1
-        self._tasks: list[tuple[str, TaskStatus, str, str, str]] = []
+        self._tasks: list[PanelEntry] = []
         self._phase = "executing"
         self._panel_lines = 0
+        self._drawn: list[str] = []  # panel lines on screen, for diffing
         self._plan_shown = False
         self._global_done: int = 0
         self._global_total: int = 0
+        self._tokens: int = 0
+        self._cost: float = 0.0
         # task summaries (8-word truncated)
         self._task_summaries: list[str] = []
-        self._task_desc_to_idx: dict[str, int] = {}
+        self._task_idx: dict[str, int] = {}  # task id -> plan position
         # worker panel state
         self._worker_count: int = 0
         self._worker_progress: dict[str, tuple[int, str, str]] = {}
         # buffered event lines (flushed at next refresh)
         self._pending_events: list[str] = []
+        # panel state changed since the last refresh
+        self._dirty = False
+        self._render_task: asyncio.Task[None] | None = None
 
     def banner(self, msg: str) -> None:
         """print header + separator"""
@@ -63,19 +91,28 @@ class Display:
 
     def set_tasks(
         self,
-        tasks: list[tuple[str, TaskStatus, str, str, str]],
+        tasks: list[PanelEntry],
     ) -> None:
         self._tasks = tasks
+        self._dirty = True
 
     def set_phase(self, phase: str) -> None:
         self._phase = phase
+        self._dirty = True
 
     def set_global(self, done: int, total: int) -> None:
         self._global_done = done
         self._global_total = total
+        self._dirty = True
+
+    def set_usage(self, tokens: int, cost: float) -> None:
+        self._tokens = tokens
+        self._cost = cost
+        self._dirty = True
 
     def set_worker_count(self, n: int) -> None:
         self._worker_count = n
+        self._dirty = True
 
     def set_worker_progress(
         self,
@@ -85,20 +122,50 @@ class Display:
         msg: str,
     ) -> None:
         self._worker_progress[wid] = (task_idx, task_summary, msg)
+        self._dirty = True
 
     def clear_worker(self, wid: str) -> None:
         self._worker_progress.pop(wid, None)
+        self._dirty = True
+
+    def start_render_loop(self, hz: float) -> None:
+        """redraw from a background task, at most hz times a second
+
+        bursts of progress updates between ticks coalesce into one
+        redraw; a tick with nothing dirty writes nothing. no-op when
+        hz <= 0 or stdout is not a tty.
+        """
+        if hz <= 0 or not self.is_tty or self._render_task is not None:
+            return
+        self._render_task = asyncio.create_task(self._render_loop(1 / hz))
+
+    async def _render_loop(self, period: float) -> None:
+        while True:
+            await asyncio.sleep(period)
+            if self._dirty:
+                self.refresh()
+
+    def request_refresh(self) -> None:
+        """redraw on the render loop's next tick, or now without a loop"""
+        if self._render_task is not None:
+            self._dirty = True
+        else:
+            self.refresh()
 
-    def task_info(self, desc: str) -> tuple[int, str]:
-        """return (1-based index, 8-word summary) for a task desc"""
-        idx = self._task_desc_to_idx.get(desc, -1)
+    def task_info(self, task_id: str, desc: str = "") -> tuple[int, str]:
+        """(1-based plan index, 8-word summary) of a task
+
+        tasks added after the plan was shown have index 0 and a summary
+        of desc
+        """
+        idx = self._task_idx.get(task_id, -1)
         if 0 <= idx < len(self._task_summaries):
             return idx + 1, self._task_summaries[idx]
         return 0, _truncate(desc)
 
     def show_plan(
         self,
-        tasks: list[tuple[str, TaskStatus, str, str, str]] | None = None,
+        tasks: list[PanelEntry] | None = None,
     ) -> None:
         """build task summaries; tty defers rendering to refresh()"""
         render = tasks if tasks is not None else self._tasks
@@ -106,46 +173,98 @@ class Display:
             return
         self._plan_shown = True
 
-        # build 8-word summaries and desc->index mapping
-        self._task_summaries = [_truncate(desc) for desc, *_ in render]
-        self._task_desc_to_idx = {desc: i for i, (desc, *_) in enumerate(render)}
+        # build 8-word summaries and id->index mapping
+        self._task_summaries = [_truncate(desc) for _, desc, *_ in render]
+        self._task_idx = {tid: i for i, (tid, *_) in enumerate(render)}
 
         # non-tty: print static list (refresh is skipped)
         if not self.is_tty:
             w = len(str(len(render)))
             print()
-            for i, (desc, status, *_rest) in enumerate(render):
+            for i, (_, desc, status, *_rest) in enumerate(render):
                 icon_c, _ = _STATUS_ICON.get(status, ("\u00b7", "\u00b7"))
                 summary = self._task_summaries[i]
                 print(f"  [{i + 1:>{w}}] {icon_c} {summary}")
             print()
 
     def refresh(self) -> None:
-        """erase old panel, flush buffered events, redraw panel"""
+        """flush buffered events, redraw the panel lines that changed"""
+        self._dirty = False
         if self.verbosity < 1 or not self._tasks:
             return
 
         if not self.is_tty:
             return
 
-        self._erase_panel()
-
-        # flush buffered events above panel
-        for ev in self._pending_events:
-            sys.stdout.write(f"{ev}\n")
-        self._pending_events.clear()
+        lines = self._build_panel(self._cols(), self._rows())
+
+        if self._pending_events or len(lines) != len(self._drawn):
+            # events scroll in above the panel: redraw it whole
+            self._erase_panel()
+            for ev in self._pending_events:
+                sys.stdout.write(f"{ev}\n")
+            self._pending_events.clear()
+            for line in lines:
+                sys.stdout.write(f"\033[K{line}\n")
+        elif lines != self._drawn:
+            # same height: rewrite changed lines, step over the rest
+            out = [f"\033[{len(lines)}A"]
+            for old, new in zip(self._drawn, lines):
+                out.append(f"\r\033[K{new}\n" if new != old else "\n")
+            sys.stdout.write("".join(out))
+        else:
+            return
 
-        # build panel
-        lines: list[str] = []
-        cols = self._cols()
+        self._panel_lines = len(lines)
+        self._drawn = lines
+        sys.stdout.flush()
 
-        # leading blank
-        lines.append("")
+    def _build_panel(self, cols: int, rows: int) -> list[str]:
+        """panel lines, at most rows - PANEL_HEADROOM of them
 
-        # task section
+        small plans list every task; past the screen height the task
+        section shows running tasks, then the next pending ones in plan
+        order, and folds the rest into one count line, so the panel and
+        the bytes written per redraw stay flat as the plan grows
+        """
         n = len(self._tasks)
         w = len(str(n))
-        for i, (desc, status, *_rest) in enumerate(self._tasks):
+        running: list[int] = []
+        pending: list[int] = []
+        done = fail = 0
+        for i, (_, _, status, *_rest) in enumerate(self._tasks):
+            if status is TaskStatus.RUNNING:
+                running.append(i)
+            elif status is TaskStatus.PENDING:
+                pending.append(i)
+            elif status is TaskStatus.COMPLETED:
+                done += 1
+            else:
+                fail += 1
+
+        workers = self._worker_lines(cols)
+        # leading blank, blank before workers, summary line
+        room = rows - PANEL_HEADROOM - len(workers) - 3
+        if n <= room:
+            shown = list(range(n))
+            folded = ""
+        else:
+            room = max(2, room)
+            shown = (running + pending)[: room - 1]
+            rest_pending = len(pending) - sum(
+                1 for i in shown if self._tasks[i][2] is TaskStatus.PENDING
+            )
+            parts = [f"{done} done"]
+            if fail:
+                parts.append(f"{fail} failed")
+            if rest_pending:
+                parts.append(f"{rest_pending} more pending")
+            folded = f"  \033[2m\u2026 {', '.join(parts)}\033[0m"
+            shown.sort()
+
+        lines: list[str] = [""]
+        for i in shown:
+            _, desc, status, *_rest = self._tasks[i]
             icon_c, _ = _STATUS_ICON.get(status, ("\u00b7", "\u00b7"))
             summary = (
                 self._task_summaries[i]
@@ -153,11 +272,29 @@ class Display:
                 else _truncate(desc)
             )
             lines.append(f"  [{i + 1:>{w}}] {icon_c} {summary}")
-
-        # blank
+        if folded:
+            lines.append(folded)
         lines.append("")
+        lines.extend(workers)
+
+        # summary line
+        if self._global_total > 0:
+            done, total = self._global_done, self._global_total
+        else:
+            total = n
+        pct = done * 100 // total if total else 0
+        parts = [f"{done}/{total} ({pct}%)"]
+        if running:
+            parts.append(f"{len(running)} running")
+        if fail:
+            parts.append(f"{fail} failed")
+        if self._tokens:
+            parts.append(f"{_fmt_tokens(self._tokens)} tok ${self._cost:.2f}")
+        lines.append(f"  {', '.join(parts)}  {self._phase}")
+        return lines
 
-        # worker section
+    def _worker_lines(self, cols: int) -> list[str]:
+        lines = []
         wcount = self._worker_count or 1
         for wi in range(wcount):
             wid = f"w{wi}"
@@ -171,32 +308,7 @@ class Display:
                 lines.append(f"  {wid}  {pmsg}   {tag}")
             else:
                 lines.append(f"  \033[2m{wid}  idle\033[0m")
-
-        # summary line
-        if self._global_total > 0:
-            done, total = self._global_done, self._global_total
-        else:
-            total = len(self._tasks)
-            done = sum(1 for _, s, *_ in self._tasks if s is TaskStatus.COMPLETED)
-        pct = done * 100 // total if total else 0
-        run = fail = 0
-        for _, s, *_ in self._tasks:
-            if s is TaskStatus.RUNNING:
-                run += 1
-            elif s is TaskStatus.FAILED:
-                fail += 1
-        parts = [f"{done}/{total} ({pct}%)"]
-        if run:
-            parts.append(f"{run} running")
-        if fail:
-            parts.append(f"{fail} failed")
-        lines.append(f"  {', '.join(parts)}  {self._phase}")
-
-        # draw panel
-        self._panel_lines = len(lines)
-        for line in lines:
-            sys.stdout.write(f"\033[K{line}\n")
-        sys.stdout.flush()
+        return lines
 
     def event(self, msg: str, min_level: int = 1) -> None:
         """buffer event for next refresh (tty), or print immediately"""
@@ -204,6 +316,7 @@ class Display:
             return
         if self.is_tty and self._panel_lines > 0:
             self._pending_events.append(msg)
+            self._dirty = True
         else:
             print(msg)
 
@@ -224,15 +337,20 @@ class Display:
         self._erase_panel()
         sys.stdout.flush()
         self._panel_lines = 0
+        self._drawn = []
 
     def finish(self) -> None:
-        """clear panel, flush remaining events"""
+        """stop the render loop, clear panel, flush remaining events"""
+        if self._render_task is not None:
+            self._render_task.cancel()
+            self._render_task = None
         self._erase_panel()
         for ev in self._pending_events:
             sys.stdout.write(f"{ev}\n")
         self._pending_events.clear()
         sys.stdout.flush()
         self._panel_lines = 0
+        self._drawn = []
         self._tasks = []
         self._worker_progress.clear()
 
@@ -242,18 +360,80 @@ class Display:
         except Exception:
             return 80
 
+    def _rows(self) -> int:
+        try:
+            return shutil.get_terminal_size().lines
+        except Exception:
+            return 24
+
 
 # singleton
 display = Display()
 
-# in-memory log entries appended by workers/judge
-_log_entries: list[str] = []
+# newest log entries, repeated in the PROGRESS.md header; the full
+# history lives only in the append-only log file
+RECENT_ENTRIES = 10
+LOG_TAIL_BYTES = 64 * 1024  # log bytes read back for prompts
+_log_entries: deque[str] = deque(maxlen=RECENT_ENTRIES)
+_log_path = ""
+
+
+def progress_log_path(progress_path: str) -> str:
+    """append-only log next to PROGRESS.md: PROGRESS-LOG.md"""
+    p = Path(progress_path)
+    return str(p.with_name(f"{p.stem}-LOG{p.suffix}"))
+
+
+def set_log_path(path: str) -> None:
+    """file log_entry() appends to; "" keeps entries in memory only"""
+    global _log_path
+    _log_path = path
 
 
 def log_entry(msg: str) -> None:
-    """append a timestamped log entry (shown in PROGRESS.md)"""
+    """append a timestamped entry to the progress log"""
     now = datetime.now().strftime("%H:%M:%S")
-    _log_entries.append(f"- `{now}` {msg}")
+    line = f"- `{now}` {msg}"
+    _log_entries.append(line)
+    if _log_path:
+        try:
+            with open(_log_path, "a") as f:
+                f.write(line + "\n")
+        except OSError:
+            pass
+
+
+def read_log_tail(path: str, max_bytes: int = LOG_TAIL_BYTES) -> str:
+    """last whole lines of a log file, at most max_bytes of them"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - max_bytes))
+            data = f.read()
+    except OSError:
+        return ""
+    if size > max_bytes:
+        # drop the line the seek cut into
+        data = data.partition(b"\n")[2]
+    return data.decode(errors="replace")
+
+
+def progress_context(path: str, budget: int) -> str:
+    """PROGRESS.md plus the newest log entries, for prompts
+
+    the header is small and kept whole; the log is cut from the front
+    to fit the token budget
+    """
+    try:
+        header = Path(path).read_text().strip()
+    except OSError:
+        header = ""
+    log = read_log_tail(progress_log_path(path)).strip()
+    parts = [header] if header else []
+    if log:
+        parts.append("## log (newest last)\n\n" + fit_tokens(log, budget, keep="tail"))
+    return "\n\n".join(parts)
 
 
 def write_progress_md(
@@ -266,7 +446,12 @@ def write_progress_md(
     phase: str = "executing",
     path: str = "PROGRESS.md",
 ) -> None:
-    """write PROGRESS.md with state + log"""
+    """replace PROGRESS.md with the current status
+
+    the file stays small (counts, workers, the last RECENT_ENTRIES log
+    lines) and is swapped in atomically, so readers never see a torn
+    write; the full log is appended to PROGRESS-LOG.md by log_entry()
+    """
     now = datetime.now().strftime("%b %d %H:%M:%S")
     pct = (completed / total * 100) if total > 0 else 0
     bar_len = 30
@@ -300,14 +485,18 @@ def write_progress_md(
         lines.append("")
 
     if _log_entries:
-        lines.append("## log")
+        lines.append("## recent")
         lines.append("")
         for entry in _log_entries:
             lines.append(entry)
         lines.append("")
+        lines.append(f"full log: {Path(progress_log_path(path)).name}")
+        lines.append("")
 
+    tmp = f"{path}.tmp"
     try:
-        with open(path, "w") as f:
+        with open(tmp, "w") as f:
             f.write("\n".join(lines))
+        os.replace(tmp, path)
     except OSError:
         pass
@@ -5,38 +5,67 @@ import logging
 import random
 import re
 import uuid
+from typing import Any
 
 from ship.claude_code import ClaudeCodeClient
-from ship.display import display, log_entry, write_progress_md
+from ship.config import DEFAULT_MODELS
+from ship.display import PanelEntry, display, log_entry, write_progress_md
+from ship.metrics import metrics
+from ship.prompt_builder import PromptBuilder, fit_tokens
+from ship.prompts import JUDGE_SUBJECT
 from ship.prompts import JUDGE_TASK
 from ship.prompts import VERIFIER
 from ship.refiner import Refiner
 from ship.replanner import Replanner
+from ship.scheduler import TaskQueue
+from ship.similarity import SimilarityIndex, near_duplicate
 from ship.state import StateManager
+from ship.status import StatusServer
 from ship.types_ import Task, TaskStatus
 
 
 MAX_RETRIES = 10
 CASCADE_PREFIX = "cascade:"
+# token budgets; worker output keeps its tail, where <summary>/<status> live
+RESULT_BUDGET = 150
+GOAL_BUDGET = 600
 
 
 def is_cascade_error(error: str) -> bool:
     return error.startswith(CASCADE_PREFIX)
 
 
+def parse_verdict(text: str) -> tuple[str, str]:
+    """(verdict, reason) from the judge's reply; verdict is "pass",
+    "fail", or "" when the reply carries no usable verdict"""
+    m = re.search(r"<verdict>\s*(pass|fail)\s*</verdict>", text, re.IGNORECASE)
+    if not m:
+        return "", ""
+    r = re.search(r"<reason>(.*?)</reason>", text, re.DOTALL)
+    reason = " ".join(r.group(1).split()) if r else ""
+    return m.group(1).lower(), reason
+
+
 class Judge:
     """narrow: judge tasks; medium: codex refine; wide: replan"""
 
     def __init__(
         self,
         state: StateManager,
-        queue: asyncio.Queue[Task],
+        queue: TaskQueue,
         project_context: str = "",
         max_refine_rounds: int = 10,
         max_replan_rounds: int = 1,
         verbosity: int = 1,
         use_codex: bool = False,
         progress_path: str = "PROGRESS.md",
+        max_cost: float = 0.0,
+        max_task_cost: float = 0.0,
+        num_workers: int = 1,
+        speculative_replan: float = 0.0,
+        models: dict[str, str] | None = None,
+        escalate_model: str = "sonnet",
+        status: StatusServer | None = None,
     ):
         self.state = state
         self.queue = queue
@@ -46,26 +75,45 @@ class Judge:
         self.max_replan_rounds = max_replan_rounds
         self.use_codex = use_codex
         self.progress_path = progress_path
+        self.max_cost = max_cost
+        self.max_task_cost = max_task_cost
+        self.num_workers = num_workers
+        self.speculative_replan = speculative_replan
         self.refine_count = 0
         self.replan_count = 0
         self._refine_timeouts = 0
         self._replan_timeouts = 0
         self._max_timeouts = 3
-        self.worker_tasks: dict[str, str] = {}
+        # worker id -> (task id, description) and the reverse, task id ->
+        # worker id, so panel rows find their worker in O(1)
+        self.worker_tasks: dict[str, tuple[str, str]] = {}
+        self._task_workers: dict[str, str] = {}
+        self.worker_progress: dict[str, str] = {}
+        self.phase = "executing"
+        self.status = status
+        self.models = {**DEFAULT_MODELS, **(models or {})}
         self.claude = ClaudeCodeClient(
-            model="sonnet",
+            model=self.models["judge"],
             role="judge",
         )
+        # second opinion when the judge model's answer does not parse
+        self.escalated = (
+            ClaudeCodeClient(model=escalate_model, role="judge")
+            if escalate_model and escalate_model != self.models["judge"]
+            else None
+        )
         self.refiner = Refiner(
             state,
             project_context,
             verbosity=verbosity,
+            progress_path=progress_path,
         )
         self.replanner = Replanner(
             state,
             project_context,
             verbosity=verbosity,
             progress_path=progress_path,
+            model=self.models["replanner"],
         )
         self._completed_queue: list[Task] = []
         self.adv_round = 0
@@ -74,41 +122,164 @@ class Judge:
         self._adv_attempts = 0
         self.max_adv_attempts = 3
         self._adv_timeouts = 0
-        self._seen_challenges: set[str] = set()
+        # challenges already turned into tasks, matched by similarity so a
+        # reworded repeat of an earlier challenge is not run again
+        self._seen_challenges = SimilarityIndex()
+        # verifier call started ahead of time while the last tasks run
+        self._verifier_task: asyncio.Task[str] | None = None
+        # replanner call started before the queue drained
+        self._spec_replan: asyncio.Task[list[Task]] | None = None
+
+    def set_worker_task(self, worker_id: str, task_id: str, desc: str) -> None:
+        self.clear_worker_task(worker_id, publish=False)
+        self.worker_tasks[worker_id] = (task_id, desc)
+        self._task_workers[task_id] = worker_id
+        self._publish("worker", worker=worker_id, task_id=task_id, task=desc)
+
+    def clear_worker_task(self, worker_id: str, publish: bool = True) -> None:
+        entry = self.worker_tasks.pop(worker_id, None)
+        self.worker_progress.pop(worker_id, None)
+        if entry and self._task_workers.get(entry[0]) == worker_id:
+            del self._task_workers[entry[0]]
+        if entry and publish:
+            self._publish("worker", worker=worker_id, task_id="", task="")
+
+    def note_progress(self, worker_id: str, msg: str) -> None:
+        self.worker_progress[worker_id] = msg
+        self._publish("progress", worker=worker_id, progress=msg)
+
+    def _set_phase(self, phase: str) -> None:
+        display.set_phase(phase)
+        if phase != self.phase:
+            self.phase = phase
+            self._publish("phase", phase=phase)
 
-    def set_worker_task(self, worker_id: str, desc: str) -> None:
-        self.worker_tasks[worker_id] = desc
+    def _publish(self, event: str, **data: Any) -> None:
+        if self.status:
+            self.status.publish(event, **data)
 
-    def clear_worker_task(self, worker_id: str) -> None:
-        self.worker_tasks.pop(worker_id, None)
+    def status_snapshot(self) -> dict[str, Any]:
+        """live view of the run, served by the status socket"""
+        work = self.state.get_work_state()
+        return {
+            "phase": self.phase,
+            "complete": bool(work and work.is_complete),
+            "queue": self.queue.qsize(),
+            "counts": self.state.status_counts(),
+            "num_workers": self.num_workers,
+            "workers": {
+                wid: {
+                    "task_id": tid,
+                    "task": desc,
+                    "progress": self.worker_progress.get(wid, ""),
+                }
+                for wid, (tid, desc) in sorted(self.worker_tasks.items())
+            },
+            "refine": {"count": self.refine_count, "max": self.max_refine_rounds},
+            "replan": {"count": self.replan_count, "max": self.max_replan_rounds},
+            "adversarial": {
+                "round": self.adv_round,
+                "max": self.max_adv_rounds,
+                "attempts": self._adv_attempts,
+                "running": len(self._adv_task_ids),
+            },
+            "cost_usd": round(self.state.run_cost(), 6),
+        }
 
     def notify_completed(self, task: Task) -> None:
         self._completed_queue.append(task)
 
     async def _judge_task(self, task: Task) -> None:
-        prompt = JUDGE_TASK.format(
-            description=task.description,
-            result=(task.result or "")[:500],
-            progress_path=self.progress_path,
+        if task.verdict:
+            # settled locally (CHECK_CMD passed): no LLM call
+            await self.state.set_verdict(task.id, task.verdict, task.verdict_reason)
+            return
+        prompt = (
+            PromptBuilder()
+            .prefix(JUDGE_TASK)
+            .suffix(
+                JUDGE_SUBJECT.format(
+                    description=task.description,
+                    result=fit_tokens(task.result or "", RESULT_BUDGET, keep="tail"),
+                )
+            )
+            .build()
         )
 
         display.event(f"  judging: {task.description[:50]}", min_level=2)
 
+        answer = await self._ask_judge(self.claude, prompt, task)
+        if answer is None:
+            return
+        verdict, reason = answer
+        # unparseable, or a rejection without a reason: ask the larger model
+        if self.escalated and (not verdict or (verdict == "fail" and not reason)):
+            logging.info(f"judge escalating {task.id[:8]} to {self.escalated.model}")
+            answer = await self._ask_judge(self.escalated, prompt, task)
+            if answer is None:
+                return
+            verdict, reason = answer
+        if not verdict:
+            logging.warning(f"judge gave no verdict for {task.id[:8]}")
+            return
+        await self.state.set_verdict(task.id, verdict, reason)
+        note = f": {reason}" if reason else ""
+        log_entry(f"verdict {verdict}: {task.description[:50]}{note}")
+        if verdict == "fail":
+            await self._queue_fix(task, reason)
+
+    async def _ask_judge(
+        self, client: ClaudeCodeClient, prompt: str, task: Task
+    ) -> tuple[str, str] | None:
+        """parsed verdict, or None when the call failed"""
         try:
-            await self.claude.execute(prompt, timeout=45)
+            output, _ = await client.execute(prompt, timeout=45, task_id=task.id)
         except RuntimeError as e:
             logging.warning(f"judge task failed: {e}")
             log_entry(f"judge skip: {task.description[:40]}")
+            return None
+        finally:
+            await self.state.add_usage("judge", client.last_usage, task.id)
+        return parse_verdict(output)
+
+    async def _queue_fix(self, task: Task, reason: str) -> Task | None:
+        """queue a task fixing what the judge rejected
+
+        a fix task's own failed verdict is left to the refiner and
+        replanner, so a stubborn gap cannot spawn an endless chain
+        """
+        if task.fix_of:
+            log_entry(f"judge fail (fix): {task.description[:40]}")
+            return None
+        fix = Task(
+            id=str(uuid.uuid4()),
+            description=(
+                f"Fix: {task.description}\n"
+                f"Judge rejected the previous attempt: {reason or 'incomplete'}"
+            ),
+            files=list(task.files),
+            status=TaskStatus.PENDING,
+            fix_of=task.id,
+        )
+        if not await self.state.add_task(fix):
+            return None
+        await self.queue.put(fix)
+        log_entry(f"judge fail: {task.description[:40]} -> fix {fix.id[:8]}")
+        display.event(f"  judge rejected {task.id[:8]}, queued fix")
+        return fix
+
+    def _over_budget(self) -> bool:
+        return bool(self.max_cost) and self.state.run_cost() >= self.max_cost
+
+    def _task_over_budget(self, task: Task) -> bool:
+        return bool(self.max_task_cost) and task.usage.cost_usd >= self.max_task_cost
 
     def _update_tui(self, tasks: list[Task]) -> None:
-        def _entry(t: Task) -> tuple[str, TaskStatus, str, str, str]:
+        def _entry(t: Task) -> PanelEntry:
             worker = ""
             if t.status is TaskStatus.RUNNING:
-                for wid, desc in self.worker_tasks.items():
-                    if desc == t.description:
-                        worker = wid
-                        break
-            return (t.description, t.status, worker, t.summary, t.error)
+                worker = self._task_workers.get(t.id, "")
+            return (t.id, t.description, t.status, worker, t.summary, t.error)
 
         all_panel = [_entry(t) for t in tasks]
         display.set_tasks(all_panel)
@@ -123,17 +294,20 @@ class Judge:
         failed = counts.get(TaskStatus.FAILED, 0)
 
         display.set_global(completed, total)
+        work = self.state.get_work_state()
+        if work:
+            display.set_usage(work.usage.tokens, work.usage.cost_usd)
         if self.refine_count > 0:
             phase = f"refining ({self.refine_count}/{self.max_refine_rounds})"
         elif self.replan_count > 0:
             phase = f"replanning ({self.replan_count}/{self.max_replan_rounds})"
         else:
             phase = "executing"
-        display.set_phase(phase)
+        self._set_phase(phase)
 
         if not display._plan_shown:
             display.show_plan(all_panel)
-        display.refresh()
+        display.request_refresh()
 
         write_progress_md(
             total,
@@ -141,7 +315,7 @@ class Judge:
             running,
             pending,
             failed,
-            [f"{k}: {v}" for k, v in sorted(self.worker_tasks.items())],
+            [f"{k}: {desc}" for k, (_, desc) in sorted(self.worker_tasks.items())],
             path=self.progress_path,
         )
 
@@ -156,32 +330,198 @@ class Judge:
             if c.strip()
         ]
 
-    async def _run_adversarial_round(self) -> bool | None:
-        """returns True if max attempts exhausted, None if timed out (retry)"""
+    def _refinement_done(self) -> bool:
+        """refine and replan rounds used up: only verification is left"""
+        refined = not self.use_codex or self.refine_count >= self.max_refine_rounds
+        return refined and self.replan_count >= self.max_replan_rounds
+
+    def _maybe_prefetch(self, tasks: list[Task]) -> None:
+        """start the next verifier call while the last tasks still run
+
+        only once refine/replan are done, nothing is left in the queue
+        and at least one worker sits idle; the round picks it up later
+        """
+        if self._verifier_task is not None or not self._refinement_done():
+            return
         if self._adv_attempts >= self.max_adv_attempts:
-            display.event("  verification: no more novel challenges")
-            logging.warning("verification exhausted novel challenges")
-            return True
+            return
+        running = sum(1 for t in tasks if t.status is TaskStatus.RUNNING)
+        pending = sum(1 for t in tasks if t.status is TaskStatus.PENDING)
+        if pending or not running or running >= self.num_workers:
+            return
+        logging.info("prefetching verifier challenges")
+        self._verifier_task = asyncio.create_task(self._generate_challenges())
+
+    def _cancel_background(self) -> None:
+        """drop prefetched verifier / speculative replan calls in flight"""
+        if self._verifier_task is not None:
+            self._verifier_task.cancel()
+            self._verifier_task = None
+        if self._spec_replan is not None:
+            self._spec_replan.cancel()
+            self._spec_replan = None
+
+    def _maybe_speculate(self, tasks: list[Task]) -> None:
+        """start the replanner before the queue drains
+
+        once speculative_replan of the tasks are done and a worker sits
+        idle; the proposals are reconciled when the call returns
+        """
+        if not self.speculative_replan or self._spec_replan is not None:
+            return
+        if self.replan_count >= self.max_replan_rounds or not tasks:
+            return
+        done = sum(1 for t in tasks if t.status is TaskStatus.COMPLETED)
+        running = sum(1 for t in tasks if t.status is TaskStatus.RUNNING)
+        if not running or running >= self.num_workers:
+            return
+        if done / len(tasks) < self.speculative_replan:
+            return
+        logging.info(f"speculative replan at {done}/{len(tasks)} done")
+        display.event("  replanning ahead of the last tasks...", min_level=2)
+        self._spec_replan = asyncio.create_task(self.replanner.replan(add=False))
+
+    async def _finish_speculative(self) -> list[Task]:
+        """await the speculative replan and queue what is still needed
+
+        proposals that match a task added or completed since the call
+        started are dropped; returns the queued tasks
+        """
+        assert self._spec_replan is not None
+        pending, self._spec_replan = self._spec_replan, None
+        try:
+            proposals = await pending
+        except RuntimeError:
+            self._replan_timeouts += 1
+            return []
+        self.replan_count += 1
+        queued = await self._add_new(proposals)
+        if queued:
+            log_entry(f"+{len(queued)} from speculative replan")
+            display.event(f"  +{len(queued)} replanned tasks")
+            display._plan_shown = False
+        return queued
+
+    async def _add_new(self, proposals: list[Task]) -> list[Task]:
+        """add and queue proposals that are not near duplicates
+
+        the state's similarity index checks each against every live task
+        and the proposals added before it; returns the tasks queued
+        """
+        queued: list[Task] = []
+        for task in proposals:
+            if not await self.state.add_task(task, dedupe=True):
+                continue
+            await self.queue.put(task)
+            queued.append(task)
+        return queued
+
+    async def _refine_round(self) -> list[Task] | None:
+        """refiner and, while replan rounds remain, replanner side by side
+
+        returns the merged new tasks, or None when the refiner timed
+        out and the round should be retried next cycle
+        """
+        self.refine_count += 1
+        with_replan = (
+            self._spec_replan is None and self.replan_count < self.max_replan_rounds
+        )
+        if with_replan:
+            self.replan_count += 1
+        label = f"refining ({self.refine_count}/{self.max_refine_rounds})"
+        display.event(
+            f"  {label}{' + replanning' if with_replan else ''}...", min_level=2
+        )
+        self._set_phase(label)
+        display.request_refresh()
+
+        calls = [self.refiner.refine(add=False)]
+        if with_replan:
+            calls.append(self.replanner.replan(add=False))
+        results = await asyncio.gather(*calls, return_exceptions=True)
+
+        retry = False
+        proposals: list[Task] = []
+        refined = results[0]
+        if isinstance(refined, BaseException):
+            if not isinstance(refined, RuntimeError):
+                raise refined
+            self._refine_timeouts += 1
+            if self._refine_timeouts >= self._max_timeouts:
+                display.event("  refiner: timed out, escalating")
+            else:
+                self.refine_count -= 1
+                retry = True
+        else:
+            proposals.extend(refined)
+        if with_replan:
+            replanned = results[1]
+            if isinstance(replanned, BaseException):
+                if not isinstance(replanned, RuntimeError):
+                    raise replanned
+                self._replan_timeouts += 1
+                if self._replan_timeouts >= self._max_timeouts:
+                    display.event("  replanner: timed out, escalating")
+                else:
+                    self.replan_count -= 1
+            else:
+                proposals.extend(replanned)
+
+        queued = await self._add_new(proposals)
+        if queued:
+            log_entry(f"+{len(queued)} from refiner/replanner")
+            display.event(f"  +{len(queued)} follow-up tasks")
+            display._plan_shown = False
+        if retry and not queued:
+            return None
+        return queued
 
+    async def _generate_challenges(self) -> str:
+        """one verifier call; raises RuntimeError on failure/timeout"""
         work = self.state.get_work_state()
         if not work:
-            return True
-
+            return ""
         verifier = ClaudeCodeClient(
-            model="sonnet",
+            model=self.models["verifier"],
             role="verifier",
         )
         prompt = VERIFIER.format(
-            goal_text=work.goal_text[:2000],
+            goal_text=fit_tokens(work.goal_text, GOAL_BUDGET),
             project_context=self.project_context,
         )
+        try:
+            result, _ = await verifier.execute(prompt, timeout=600)
+        finally:
+            await self.state.add_usage("verifier", verifier.last_usage)
+        return result
+
+    async def _run_adversarial_round(self, idle: int = 1) -> bool | None:
+        """returns True if max attempts exhausted, None if timed out (retry)
 
+        queues up to max(1, idle) novel challenges
+        """
+        if self._adv_attempts >= self.max_adv_attempts:
+            self._cancel_background()
+            display.event("  verification: no more novel challenges")
+            logging.warning("verification exhausted novel challenges")
+            return True
+
+        work = self.state.get_work_state()
+        if not work:
+            return True
+
+        prefetched = self._verifier_task is not None
         display.event(
-            f"  adversarial round {self.adv_round + 1}/{self.max_adv_rounds}..."
+            f"  adversarial round {self.adv_round + 1}/{self.max_adv_rounds}"
+            + (" (prefetched)..." if prefetched else "...")
         )
+        pending = self._verifier_task or asyncio.create_task(
+            self._generate_challenges()
+        )
+        self._verifier_task = None
 
         try:
-            result, _ = await verifier.execute(prompt, timeout=600)
+            result = await pending
         except RuntimeError as e:
             self._adv_timeouts += 1
             logging.warning(f"verifier timed out or errored: {e}")
@@ -198,13 +538,17 @@ class Judge:
             display.event("  verifier: no challenges found")
             return False
 
-        novel = [c for c in challenges if c not in self._seen_challenges]
+        novel: list[str] = []
+        for c in challenges:
+            if c in self._seen_challenges or any(near_duplicate(c, n) for n in novel):
+                continue
+            novel.append(c)
         if not novel:
             logging.warning("all challenges already seen")
             display.event("  verifier: no novel challenges")
             return False
 
-        picked = random.sample(novel, min(2, len(novel)))
+        picked = random.sample(novel, min(max(1, idle), len(novel)))
         for c in picked:
             self._seen_challenges.add(c)
 
@@ -237,7 +581,7 @@ class Judge:
                 return "pending"
 
         for t in adv_tasks:
-            if t.status is TaskStatus.FAILED:
+            if t.status is TaskStatus.FAILED or t.verdict == "fail":
                 return "fail"
 
         return "pass"
@@ -256,6 +600,21 @@ class Judge:
 
                 all_tasks = await self.state.get_all_tasks()
                 self._update_tui(all_tasks)
+                for name, n in self.state.status_counts().items():
+                    metrics.tasks.set(n, status=name)
+
+                if self._over_budget():
+                    # stop dispatching; let running tasks drain, then exit
+                    if any(t.status is TaskStatus.RUNNING for t in all_tasks):
+                        continue
+                    display.clear_status()
+                    display.event(
+                        f"  budget exhausted (${self.state.run_cost():.2f}"
+                        f" of ${self.max_cost:.2f}) — raise MAX_COST to continue"
+                    )
+                    logging.warning("run budget exhausted, stopping")
+                    self._cancel_background()
+                    return
 
                 retryable = [
                     t
@@ -265,10 +624,11 @@ class Judge:
                     and not is_cascade_error(t.error)
                 ]
                 for task in retryable:
-                    if task.retries >= MAX_RETRIES:
+                    if task.retries >= MAX_RETRIES or self._task_over_budget(task):
                         # exhausted retries -- cascade
                         cascaded = await self.state.cascade_failure(task.id)
                         if cascaded:
+                            metrics.cascades.inc(len(cascaded))
                             log_entry(
                                 f"cascade: {task.id[:8]} -> {len(cascaded)} tasks"
                             )
@@ -278,11 +638,18 @@ class Judge:
                         continue
                     await self.state.retry_task(task.id)
                     await self.queue.put(task)
+                    metrics.retries.inc()
                     log_entry(f"retry: {task.description[:50]}")
                     display.event(
                         f"  retry {task.id[:8]} ({task.retries + 1}/{MAX_RETRIES})"
                     )
 
+                self._maybe_prefetch(all_tasks)
+                if self._spec_replan is None:
+                    self._maybe_speculate(all_tasks)
+                elif self._spec_replan.done():
+                    await self._finish_speculative()
+
                 if self._adv_task_ids:
                     outcome = await self._check_adv_batch()
                     if outcome == "pending":
@@ -290,6 +657,7 @@ class Judge:
                     if outcome == "fail":
                         display.event("  verification found gaps — re-checking...")
                         log_entry("adv fail: resetting")
+                        self._cancel_background()
                         self._adv_task_ids.clear()
                         self._seen_challenges.clear()
                         self.adv_round = 0
@@ -308,6 +676,7 @@ class Judge:
                         display.clear_status()
                         display.event("  all verified — no issues found")
                         logging.info("goal satisfied (verification clean)")
+                        self._cancel_background()
                         await self.state.mark_complete()
                         return
                     continue
@@ -316,30 +685,12 @@ class Judge:
                     continue
 
                 if self.use_codex and self.refine_count < self.max_refine_rounds:
-                    self.refine_count += 1
-                    display.event(
-                        f"  refining ({self.refine_count}/{self.max_refine_rounds})...",
-                        min_level=2,
-                    )
-                    display.set_phase(
-                        f"refining ({self.refine_count}/{self.max_refine_rounds})"
-                    )
-                    display.refresh()
-                    try:
-                        new_tasks = await self.refiner.refine()
-                    except RuntimeError:
-                        self._refine_timeouts += 1
-                        if self._refine_timeouts >= self._max_timeouts:
-                            display.event("  refiner: timed out, escalating")
-                        else:
-                            self.refine_count -= 1
-                            continue
-                    if new_tasks:
-                        log_entry(f"+{len(new_tasks)} from refiner")
-                        display.event(f"  +{len(new_tasks)} follow-up tasks")
-                        display._plan_shown = False
-                        for task in new_tasks:
-                            await self.queue.put(task)
+                    new_tasks = await self._refine_round()
+                    if new_tasks is None or new_tasks:
+                        continue
+
+                if self._spec_replan is not None:
+                    if await self._finish_speculative():
                         continue
 
                 if self.replan_count < self.max_replan_rounds:
@@ -348,10 +699,10 @@ class Judge:
                         f"  replanning ({self.replan_count}/{self.max_replan_rounds})...",
                         min_level=2,
                     )
-                    display.set_phase(
+                    self._set_phase(
                         f"replanning ({self.replan_count}/{self.max_replan_rounds})"
                     )
-                    display.refresh()
+                    display.request_refresh()
                     try:
                         new_tasks = await self.replanner.replan()
                     except RuntimeError:
@@ -369,7 +720,10 @@ class Judge:
                             await self.queue.put(task)
                         continue
 
-                gave_up = await self._run_adversarial_round()
+                running = sum(1 for t in all_tasks if t.status is TaskStatus.RUNNING)
+                gave_up = await self._run_adversarial_round(
+                    idle=self.num_workers - running
+                )
                 if gave_up is None:
                     continue
                 if gave_up:
@@ -379,10 +733,12 @@ class Judge:
                     else:
                         display.event("  all verified — no issues found")
                     logging.info("goal satisfied")
+                    self._cancel_background()
                     await self.state.mark_complete()
                     return
                 continue
 
         except asyncio.CancelledError:
+            self._cancel_background()
             logging.info("judge stopping")
             raise
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+
+from ship.types_ import Task, TaskStatus
+
+MIN_SAMPLES = 5
+SAFETY_FACTOR = 2.0
+FLOOR_TIMEOUT = 300
+FLOOR_TURNS = 10
+
+
+@dataclass(frozen=True, slots=True)
+class Limits:
+    timeout: int
+    max_turns: int
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """nearest-rank percentile; values must be non-empty"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def adaptive_limits(
+    history: list[Task],
+    cap_timeout: int,
+    cap_turns: int,
+    factor: float = SAFETY_FACTOR,
+    min_samples: int = MIN_SAMPLES,
+) -> Limits:
+    """p95 of completed tasks' duration and turns times factor
+
+    the configured values stay hard caps; until min_samples tasks have
+    completed in this run the caps are used as-is
+    """
+    durations: list[float] = []
+    turns: list[float] = []
+    for t in history:
+        if t.status is not TaskStatus.COMPLETED:
+            continue
+        if t.started_at and t.completed_at:
+            durations.append((t.completed_at - t.started_at).total_seconds())
+        if t.turns:
+            turns.append(t.turns)
+
+    timeout = cap_timeout
+    if len(durations) >= min_samples:
+        learned = int(percentile(durations, 95) * factor)
+        timeout = min(cap_timeout, max(FLOOR_TIMEOUT, learned))
+
+    max_turns = cap_turns
+    if len(turns) >= min_samples:
+        learned = math.ceil(percentile(turns, 95) * factor)
+        max_turns = min(cap_turns, max(FLOOR_TURNS, learned))
+
+    return Limits(timeout=timeout, max_turns=max_turns)
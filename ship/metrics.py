@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import math
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TypeVar
+
+OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_HOST = "127.0.0.1"
+TEXTFILE_INTERVAL = 15.0  # seconds between textfile rewrites
+
+# bucket bounds in seconds, sized for what each histogram measures
+LLM_BUCKETS = (1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 2400)
+FIRST_EVENT_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+TASK_BUCKETS = (30, 60, 120, 300, 600, 1200, 2400, 3600)
+WAIT_BUCKETS = (1, 5, 15, 30, 60, 300, 900, 1800, 3600)
+
+
+def _fmt(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labelset(names: tuple[str, ...], values: tuple[str, ...], **extra: str) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {labels}")
+        return tuple(str(labels[n]) for n in self.labels)
+
+    @abstractmethod
+    def samples(self, openmetrics: bool) -> Iterator[str]:
+        """sample lines, after the family's TYPE/HELP/UNIT lines"""
+
+    def render(self, openmetrics: bool = True) -> list[str]:
+        # Prometheus text names the counter family by its _total sample
+        family = self.name
+        if self.kind == "counter" and not openmetrics:
+            family += "_total"
+        lines = [f"# TYPE {family} {self.kind}", f"# HELP {family} {self.help}"]
+        if openmetrics and self.name.endswith("_seconds"):
+            lines.append(f"# UNIT {family} seconds")
+        return [*lines, *self.samples(openmetrics)]
+
+
+M = TypeVar("M", bound=_Metric)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError(f"{self.name}: counters only go up")
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self, openmetrics: bool) -> Iterator[str]:
+        values = self._values or ({} if self.labels else {(): 0})
+        for key, v in sorted(values.items()):
+            yield f"{self.name}_total{_labelset(self.labels, key)} {_fmt(v)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self, openmetrics: bool) -> Iterator[str]:
+        values = self._values or ({} if self.labels else {(): 0})
+        for key, v in sorted(values.items()):
+            yield f"{self.name}{_labelset(self.labels, key)} {_fmt(v)}"
+
+
+class Histogram(_Metric):
+    """cumulative buckets plus _sum and _count, per label set"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LLM_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = (*sorted(float(b) for b in buckets), math.inf)
+        # per label set: [per-bucket counts..., sum]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        row = self._values.setdefault(key, [0] * (len(self.buckets) + 1))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                row[i] += 1
+                break
+        row[-1] += value
+
+    def count(self, **labels: str) -> int:
+        row = self._values.get(self._key(labels))
+        return int(sum(row[:-1])) if row else 0
+
+    def samples(self, openmetrics: bool) -> Iterator[str]:
+        for key, row in sorted(self._values.items()):
+            cumulative = 0.0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                le = _labelset(self.labels, key, le=_fmt(bound))
+                yield f"{self.name}_bucket{le} {_fmt(cumulative)}"
+            labels = _labelset(self.labels, key)
+            yield f"{self.name}_count{labels} {_fmt(cumulative)}"
+            yield f"{self.name}_sum{labels} {_fmt(row[-1])}"
+
+
+class Registry:
+    """a set of metrics rendered together
+
+    OpenMetrics text for scrapers that ask for it, Prometheus text 0.0.4
+    otherwise (and for node_exporter's textfile collector)
+    """
+
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+
+    def _add(self, metric: M) -> M:
+        if any(m.name == metric.name for m in self._metrics):
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LLM_BUCKETS,
+    ) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def render(self, openmetrics: bool = True) -> str:
+        lines = [line for m in self._metrics for line in m.render(openmetrics)]
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class Metrics(Registry):
+    """the run's metrics; updated from the event loop only"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.tasks = self.gauge(
+            "ship_tasks", "tasks in the plan by status", ("status",)
+        )
+        self.tasks_finished = self.counter(
+            "ship_tasks_finished", "task attempts finished by outcome", ("outcome",)
+        )
+        self.task_duration = self.histogram(
+            "ship_task_duration_seconds",
+            "wall time of a task attempt by outcome",
+            ("outcome",),
+            TASK_BUCKETS,
+        )
+        self.queue_wait = self.histogram(
+            "ship_task_queue_wait_seconds",
+            "time a task spent queued before a worker took it",
+            buckets=WAIT_BUCKETS,
+        )
+        self.retries = self.counter("ship_task_retries", "failed tasks requeued")
+        self.cascades = self.counter(
+            "ship_task_cascades", "tasks failed by a dependency that gave up"
+        )
+        self.llm_call = self.histogram(
+            "ship_llm_call_seconds",
+            "claude CLI call latency by role and outcome",
+            ("role", "outcome"),
+            LLM_BUCKETS,
+        )
+        self.llm_first_event = self.histogram(
+            "ship_llm_first_event_seconds",
+            "time from claude CLI spawn to its first stream event",
+            ("role",),
+            FIRST_EVENT_BUCKETS,
+        )
+        self.workers = self.gauge("ship_workers", "configured workers")
+        self.workers_busy = self.gauge("ship_workers_busy", "workers running a task")
+        self.worker_busy = self.counter(
+            "ship_worker_busy_seconds",
+            "seconds each worker spent on tasks",
+            ("worker",),
+        )
+
+
+metrics = Metrics()
+
+
+def parse_addr(addr: str) -> tuple[str, int]:
+    """ "9464" or "host:9464" -> (host, port); host defaults to localhost"""
+    host, _, port = addr.rpartition(":")
+    try:
+        num = int(port)
+    except ValueError:
+        raise ValueError(f"invalid metrics address: {addr!r}") from None
+    if not 0 <= num < 65536:
+        raise ValueError(f"invalid metrics port: {num}")
+    return host.strip("[]") or DEFAULT_HOST, num
+
+
+def write_textfile(registry: Registry, path: Path) -> None:
+    """write atomically, so the collector never reads half a file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(registry.render(openmetrics=False))
+    os.replace(tmp, path)
+
+
+class MetricsExporter:
+    """serves a registry over HTTP (GET /metrics) and/or a textfile
+
+    the HTTP listener binds to localhost unless addr names a host; the
+    textfile is rewritten every `interval` seconds and once more on
+    stop(), for node_exporter's textfile collector (name it *.prom)
+    """
+
+    def __init__(
+        self,
+        registry: Registry,
+        addr: str = "",
+        textfile: str = "",
+        interval: float = TEXTFILE_INTERVAL,
+    ):
+        self.registry = registry
+        self.addr = addr
+        self.textfile = Path(textfile) if textfile else None
+        self.interval = interval
+        self.port = 0  # bound port, once listening
+        self._server: asyncio.Server | None = None
+        self._writer: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        """raises ValueError for a bad address, OSError if it cannot bind"""
+        if self.addr:
+            host, port = parse_addr(self.addr)
+            self._server = await asyncio.start_server(self._serve, host, port)
+            self.port = self._server.sockets[0].getsockname()[1]
+        if self.textfile:
+            self._write()
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self) -> None:
+        if self._writer:
+            self._writer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._writer
+            self._writer = None
+            self._write()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _write(self) -> None:
+        assert self.textfile is not None
+        try:
+            write_textfile(self.registry, self.textfile)
+        except OSError as e:
+            logging.warning(f"metrics textfile: {e}")
+
+    async def _write_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self._write()
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            async with asyncio.timeout(5):
+                request = await reader.readline()
+                headers = []
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    headers.append(line.decode(errors="replace").lower())
+            method, path, *_ = request.decode(errors="replace").split() + ["", ""]
+            if method not in ("GET", "HEAD"):
+                status, ctype, body = "405 Method Not Allowed", "text/plain", b""
+            elif path.split("?")[0] not in ("/metrics", "/"):
+                status, ctype, body = "404 Not Found", "text/plain", b""
+            else:
+                accept = "".join(h for h in headers if h.startswith("accept:"))
+                om = "application/openmetrics-text" in accept
+                status = "200 OK"
+                ctype = OPENMETRICS_TYPE if om else PROMETHEUS_TYPE
+                body = self.registry.render(openmetrics=om).encode()
+            head = (
+                f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+            )
+            writer.write(head.encode() + (b"" if method == "HEAD" else body))
+            await writer.drain()
+        except (TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
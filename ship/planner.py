@@ -5,6 +5,7 @@ import re
 import uuid
 from pathlib import Path
 
+from ship.cache import ResponseCache
 from ship.claude_code import ClaudeCodeClient
 from ship.config import Config
 from ship.prompts import PLANNER
@@ -23,8 +24,9 @@ class Planner:
         self.cfg = cfg
         self.state = state
         self.claude = ClaudeCodeClient(
-            model="sonnet",
+            model=cfg.model("planner"),
             role="planner",
+            cache=ResponseCache.from_config(cfg),
         )
 
     async def plan_once(self) -> list[Task]:
@@ -37,6 +39,7 @@ class Planner:
         context, tasks, mode = await self._parse_design(
             work.goal_text, override_prompt=work.override_prompt
         )
+        await self.state.add_usage("planner", self.claude.last_usage)
 
         if context:
             await self.state.set_project_context(context)
@@ -67,11 +70,37 @@ class Planner:
                 print(
                     f"\n{'=' * 60}\nPLANNER RESPONSE:\n{'=' * 60}\n{result}\n{'=' * 60}\n"
                 )
-            return self._parse_xml(result)
+            parsed = self._parse_xml(result)
+            if parsed[1]:
+                self._sync_plan(prompt, Path(plan_path))
+            else:
+                self.claude.forget(prompt)
+            return parsed
         except RuntimeError as e:
             logging.warning(f"claude parsing failed: {e}")
             return "", [], "parallel"
 
+    def _sync_plan(self, prompt: str, plan_path: Path) -> None:
+        """keep PLAN.md paired with the cached planner response
+
+        the planner writes PLAN.md as a side effect, which a cache hit
+        skips; store the file next to the response and restore it on hits
+        """
+        cache = self.claude.cache
+        if not cache:
+            return
+        model = self.claude.model
+        if self.claude.last_cached and not plan_path.exists():
+            plan = cache.get("planner-plan", model, prompt)
+            if plan is not None:
+                plan_path.parent.mkdir(parents=True, exist_ok=True)
+                plan_path.write_text(plan)
+            return
+        try:
+            cache.put("planner-plan", model, prompt, plan_path.read_text())
+        except OSError:
+            pass
+
     def _parse_xml(self, text: str) -> tuple[str, list[Task], str]:
         context_match = re.search(r"<context>(.*?)</context>", text, re.DOTALL)
         context = context_match.group(1).strip() if context_match else ""
@@ -100,11 +129,18 @@ class Planner:
                 int(p.strip()) for p in depends_str.split(",") if p.strip().isdigit()
             ]
 
+            files_m = re.search(r'files="([^"]*)"', attrs)
+            files = (
+                [f.strip() for f in files_m.group(1).split(",") if f.strip()]
+                if files_m
+                else []
+            )
+
             tasks.append(
                 Task(
                     id=str(uuid.uuid4()),
                     description=desc,
-                    files=[],
+                    files=files,
                     status=TaskStatus.PENDING,
                     worker=worker,
                 )
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from ship.checkpoint import tree_hash
+from ship.claude_code import kill_process_group
+
+OUTPUT_TAIL = 4000  # chars of check output kept for the retry prompt
+
+
+@dataclass(frozen=True, slots=True)
+class CheckResult:
+    ok: bool
+    output: str  # tail of combined stdout + stderr
+    tree: str = ""  # working tree sha the check ran against
+    cached: bool = False
+
+
+class PreCheck:
+    """runs the project's CHECK_CMD (build, lint, tests) after a task
+
+    results are memoized by working tree hash (untracked files
+    included, `exclude` paths such as the data dir left out): a tree
+    that was already checked is not checked again, and concurrent
+    callers on the same tree share one run. a timeout or a command
+    that cannot start is inconclusive and returns None.
+    """
+
+    def __init__(self, cmd: str, timeout: int = 600, exclude: tuple[str, ...] = ()):
+        self.cmd = cmd
+        self.timeout = timeout
+        self.exclude = exclude
+        self._results: dict[str, CheckResult] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def run(self, cwd: Path | None = None) -> CheckResult | None:
+        tree = await tree_hash(cwd, self.exclude)
+        if not tree:
+            return await self._exec(cwd, "")
+        async with self._locks.setdefault(tree, asyncio.Lock()):
+            hit = self._results.get(tree)
+            if hit:
+                return replace(hit, cached=True)
+            result = await self._exec(cwd, tree)
+            if result is not None:
+                self._results[tree] = result
+            return result
+
+    async def _exec(self, cwd: Path | None, tree: str) -> CheckResult | None:
+        try:
+            proc = await asyncio.create_subprocess_shell(
+                self.cmd,
+                cwd=cwd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                start_new_session=True,
+            )
+        except OSError as e:
+            logging.warning(f"check command failed to start: {e}")
+            return None
+        try:
+            out, _ = await asyncio.wait_for(proc.communicate(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            await kill_process_group(proc)
+            logging.warning(f"check command timeout after {self.timeout}s")
+            return None
+        except asyncio.CancelledError:
+            await kill_process_group(proc)
+            raise
+        output = out.decode(errors="replace").strip()[-OUTPUT_TAIL:]
+        return CheckResult(ok=proc.returncode == 0, output=output, tree=tree)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """local token estimate, no tokenizer needed
+
+    BPE tokenizers land near 4 bytes/token on prose and closer to one
+    token per word or symbol on code; take the larger of the two
+    """
+    if not text:
+        return 0
+    return max(len(_TOKEN_RE.findall(text)), (len(text.encode()) + 3) // 4)
+
+
+def fit_tokens(text: str, budget: int, keep: str = "head") -> str:
+    """trim text to ~budget tokens at line boundaries
+
+    keep="head" keeps the start, keep="tail" the end; a marker line
+    says how much was dropped
+    """
+    if budget <= 0:
+        return ""
+    if estimate_tokens(text) <= budget:
+        return text
+    lines = text.splitlines()
+    if keep == "tail":
+        lines.reverse()
+    kept: list[str] = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    if not kept and lines:
+        # a single line over budget: cut it by the byte estimate
+        first = lines[0]
+        n = budget * 4
+        kept = [first[:n] if keep == "head" else first[-n:]]
+    dropped = len(lines) - len(kept)
+    marker = f"... ({dropped} lines omitted)" if dropped else "..."
+    if keep == "tail":
+        kept.reverse()
+        return "\n".join([marker, *kept])
+    return "\n".join([*kept, marker])
+
+
+class FileCache:
+    """file contents cached until the file's mtime or size changes"""
+
+    def __init__(self):
+        self._entries: dict[Path, tuple[int, int, str]] = {}
+
+    def read(self, path: str | Path) -> str:
+        """contents of path; raises OSError like Path.read_text"""
+        p = Path(path)
+        st = p.stat()
+        hit = self._entries.get(p)
+        if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            return hit[2]
+        text = p.read_text()
+        self._entries[p] = (st.st_mtime_ns, st.st_size, text)
+        return text
+
+
+class PromptBuilder:
+    """prompt as a shared prefix plus a per-call suffix
+
+    prefix sections must depend only on run-wide inputs (spec, plan,
+    instructions) so concurrent callers send byte-identical leading
+    bytes and provider prompt caching hits; per-task content goes in
+    the suffix. every section can carry its own token budget.
+    """
+
+    def __init__(self):
+        self._prefix: list[str] = []
+        self._suffix: list[str] = []
+
+    def prefix(
+        self, text: str, budget: int | None = None, keep: str = "head"
+    ) -> PromptBuilder:
+        self._add(self._prefix, text, budget, keep)
+        return self
+
+    def suffix(
+        self, text: str, budget: int | None = None, keep: str = "head"
+    ) -> PromptBuilder:
+        self._add(self._suffix, text, budget, keep)
+        return self
+
+    @staticmethod
+    def _add(parts: list[str], text: str, budget: int | None, keep: str) -> None:
+        if budget is not None:
+            text = fit_tokens(text, budget, keep)
+        if text.strip():
+            parts.append(text.strip())
+
+    def build(self) -> str:
+        return "\n\n".join([*self._prefix, *self._suffix])
+
+
+# singleton
+file_cache = FileCache()
@@ -89,10 +89,11 @@ modules/files, important patterns or constraints workers must know.
 This is the only context workers get — make it count.</context>
 <mode>parallel|sequential</mode>
 <tasks>
-<task worker="auto">Build the HTTP server with health/metrics endpoints,
-middleware stack, and graceful shutdown</task>
-<task worker="auto">Build the storage layer: schema, migrations, and
-repository pattern with CRUD for all entities</task>
+<task worker="auto" files="src/server/">Build the HTTP server with
+health/metrics endpoints, middleware stack, and graceful shutdown</task>
+<task worker="auto" files="src/store/,migrations/">Build the storage
+layer: schema, migrations, and repository pattern with CRUD for all
+entities</task>
 <task worker="auto" depends="1,2">Integration tests: spin up test server,
 hit all endpoints, verify DB round-trips</task>
 </tasks>
@@ -141,6 +142,9 @@ requirements. Enough for the worker to own it end-to-end.
   also discover these themselves.
 - Use `depends="N"` or `depends="N,M"` to declare dependencies on earlier
   tasks (1-indexed). Tasks without depends can run in parallel.
+- Optionally add `files="a.py,src/pkg/"` with the files or directories a
+  task will mostly edit; tasks with overlapping files are not run at the
+  same time.
 - Skip explanations, examples, documentation-only tasks.
 """.strip()
 
@@ -164,9 +168,6 @@ from re-exploring the codebase:
 
 ## How to Work
 
-You have a {timeout_min}-minute timeout. If you time out, the task will
-be retried automatically. Focus on making progress.
-
 Break this work package into subtasks using the TodoWrite tool (Claude's
 built-in task list), then work through them systematically.
 
@@ -211,30 +212,48 @@ If you could NOT fully complete the task:
 <task>description of remaining work</task>
 </followups>
 ```
+""".strip()
 
+WORKER_TASK = """
 ## Your Task
 
 {description}
+
+You have a {timeout_min}-minute timeout. If you time out, the task will
+be retried automatically. Focus on making progress.
+""".strip()
+
+CHECK_FAILED = """
+## Previous Attempt
+
+After the previous attempt the project check `{cmd}` failed. Make it
+pass. Its output (tail):
+
+```
+{output}
+```
 """.strip()
 
 JUDGE_TASK = """
-## Task
+## Role
 
-A worker just completed this task:
+A worker just completed the task below. Read the files it claims to
+have created/modified. Did it actually complete the task? If not,
+what's wrong? Do not edit any files.
+
+End your reply with:
+<verdict>pass</verdict> or <verdict>fail</verdict>
+<reason>what is missing or wrong, one sentence (empty on pass)</reason>
+""".strip()
+
+JUDGE_SUBJECT = """
+## Task
 
 > {description}
 
 ## Worker Output (truncated)
 
 {result}
-
-## Instructions
-
-Read the files it claims to have created/modified. In one sentence: did it
-actually complete the task? If not, what's wrong?
-
-Append your verdict to `{progress_path}` under a `## log` section.
-Format: `- HH:MM task: verdict`. Create the file/section if missing.
 """.strip()
 
 REFINER = """
@@ -346,7 +365,7 @@ actually built.
 
 Read the actual codebase. Compare against the goal.
 
-1. Update `{progress_path}` with a final `## assessment` section:
+1. Append a `## assessment` section to `{log_path}`:
    what percentage of the goal is met, what's missing, quality notes.
 
 2. If work is missing, output new tasks. If goal is met, output empty.
@@ -3,14 +3,15 @@ from __future__ import annotations
 import logging
 import re
 import uuid
-from pathlib import Path
 
 from ship.codex_cli import CodexClient
-from ship.display import display
+from ship.display import display, progress_context
 from ship.prompts import REFINER
 from ship.state import StateManager
 from ship.types_ import Task, TaskStatus
 
+PROGRESS_BUDGET = 1000
+
 
 class Refiner:
     def __init__(
@@ -18,13 +19,19 @@ class Refiner:
         state: StateManager,
         project_context: str = "",
         verbosity: int = 1,
+        progress_path: str = "PROGRESS.md",
     ):
         self.state = state
         self.project_context = project_context
         self.verbosity = verbosity
+        self.progress_path = progress_path
         self.codex = CodexClient()
 
-    async def refine(self) -> list[Task]:
+    async def refine(self, add: bool = True) -> list[Task]:
+        """codex critique of recent work; returns follow-up tasks
+
+        add=False only proposes: the caller merges and adds them
+        """
         all_tasks = await self.state.get_all_tasks()
         completed = [t for t in all_tasks if t.status is TaskStatus.COMPLETED]
         failed = [t for t in all_tasks if t.status is TaskStatus.FAILED]
@@ -32,10 +39,7 @@ class Refiner:
         if not completed and not failed:
             return []
 
-        try:
-            progress = Path("PROGRESS.md").read_text()
-        except OSError:
-            progress = ""
+        progress = progress_context(self.progress_path, PROGRESS_BUDGET)
 
         completed_summary = (
             "\n".join(f"- [DONE] {t.description}" for t in completed[-10:]) or "None"
@@ -50,7 +54,9 @@ class Refiner:
         failed_summary = "\n".join(fail_lines) or "None"
 
         progress_section = (
-            f"PROGRESS.md (includes judge verdicts):\n{progress}" if progress else ""
+            "PROGRESS.md and its log (includes judge verdicts):\n" + progress
+            if progress
+            else ""
         )
         prompt = REFINER.format(
             project_context=self.project_context,
@@ -65,13 +71,20 @@ class Refiner:
             display.event("  refiner: codex critiquing...")
 
         try:
-            result = await self.codex.execute(prompt, timeout=300)
+            result = await self.codex.execute(
+                prompt,
+                timeout=300,
+                on_progress=lambda msg: display.event(f"  refiner: {msg}", min_level=2),
+            )
             if self.verbosity >= 3:
                 display.event(f"  refiner response: {len(result)} chars", min_level=3)
             new_tasks = self._parse_tasks(result)
-            for task in new_tasks:
-                await self.state.add_task(task)
-                logging.info(f"refiner created task: {task.description}")
+            if add:
+                new_tasks = [
+                    t for t in new_tasks if await self.state.add_task(t, dedupe=True)
+                ]
+                for task in new_tasks:
+                    logging.info(f"refiner created task: {task.description}")
             if not new_tasks:
                 display.event("  refiner: no follow-up tasks")
             return new_tasks
@@ -6,11 +6,17 @@ import uuid
 from pathlib import Path
 
 from ship.claude_code import ClaudeCodeClient
-from ship.display import display
+from ship.display import display, progress_context, progress_log_path
+from ship.prompt_builder import file_cache, fit_tokens
 from ship.prompts import REPLANNER
 from ship.state import StateManager
 from ship.types_ import Task, TaskStatus
 
+# token budgets per prompt section
+GOAL_BUDGET = 600
+PLAN_BUDGET = 250
+PROGRESS_BUDGET = 400
+
 
 class Replanner:
     def __init__(
@@ -19,17 +25,22 @@ class Replanner:
         project_context: str = "",
         verbosity: int = 1,
         progress_path: str = "PROGRESS.md",
+        model: str = "sonnet",
     ):
         self.state = state
         self.project_context = project_context
         self.verbosity = verbosity
         self.progress_path = progress_path
         self.claude = ClaudeCodeClient(
-            model="sonnet",
+            model=model,
             role="replanner",
         )
 
-    async def replan(self) -> list[Task]:
+    async def replan(self, add: bool = True) -> list[Task]:
+        """assess goal vs reality; returns follow-up tasks
+
+        add=False only proposes: the caller reconciles and adds them
+        """
         work = self.state.get_work_state()
         if not work:
             return []
@@ -45,30 +56,27 @@ class Replanner:
             "\n".join(f"- {t.description}: {t.error}" for t in failed[-5:]) or "None"
         )
 
+        progress = progress_context(self.progress_path, PROGRESS_BUDGET)
         try:
-            progress = Path(self.progress_path).read_text()
-        except OSError:
-            progress = ""
-        try:
-            plan = Path(self.progress_path).parent.joinpath("PLAN.md").read_text()
+            plan = file_cache.read(Path(self.progress_path).parent / "PLAN.md")
         except OSError:
             plan = ""
 
         progress_section = (
-            f"PROGRESS.md (includes per-task judgments):\n{progress[:1500]}"
+            "PROGRESS.md and its log (includes per-task judgments):\n" + progress
             if progress
             else ""
         )
-        plan_section = f"PLAN.md:\n{plan[:1000]}" if plan else ""
+        plan_section = f"PLAN.md:\n{fit_tokens(plan, PLAN_BUDGET)}" if plan else ""
 
         prompt = REPLANNER.format(
             project_context=self.project_context,
-            goal_text=work.goal_text[:2000],
+            goal_text=fit_tokens(work.goal_text, GOAL_BUDGET),
             plan_section=plan_section,
             progress_section=progress_section,
             completed_summary=completed_summary,
             failed_summary=failed_summary,
-            progress_path=self.progress_path,
+            log_path=progress_log_path(self.progress_path),
         )
 
         if self.verbosity >= 3:
@@ -77,13 +85,19 @@ class Replanner:
             display.event("  replanner: full assessment...", min_level=2)
 
         try:
-            result, _ = await self.claude.execute(prompt, timeout=300)
+            try:
+                result, _ = await self.claude.execute(prompt, timeout=300)
+            finally:
+                await self.state.add_usage("replanner", self.claude.last_usage)
             if self.verbosity >= 3:
                 display.event(f"  replanner response: {len(result)} chars", min_level=3)
             new_tasks = self._parse_tasks(result)
-            for task in new_tasks:
-                await self.state.add_task(task)
-                logging.info(f"replanner created task: {task.description}")
+            if add:
+                new_tasks = [
+                    t for t in new_tasks if await self.state.add_task(t, dedupe=True)
+                ]
+                for task in new_tasks:
+                    logging.info(f"replanner created task: {task.description}")
             if not new_tasks:
                 display.event("  replanner: goal met")
             return new_tasks
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import deque
+
+from ship.metrics import metrics
+from ship.types_ import Task
+
+
+def _norm(path: str) -> str:
+    return os.path.normpath(path.strip())
+
+
+def files_overlap(a: list[str] | frozenset[str], b: list[str] | frozenset[str]) -> bool:
+    """true if any path in a equals, contains or is contained by one in b
+
+    planner hints may name directories ("src/store/"), so a directory
+    overlaps every file below it
+    """
+    for x in a:
+        for y in b:
+            if x == y or x.startswith(y + "/") or y.startswith(x + "/"):
+                return True
+    return False
+
+
+class TaskQueue:
+    """task queue that keeps tasks with overlapping files apart
+
+    drop-in for the asyncio.Queue the workers share. get() hands out the
+    oldest task whose predicted files (Task.files: planner hints plus
+    files earlier attempts touched) overlap no running task, and waits
+    when every queued task conflicts. release(task) ends the task's
+    claim and wakes waiting workers, so a held-back task goes out as
+    soon as its conflict finishes. tasks without files never conflict.
+    claims are per dispatch: a task requeued (merge conflict, judge
+    retry) before its first worker released can be taken again, and the
+    late release() ends the older dispatch, not the new one.
+    time from put() to get() goes to the queue wait histogram.
+    """
+
+    def __init__(self):
+        self._tasks: deque[Task] = deque()
+        # task id -> claimed files per dispatch, oldest first
+        self._running: dict[str, deque[frozenset[str]]] = {}
+        self._queued_at: dict[str, float] = {}
+        self._cond = asyncio.Condition()
+
+    async def put(self, task: Task) -> None:
+        async with self._cond:
+            self._tasks.append(task)
+            self._queued_at[task.id] = time.monotonic()
+            self._cond.notify_all()
+
+    async def get(self) -> Task:
+        async with self._cond:
+            while True:
+                task = self._pick()
+                if task is not None:
+                    files = frozenset(_norm(f) for f in task.files)
+                    self._running.setdefault(task.id, deque()).append(files)
+                    queued = self._queued_at.pop(task.id, None)
+                    if queued is not None:
+                        metrics.queue_wait.observe(time.monotonic() - queued)
+                    return task
+                await self._cond.wait()
+
+    def _pick(self) -> Task | None:
+        for i, task in enumerate(self._tasks):
+            files = [_norm(f) for f in task.files]
+            held = (h for claims in self._running.values() for h in claims)
+            if not any(files_overlap(files, h) for h in held):
+                del self._tasks[i]
+                return task
+        return None
+
+    async def release(self, task: Task) -> None:
+        async with self._cond:
+            claims = self._running.get(task.id)
+            if claims:
+                claims.popleft()
+                if not claims:
+                    del self._running[task.id]
+            self._cond.notify_all()
+
+    def task_done(self) -> None:
+        """asyncio.Queue compatibility; claims end in release()"""
+
+    def qsize(self) -> int:
+        return len(self._tasks)
+
+    def empty(self) -> bool:
+        return not self._tasks
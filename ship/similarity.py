@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+from collections.abc import Iterator
+
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or that the this "
+    "to with".split()
+)
+_MERSENNE = (1 << 61) - 1
+NUM_PERM = 64
+BANDS = 32  # 2 rows per band: pairs near the threshold almost always collide
+THRESHOLD = 0.6
+
+
+def shingles(text: str) -> frozenset[str]:
+    """normalized words plus word bigrams
+
+    lowercased, stopwords dropped and a plural "s" stripped, so
+    "Add tests for the parser" and "add test for parser" match exactly
+    """
+    words = []
+    for w in _WORD_RE.findall(text.lower()):
+        if w in _STOPWORDS:
+            continue
+        if len(w) > 3 and w.endswith("s") and not w.endswith("ss"):
+            w = w[:-1]
+        words.append(w)
+    return frozenset([*words, *(f"{a} {b}" for a, b in zip(words, words[1:]))])
+
+
+def jaccard(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def near_duplicate(a: str, b: str, threshold: float = THRESHOLD) -> bool:
+    return jaccard(shingles(a), shingles(b)) >= threshold
+
+
+def _hash64(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+
+
+# fixed permutations, so signatures are stable across processes
+_rng = random.Random(0x5A1B)
+_PERMS = [
+    (_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE))
+    for _ in range(NUM_PERM)
+]
+
+
+def minhash(sh: frozenset[str]) -> tuple[int, ...]:
+    hashes = [_hash64(s) for s in sh]
+    return tuple(min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMS)
+
+
+class SimilarityIndex:
+    """near-duplicate index over short texts (task descriptions, challenges)
+
+    MinHash signatures are split into LSH bands; texts sharing a band
+    bucket become candidates, and candidates are confirmed by exact
+    shingle jaccard >= threshold. lookups touch only candidates, not
+    the whole index. `in` means "has a near duplicate".
+    """
+
+    def __init__(self, threshold: float = THRESHOLD):
+        self.threshold = threshold
+        self._shingles: dict[str, frozenset[str]] = {}
+        self._texts: dict[str, str] = {}
+        self._sigs: dict[str, tuple[int, ...]] = {}
+        self._buckets: dict[tuple[int, tuple[int, ...]], set[str]] = {}
+
+    @staticmethod
+    def _bands(sig: tuple[int, ...]) -> Iterator[tuple[int, tuple[int, ...]]]:
+        rows = NUM_PERM // BANDS
+        for i in range(BANDS):
+            yield i, sig[i * rows : (i + 1) * rows]
+
+    def add(self, text: str, key: str | None = None) -> None:
+        key = text if key is None else key
+        if key in self._shingles:
+            self.remove(key)
+        sh = shingles(text)
+        self._shingles[key] = sh
+        self._texts[key] = text
+        if not sh:
+            return
+        sig = self._sigs[key] = minhash(sh)
+        for band in self._bands(sig):
+            self._buckets.setdefault(band, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        self._shingles.pop(key, None)
+        self._texts.pop(key, None)
+        sig = self._sigs.pop(key, None)
+        if sig is None:
+            return
+        for band in self._bands(sig):
+            bucket = self._buckets.get(band)
+            if bucket:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def matches(self, text: str) -> list[tuple[str, float]]:
+        """keys of near duplicates of text, best first"""
+        sh = shingles(text)
+        if not sh:
+            return []
+        candidates: set[str] = set()
+        for band in self._bands(minhash(sh)):
+            candidates |= self._buckets.get(band, set())
+        scored = [(k, jaccard(sh, self._shingles[k])) for k in candidates]
+        hits = [(k, s) for k, s in scored if s >= self.threshold]
+        return sorted(hits, key=lambda ks: -ks[1])
+
+    def find(self, text: str) -> str | None:
+        hits = self.matches(text)
+        return hits[0][0] if hits else None
+
+    def clear(self) -> None:
+        self._shingles.clear()
+        self._texts.clear()
+        self._sigs.clear()
+        self._buckets.clear()
+
+    def __contains__(self, text: object) -> bool:
+        return isinstance(text, str) and self.find(text) is not None
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._texts.values())
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import logging
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import IO
+
+
+def default_slot_dir() -> Path:
+    """$XDG_RUNTIME_DIR/ship/slots, else /tmp/ship-<uid>/slots"""
+    runtime = os.getenv("XDG_RUNTIME_DIR")
+    if runtime:
+        return Path(runtime) / "ship" / "slots"
+    return Path("/tmp") / f"ship-{os.getuid()}" / "slots"
+
+
+class HostSlots:
+    """host-wide pool of agent slots shared by all ship processes
+
+    each slot is a lock file in a shared dir; holding the flock on the
+    file holds the slot. the kernel drops flocks when a process exits,
+    so a crashed run never leaks slots.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        slot_dir: Path | None = None,
+        poll: float = 1.0,
+    ):
+        if size < 1:
+            raise ValueError(f"slot pool size must be positive, got {size}")
+        self.size = size
+        self.slot_dir = slot_dir or default_slot_dir()
+        self.poll = poll
+        self._held: dict[int, IO[str]] = {}
+
+    def try_acquire(self) -> int | None:
+        """grab any free slot without blocking, or None"""
+        self.slot_dir.mkdir(parents=True, exist_ok=True)
+        for i in range(self.size):
+            if i in self._held:
+                continue
+            # "a", not "w": probing a held slot must not wipe its holder's pid
+            f = (self.slot_dir / f"slot-{i}.lock").open("a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                continue
+            f.truncate(0)
+            f.write(f"{os.getpid()}\n")
+            f.flush()
+            self._held[i] = f
+            return i
+        return None
+
+    async def acquire(self) -> int:
+        """wait until a slot frees up; returns the slot number"""
+        while True:
+            slot = self.try_acquire()
+            if slot is not None:
+                return slot
+            await asyncio.sleep(self.poll)
+
+    def release(self, slot: int) -> None:
+        f = self._held.pop(slot, None)
+        if f is None:
+            return
+        try:
+            fcntl.flock(f, fcntl.LOCK_UN)
+        except OSError as e:
+            logging.warning(f"slot {slot} unlock failed: {e}")
+        f.close()
+
+    @asynccontextmanager
+    async def hold(self) -> AsyncIterator[int]:
+        slot = await self.acquire()
+        try:
+            yield slot
+        finally:
+            self.release(slot)
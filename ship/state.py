@@ -3,11 +3,13 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+from collections.abc import Callable
 from copy import copy
 from datetime import datetime
 from pathlib import Path
 
-from ship.types_ import Task, TaskStatus, WorkState
+from ship.similarity import SimilarityIndex
+from ship.types_ import Task, TaskStatus, Usage, WorkState
 
 
 class StateManager:
@@ -23,8 +25,14 @@ class StateManager:
         self.tasks: dict[str, Task] = {}
         self.work: WorkState | None = None
         self.lock = asyncio.Lock()
+        # near-duplicate index over task descriptions, keyed by task id
+        self.similar = SimilarityIndex()
+        # called with each task whose status changed (live status feed)
+        self.on_change: Callable[[Task], None] | None = None
 
         self._load()
+        for task in self.tasks.values():
+            self.similar.add(task.description, task.id)
 
     def _load(self) -> None:
         try:
@@ -54,6 +62,9 @@ class StateManager:
                             task_data["followups"] = []
                         if "summary" not in task_data:
                             task_data["summary"] = ""
+                        task_data["usage"] = Usage.from_dict(
+                            task_data.get("usage") or {}
+                        )
                         task = Task(**task_data)
                         task.status = TaskStatus(task_data["status"])
                         self.tasks[task.id] = task
@@ -77,6 +88,11 @@ class StateManager:
                         data["spec_hash"] = ""
                     if "override_prompt" not in data:
                         data["override_prompt"] = ""
+                    data["usage"] = Usage.from_dict(data.get("usage") or {})
+                    data["usage_by_role"] = {
+                        k: Usage.from_dict(v)
+                        for k, v in (data.get("usage_by_role") or {}).items()
+                    }
                     # remove old skills field if present
                     data.pop("skills", None)
                     self.work = WorkState(**data)
@@ -126,14 +142,33 @@ class StateManager:
                 self.work.execution_mode = mode
                 self._save_work()
 
-    async def add_task(self, task: Task) -> bool:
+    async def add_task(self, task: Task, dedupe: bool = False) -> bool:
+        """False if the id exists or, with dedupe, the description near
+        duplicates a pending, running or completed task"""
         async with self.lock:
             if task.id in self.tasks:
                 return False
+            if dedupe:
+                dup = self._duplicate_of(task.description)
+                if dup:
+                    logging.info(
+                        f"skipped duplicate of {dup.id[:8]}: {task.description}"
+                    )
+                    return False
             self.tasks[task.id] = task
+            self.similar.add(task.description, task.id)
             self._save_tasks()
+            self._changed(task)
             return True
 
+    def _duplicate_of(self, description: str) -> Task | None:
+        # failed tasks may be re-proposed with a different approach
+        for key, _ in self.similar.matches(description):
+            task = self.tasks.get(key)
+            if task and task.status is not TaskStatus.FAILED:
+                return task
+        return None
+
     async def update_task(
         self,
         task_id: str,
@@ -143,6 +178,9 @@ class StateManager:
         summary: str = "",
         session_id: str = "",
         followups: list[str] | None = None,
+        turns: int = 0,
+        files: list[str] | None = None,
+        check_output: str | None = None,
     ) -> None:
         async with self.lock:
             if task_id not in self.tasks:
@@ -163,6 +201,13 @@ class StateManager:
                 task.session_id = session_id
             if followups:
                 task.followups = followups
+            if turns:
+                task.turns = turns
+            for name in files or []:
+                if name not in task.files:
+                    task.files.append(name)
+            if check_output is not None:
+                task.check_output = check_output
 
             if old_status is not TaskStatus.RUNNING and status is TaskStatus.RUNNING:
                 task.started_at = datetime.now()
@@ -171,6 +216,45 @@ class StateManager:
                 task.completed_at = datetime.now()
 
             self._save_tasks()
+            if status is not old_status:
+                self._changed(task)
+
+    def _changed(self, task: Task) -> None:
+        if self.on_change:
+            self.on_change(task)
+
+    def status_counts(self) -> dict[str, int]:
+        """tasks per status (synchronous, read-only)"""
+        counts = {s.value: 0 for s in TaskStatus}
+        for task in self.tasks.values():
+            counts[task.status.value] += 1
+        return counts
+
+    async def set_verdict(self, task_id: str, verdict: str, reason: str) -> None:
+        async with self.lock:
+            if task_id not in self.tasks:
+                return
+            task = self.tasks[task_id]
+            task.verdict = verdict
+            task.verdict_reason = reason
+            self._save_tasks()
+
+    async def add_usage(self, role: str, usage: Usage, task_id: str = "") -> None:
+        """fold one LLM call into per-task, per-role and per-run totals"""
+        if not usage.calls:
+            return
+        async with self.lock:
+            if task_id in self.tasks:
+                self.tasks[task_id].usage.add(usage)
+                self._save_tasks()
+            if self.work:
+                self.work.usage.add(usage)
+                self.work.usage_by_role.setdefault(role, Usage()).add(usage)
+                self._save_work()
+
+    def run_cost(self) -> float:
+        """total spend so far (synchronous, read-only)"""
+        return self.work.usage.cost_usd if self.work else 0.0
 
     async def mark_complete(self) -> None:
         async with self.lock:
@@ -214,6 +298,7 @@ class StateManager:
             task.started_at = None
             task.completed_at = None
             self._save_tasks()
+            self._changed(task)
 
     async def cascade_failure(self, task_id: str) -> list[str]:
         """recursively mark tasks depending on task_id as FAILED
@@ -235,6 +320,7 @@ class StateManager:
                         task.completed_at = datetime.now()
                         cascaded.append(task.id)
                         queue.append(task.id)
+                        self._changed(task)
             if cascaded:
                 self._save_tasks()
         return cascaded
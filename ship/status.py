@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+SOCKET_NAME = "ship.sock"
+SUBSCRIBER_QUEUE = 256  # events buffered per watcher before it lags
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class StatusServer:
+    """live status of a run over a Unix socket (<data_dir>/ship.sock)
+
+    a client sends one command line and reads JSON lines back:
+    - `snapshot` (or an empty line): one snapshot object, then EOF
+    - `watch`: a snapshot, then one object per change event until the
+      client disconnects
+
+    events are {"event": kind, "ts": ..., **data}. a watcher that falls
+    SUBSCRIBER_QUEUE events behind gets {"event": "lagged"} in place of
+    what it missed and should take a fresh snapshot. publish() never
+    blocks the caller.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._snapshot: Callable[[], dict[str, Any]] = dict
+        self._server: asyncio.Server | None = None
+        self._watchers: set[asyncio.Queue[dict[str, Any]]] = set()
+        self._conns: set[asyncio.Task[None]] = set()
+
+    async def start(self, snapshot: Callable[[], dict[str, Any]]) -> None:
+        """listen; raises RuntimeError if another run serves the socket"""
+        self._snapshot = snapshot
+        if self.path.exists():
+            try:
+                _, w = await asyncio.open_unix_connection(str(self.path))
+            except OSError:
+                self.path.unlink()  # stale, from a run that died
+            else:
+                w.close()
+                with contextlib.suppress(OSError):
+                    await w.wait_closed()
+                raise RuntimeError(f"{self.path} is served by another run")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._server = await asyncio.start_unix_server(self._accept, str(self.path))
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        for conn in list(self._conns):
+            conn.cancel()
+        await asyncio.gather(*self._conns, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+        self.path.unlink(missing_ok=True)
+
+    def publish(self, event: str, **data: Any) -> None:
+        if not self._watchers:
+            return
+        msg = {"event": event, "ts": _now(), **data}
+        for q in self._watchers:
+            if q.full():
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait({"event": "lagged", "ts": msg["ts"]})
+                continue
+            q.put_nowait(msg)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {"ts": _now(), **self._snapshot()}
+
+    async def _accept(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        task = asyncio.current_task()
+        assert task is not None
+        self._conns.add(task)
+        try:
+            await self._serve(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logging.warning(f"status client error: {e}")
+        finally:
+            self._conns.discard(task)
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+        except asyncio.TimeoutError:
+            line = b""
+        cmd = line.decode(errors="replace").strip() or "snapshot"
+        if cmd == "snapshot":
+            await self._send(writer, self.snapshot())
+            return
+        if cmd != "watch":
+            await self._send(writer, {"error": f"unknown command: {cmd}"})
+            return
+        q: asyncio.Queue[dict[str, Any]] = asyncio.Queue(SUBSCRIBER_QUEUE)
+        self._watchers.add(q)
+        try:
+            await self._send(writer, self.snapshot())
+            while True:
+                await self._send(writer, await q.get())
+        finally:
+            self._watchers.discard(q)
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, obj: dict[str, Any]) -> None:
+        writer.write(json.dumps(obj, default=str).encode() + b"\n")
+        await writer.drain()
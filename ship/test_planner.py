@@ -4,21 +4,57 @@ from __future__ import annotations
 
 import asyncio
 import json
+import os
+from collections import deque
 from unittest.mock import AsyncMock
 from unittest.mock import patch
 
 import pytest
 
+from ship import checkpoint
+from ship.cache import ResponseCache
+from ship.cache import project_scope
 from ship.claude_code import ClaudeCodeClient
 from ship.claude_code import ClaudeError
+from ship.codex_cli import CodexClient
 from ship.config import Config
+from ship import display as display_mod
+from ship.display import Display
 from ship.judge import Judge
 from ship.judge import is_cascade_error
+from ship.judge import parse_verdict
+from ship.limits import FLOOR_TIMEOUT
+from ship.limits import FLOOR_TURNS
+from ship.limits import Limits
+from ship.limits import adaptive_limits
+from ship.metrics import MetricsExporter
+from ship.metrics import Registry
+from ship.metrics import parse_addr
 from ship.planner import Planner
+from ship.precheck import PreCheck
+from ship.prompt_builder import FileCache
+from ship.prompt_builder import estimate_tokens
+from ship.prompt_builder import fit_tokens
+from ship.scheduler import TaskQueue
+from ship.scheduler import files_overlap
+from ship.similarity import SimilarityIndex
+from ship.similarity import near_duplicate
+from ship.slots import HostSlots
 from ship.state import StateManager
+from ship.status import StatusServer
+from ship.trace import TraceQuery
+from ship.trace import TraceWriter
+from ship.trace import iter_entries
+from ship.trace import query as trace_query
+from ship.trace import resolve_blobs
+from ship.trace import segment_paths
 from ship.types_ import Task
 from ship.types_ import TaskStatus
+from ship.types_ import Usage
 from ship.worker import Worker
+from ship.worktree import MergeConflict
+from ship.worktree import MergeError
+from ship.worktree import Worktrees
 
 
 @pytest.fixture
@@ -509,10 +545,11 @@ async def test_run_adversarial_round(tmp_path):
     ):
         with patch("ship.judge.ClaudeCodeClient") as mock_cls:
             mock_client = AsyncMock()
+            mock_client.last_usage = Usage()
             mock_client.execute = AsyncMock(return_value=(challenges_xml, ""))
             mock_cls.return_value = mock_client
 
-            await j._run_adversarial_round()
+            await j._run_adversarial_round(idle=2)
 
     assert len(j._adv_task_ids) == 2
     all_tasks = await j.state.get_all_tasks()
@@ -560,7 +597,7 @@ async def test_adv_init_fields(tmp_path):
     assert j._adv_task_ids == set()
     assert j._adv_attempts == 0
     assert j.max_adv_attempts == 3
-    assert j._seen_challenges == set()
+    assert len(j._seen_challenges) == 0
 
 
 @pytest.mark.asyncio
@@ -579,11 +616,12 @@ async def test_adv_round_dedup(tmp_path):
 
     with patch("ship.judge.ClaudeCodeClient") as mock_cls:
         mock_client = AsyncMock()
+        mock_client.last_usage = Usage()
         mock_client.execute = AsyncMock(return_value=(challenges_xml, ""))
         mock_cls.return_value = mock_client
 
-        # first round picks 2
-        gave_up = await j._run_adversarial_round()
+        # first round picks 2 (two idle workers)
+        gave_up = await j._run_adversarial_round(idle=2)
         assert not gave_up
         assert len(j._adv_task_ids) == 2
         first_seen = set(j._seen_challenges)
@@ -591,7 +629,7 @@ async def test_adv_round_dedup(tmp_path):
 
         # second round: same challenges, only 1 novel
         j._adv_task_ids.clear()
-        gave_up = await j._run_adversarial_round()
+        gave_up = await j._run_adversarial_round(idle=2)
         assert not gave_up
         assert len(j._adv_task_ids) == 1
         assert len(j._seen_challenges) == 3
@@ -850,3 +888,1451 @@ async def test_git_head_error_returns_empty(config, state):
         result = await w._git_head()
 
     assert result == ""
+
+
+# -- HostSlots tests --
+
+
+def test_host_slots_exhaust_and_release(tmp_path):
+    a = HostSlots(2, slot_dir=tmp_path)
+    b = HostSlots(2, slot_dir=tmp_path)
+
+    s0 = a.try_acquire()
+    s1 = b.try_acquire()
+    assert {s0, s1} == {0, 1}
+    assert a.try_acquire() is None
+    assert b.try_acquire() is None
+
+    a.release(s0)
+    assert b.try_acquire() == s0
+
+
+def test_host_slots_probe_keeps_holder_pid(tmp_path):
+    a = HostSlots(1, slot_dir=tmp_path)
+    b = HostSlots(1, slot_dir=tmp_path)
+    assert a.try_acquire() == 0
+    lock = tmp_path / "slot-0.lock"
+    assert lock.read_text() == f"{os.getpid()}\n"
+
+    assert b.try_acquire() is None
+    assert lock.read_text() == f"{os.getpid()}\n"
+
+    a.release(0)
+    assert b.try_acquire() == 0
+    assert lock.read_text() == f"{os.getpid()}\n"
+
+
+@pytest.mark.asyncio
+async def test_host_slots_hold_waits_for_release(tmp_path):
+    pool = HostSlots(1, slot_dir=tmp_path, poll=0.01)
+    first = pool.try_acquire()
+    assert first == 0
+
+    waiter = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.05)
+    assert not waiter.done()
+
+    pool.release(first)
+    assert await asyncio.wait_for(waiter, timeout=1) == 0
+
+
+# -- ResponseCache tests --
+
+
+def test_response_cache_roundtrip(tmp_path):
+    cache = ResponseCache(tmp_path)
+    assert cache.get("planner", "sonnet", "p") is None
+
+    cache.put("planner", "sonnet", "p", "answer")
+    assert cache.get("planner", "sonnet", "p") == "answer"
+    # keyed by role and model too
+    assert cache.get("validator", "sonnet", "p") is None
+    assert cache.get("planner", "haiku", "p") is None
+
+    cache.delete("planner", "sonnet", "p")
+    assert cache.get("planner", "sonnet", "p") is None
+
+
+def test_response_cache_evicts_lru(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=10**9)
+    for i in range(3):
+        cache.put("r", "m", f"p{i}", "x" * 100)
+        path = tmp_path / f"{cache.key('r', 'm', f'p{i}')}.json"
+        os.utime(path, (1000 + i, 1000 + i))
+    # touching p0 makes p1 the least recently used
+    assert cache.get("r", "m", "p0") is not None
+
+    entry_size = path.stat().st_size
+    cache.max_bytes = entry_size * 3
+    cache.put("r", "m", "p3", "x" * 100)
+
+    assert cache.get("r", "m", "p1") is None
+    assert cache.get("r", "m", "p0") is not None
+    assert cache.get("r", "m", "p3") is not None
+
+
+@pytest.mark.asyncio
+async def test_response_cache_scoped_to_project(tmp_path):
+    a = _git_repo(tmp_path / "a")
+    b = _git_repo(tmp_path / "b")
+    scope_a = await project_scope(a, exclude=(".ship",))
+    # same content in another checkout is another project
+    assert scope_a != await project_scope(b, exclude=(".ship",))
+
+    (a / ".ship").mkdir()
+    (a / ".ship" / "PLAN.md").write_text("plan\n")
+    assert scope_a == await project_scope(a, exclude=(".ship",))
+    (a / "new.py").write_text("x = 1\n")
+    assert scope_a != await project_scope(a, exclude=(".ship",))
+
+    ResponseCache(tmp_path / "c", scope=scope_a).put("planner", "m", "p", "plan A")
+    assert ResponseCache(tmp_path / "c", scope=scope_a).get("planner", "m", "p")
+    assert ResponseCache(tmp_path / "c", scope="other").get("planner", "m", "p") is None
+
+
+@pytest.mark.asyncio
+async def test_execute_cache_hit_skips_cli(tmp_path):
+    cache = ResponseCache(tmp_path)
+    client = ClaudeCodeClient(role="planner", cache=cache)
+    fake = FakeProcess([_result_line("fresh answer", sid="s1")])
+
+    with patch("asyncio.create_subprocess_exec", return_value=fake) as spawn:
+        first, _ = await client.execute("same prompt")
+        assert not client.last_cached
+        second, sid = await client.execute("same prompt")
+
+    assert spawn.call_count == 1
+    assert first == second == "fresh answer"
+    assert client.last_cached
+    assert sid == ""
+
+    client.forget("same prompt")
+    assert cache.get("planner", client.model, "same prompt") is None
+
+
+# -- usage accounting tests --
+
+
+@pytest.mark.asyncio
+async def test_execute_captures_usage():
+    client = ClaudeCodeClient()
+    line = _ndjson(
+        {
+            "type": "result",
+            "subtype": "success",
+            "result": "ok",
+            "session_id": "s1",
+            "total_cost_usd": 0.125,
+            "duration_ms": 4200,
+            "num_turns": 3,
+            "usage": {
+                "input_tokens": 100,
+                "output_tokens": 50,
+                "cache_read_input_tokens": 1000,
+                "cache_creation_input_tokens": 10,
+            },
+        }
+    )
+
+    with patch("asyncio.create_subprocess_exec", return_value=FakeProcess([line])):
+        await client.execute("test")
+
+    u = client.last_usage
+    assert (u.input_tokens, u.output_tokens) == (100, 50)
+    assert (u.cache_read_tokens, u.cache_write_tokens) == (1000, 10)
+    assert u.cost_usd == 0.125
+    assert u.duration_ms == 4200
+    assert u.turns == 3
+    assert u.calls == 1
+    assert u.tokens == 1160
+
+
+@pytest.mark.asyncio
+async def test_add_usage_aggregates_and_persists(tmp_path):
+    state = StateManager(str(tmp_path))
+    await state.init_work("spec.md", "goal")
+    await state.add_task(
+        Task(id="t1", description="do it", files=[], status=TaskStatus.PENDING)
+    )
+
+    await state.add_usage(
+        "worker", Usage(output_tokens=10, cost_usd=0.5, calls=1), "t1"
+    )
+    await state.add_usage("judge", Usage(output_tokens=5, cost_usd=0.25, calls=1), "t1")
+    await state.add_usage("planner", Usage(cost_usd=1.0, calls=1))
+    await state.add_usage("judge", Usage())  # no call, ignored
+
+    reloaded = StateManager(str(tmp_path))
+    task = (await reloaded.get_all_tasks())[0]
+    assert task.usage.cost_usd == 0.75
+    assert task.usage.calls == 2
+    work = reloaded.get_work_state()
+    assert work is not None
+    assert work.usage.cost_usd == 1.75
+    assert work.usage_by_role["judge"].output_tokens == 5
+    assert set(work.usage_by_role) == {"worker", "judge", "planner"}
+    assert reloaded.run_cost() == 1.75
+
+
+def test_judge_budget_checks(tmp_path):
+    j = _make_judge(tmp_path)
+    j.max_task_cost = 1.0
+    task = Task(id="t", description="x", files=[], status=TaskStatus.FAILED)
+    assert not j._task_over_budget(task)
+    task.usage.cost_usd = 1.5
+    assert j._task_over_budget(task)
+    # no cap configured
+    j.max_task_cost = 0.0
+    assert not j._task_over_budget(task)
+    assert not j._over_budget()
+
+
+# -- TraceWriter tests --
+
+
+def test_trace_writer_rotates_and_dedups_blobs(tmp_path):
+    w = TraceWriter(str(tmp_path), segment_bytes=300, blob_min=64)
+    big = "x" * 500
+    try:
+        for i in range(4):
+            w.write({"role": f"r{i}", "ok": True, "prompt": big, "response": "hi"})
+        w.flush()
+    finally:
+        w.close()
+
+    assert len(segment_paths(tmp_path)) >= 2
+    # identical prompts share one blob
+    assert len(list((tmp_path / "blobs").glob("*.gz"))) == 1
+
+    entries = list(iter_entries(tmp_path))
+    assert [e["role"] for e in entries] == ["r0", "r1", "r2", "r3"]
+    assert "prompt" not in entries[0]
+    assert entries[0]["response"] == "hi"
+    assert resolve_blobs(tmp_path, entries[0])["prompt"] == big
+
+
+def test_iter_entries_reads_legacy_trace_first(tmp_path):
+    (tmp_path / "trace.jl").write_text(json.dumps({"role": "old"}) + "\n\n")
+    w = TraceWriter(str(tmp_path))
+    try:
+        w.write({"role": "new"})
+        w.flush()
+        # open segment is readable before close
+        assert [e["role"] for e in iter_entries(tmp_path)] == ["old", "new"]
+    finally:
+        w.close()
+
+
+def _write_trace(tmp_path, entries, **kw):
+    w = TraceWriter(str(tmp_path), **kw)
+    try:
+        for e in entries:
+            w.write(dict(e))
+        w.flush()
+    finally:
+        w.close()
+
+
+def test_trace_query_uses_index(tmp_path):
+    _write_trace(
+        tmp_path,
+        [
+            {"ts": "2026-01-01T10:00:00", "role": "planner", "ok": True},
+            {
+                "ts": "2026-01-01T10:05:00",
+                "role": "worker-w0",
+                "ok": False,
+                "task_id": "abc123",
+            },
+            {
+                "ts": "2026-01-01T10:10:00",
+                "role": "worker-w1",
+                "ok": True,
+                "task_id": "def456",
+            },
+            {
+                "ts": "2026-01-01T10:15:00",
+                "role": "judge",
+                "ok": True,
+                "task_id": "abc123",
+            },
+        ],
+        segment_bytes=150,
+    )
+    assert len(segment_paths(tmp_path)) >= 2
+    rows = (tmp_path / "trace.idx").read_text().splitlines()
+    assert len(rows) == 4
+
+    def roles(q):
+        return [e["role"] for e in trace_query(tmp_path, q)]
+
+    assert roles(TraceQuery(roles=("worker",))) == ["worker-w0", "worker-w1"]
+    assert roles(TraceQuery(ok=False)) == ["worker-w0"]
+    assert roles(TraceQuery(task="abc")) == ["worker-w0", "judge"]
+    assert roles(
+        TraceQuery(since="2026-01-01T10:05:00", until="2026-01-01T10:10:00")
+    ) == ["worker-w0", "worker-w1"]
+    assert len(roles(TraceQuery())) == 4
+
+
+def test_trace_query_scans_unindexed(tmp_path):
+    (tmp_path / "trace.jl").write_text(
+        json.dumps({"role": "worker-w0", "ok": False})
+        + "\n"
+        + json.dumps({"role": "judge", "ok": True})
+        + "\n"
+    )
+    got = list(trace_query(tmp_path, TraceQuery(ok=False)))
+    assert [e["role"] for e in got] == ["worker-w0"]
+
+
+# -- prompt builder tests --
+
+
+def test_fit_tokens_head_and_tail():
+    text = "\n".join(f"line {i} with some words" for i in range(200))
+    assert fit_tokens(text, 10_000) == text
+
+    head = fit_tokens(text, 50)
+    assert head.startswith("line 0 ")
+    assert head.endswith("lines omitted)")
+    assert estimate_tokens(head) <= 60
+
+    tail = fit_tokens(text, 50, keep="tail")
+    assert tail.startswith("... (")
+    assert tail.endswith("line 199 with some words")
+
+
+def test_file_cache_invalidates_on_change(tmp_path):
+    cache = FileCache()
+    p = tmp_path / "spec.md"
+    p.write_text("v1")
+    assert cache.read(p) == "v1"
+    p.write_text("v2!")
+    assert cache.read(p) == "v2!"
+    # same size and mtime: served from cache
+    st = p.stat()
+    p.write_text("v3!")
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert cache.read(p) == "v2!"
+
+
+def test_worker_prompt_shares_prefix(config, state, tmp_path):
+    spec = tmp_path / "SPEC.md"
+    spec.write_text("# spec\nbuild a thing")
+    w0 = Worker("w0", config, state, override_prompt="stdlib", spec_files=str(spec))
+    w1 = Worker("w1", config, state, override_prompt="stdlib", spec_files=str(spec))
+    # adaptive limits give tasks different timeouts; only the suffix differs
+    a = w0._build_prompt(
+        Task(id="a", description="task A", files=[], status=TaskStatus.PENDING),
+        timeout=600,
+    )
+    b = w1._build_prompt(
+        Task(id="b", description="task B", files=[], status=TaskStatus.PENDING),
+        timeout=1800,
+    )
+
+    assert a.startswith("Override instructions: stdlib")
+    assert "build a thing" in a
+    assert "task A" in a and "10-minute timeout" in a
+    assert "30-minute timeout" in b
+    prefix = a[: a.index("## Your Task")]
+    assert "timeout" not in prefix
+    assert b.startswith(prefix)
+
+
+# -- adaptive limits tests --
+
+
+def _done(i: int, secs: int, turns: int) -> Task:
+    from datetime import datetime, timedelta
+
+    start = datetime(2026, 1, 1, 12, 0)
+    return Task(
+        id=f"t{i}",
+        description=f"task {i}",
+        files=[],
+        status=TaskStatus.COMPLETED,
+        started_at=start,
+        completed_at=start + timedelta(seconds=secs),
+        turns=turns,
+    )
+
+
+def test_adaptive_limits_need_samples():
+    history = [_done(i, 600, 12) for i in range(4)]
+    assert adaptive_limits(history, 2400, 50) == Limits(2400, 50)
+
+
+def test_adaptive_limits_p95_capped_and_floored():
+    history = [_done(i, 400 + i * 10, 8 + i) for i in range(20)]
+    limits = adaptive_limits(history, 2400, 50)
+    # p95 of 400..590 is 580s, of 8..27 turns is 26; times 2
+    assert limits == Limits(1160, 50)
+
+    fast = [_done(i, 20, 2) for i in range(10)]
+    assert adaptive_limits(fast, 2400, 50) == Limits(FLOOR_TIMEOUT, FLOOR_TURNS)
+
+    slow = [_done(i, 5000, 100) for i in range(10)]
+    assert adaptive_limits(slow, 2400, 50) == Limits(2400, 50)
+
+
+@pytest.mark.asyncio
+async def test_worker_retry_uses_caps(config, state):
+    from dataclasses import replace
+
+    cfg = replace(config, adaptive=True, task_timeout=2400, max_turns=50)
+    for i in range(10):
+        await state.add_task(_done(i, 20, 2))
+    w = Worker("w0", cfg, state)
+    first = Task(id="n", description="new", files=[], status=TaskStatus.PENDING)
+    assert await w._limits(first) == Limits(FLOOR_TIMEOUT, FLOOR_TURNS)
+    first.retries = 1
+    assert await w._limits(first) == Limits(2400, 50)
+
+
+# -- codex streaming tests --
+
+
+def _fake_codex(tmp_path, body: str):
+    script = tmp_path / "codex"
+    script.write_text("#!/bin/sh\ncat >/dev/null\n" + body)
+    script.chmod(0o755)
+    client = CodexClient()
+    client.binary = str(script)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_codex_stream_progress_and_last_message(tmp_path):
+    events = [
+        {"type": "thread.started", "thread_id": "x"},
+        {
+            "type": "item.started",
+            "item": {"type": "command_execution", "command": "ls -la"},
+        },
+        {
+            "type": "item.completed",
+            "item": {"type": "agent_message", "text": "<progress>reading</progress>"},
+        },
+        {
+            "type": "item.completed",
+            "item": {"type": "agent_message", "text": "<task>add tests</task>"},
+        },
+        {"type": "turn.completed", "usage": {}},
+    ]
+    lines = "".join(f"echo '{json.dumps(e)}'\n" for e in events)
+    client = _fake_codex(tmp_path, lines)
+    seen: list[str] = []
+    out = await client.execute("prompt", timeout=10, on_progress=seen.append)
+    assert out == "<task>add tests</task>"
+    assert seen == ["$ ls -la", "reading"]
+
+
+@pytest.mark.asyncio
+async def test_codex_stream_legacy_events_and_failure(tmp_path):
+    ok = {"id": "0", "msg": {"type": "task_complete", "last_agent_message": "done"}}
+    client = _fake_codex(tmp_path, f"echo '{json.dumps(ok)}'\n")
+    assert await client.execute("p", timeout=10) == "done"
+
+    err = {"type": "error", "message": "quota exceeded"}
+    client = _fake_codex(tmp_path, f"echo '{json.dumps(err)}'\nexit 1\n")
+    with pytest.raises(RuntimeError, match="quota exceeded"):
+        await client.execute("p", timeout=10)
+
+
+@pytest.mark.asyncio
+async def test_codex_stream_timeout_returns_partial(tmp_path):
+    msg = {"type": "item.completed", "item": {"type": "agent_message", "text": "hi"}}
+    client = _fake_codex(tmp_path, f"echo '{json.dumps(msg)}'\nexec sleep 30\n")
+    assert await client.execute("p", timeout=1) == "hi"
+
+
+# -- worktree isolation tests --
+
+
+def _git_repo(path):
+    import subprocess
+
+    def git(*args):
+        subprocess.run(["git", *args], cwd=path, check=True, capture_output=True)
+
+    path.mkdir()
+    git("init", "-q")
+    git("config", "user.email", "t@example.com")
+    git("config", "user.name", "t")
+    (path / "shared.txt").write_text("base\n")
+    git("add", "-A")
+    git("commit", "-qm", "init")
+    return path
+
+
+@pytest.mark.asyncio
+async def test_worktrees_merge_parallel_tasks(tmp_path):
+    repo = _git_repo(tmp_path / "repo")
+    wt = Worktrees(repo, tmp_path / "wt")
+    assert await wt.check() == ""
+
+    a = await wt.prepare("w0", "aaaaaaaa-1")
+    b = await wt.prepare("w1", "bbbbbbbb-2")
+    (a / "a.txt").write_text("a\n")
+    (b / "b.txt").write_text("b\n")
+    assert await wt.finish("w0", "aaaaaaaa-1", "task a")
+    assert await wt.finish("w1", "bbbbbbbb-2", "task b")
+    assert (repo / "a.txt").exists() and (repo / "b.txt").exists()
+
+    # reused worktree starts from the merged HEAD, nothing to merge
+    c = await wt.prepare("w0", "cccccccc-3")
+    assert (c / "b.txt").exists()
+    assert not await wt.finish("w0", "cccccccc-3", "noop")
+
+
+@pytest.mark.asyncio
+async def test_worktrees_conflict_aborts_merge(tmp_path):
+    repo = _git_repo(tmp_path / "repo")
+    wt = Worktrees(repo, tmp_path / "wt")
+    a = await wt.prepare("w0", "aaaaaaaa-1")
+    b = await wt.prepare("w1", "bbbbbbbb-2")
+    (a / "shared.txt").write_text("from a\n")
+    (b / "shared.txt").write_text("from b\n")
+    assert await wt.finish("w0", "aaaaaaaa-1", "task a")
+    with pytest.raises(MergeConflict):
+        await wt.finish("w1", "bbbbbbbb-2", "task b")
+    assert wt.conflicts["bbbbbbbb-2"] == 1
+    assert (repo / "shared.txt").read_text() == "from a\n"
+    assert not (repo / ".git" / "MERGE_HEAD").exists()
+
+    await wt.remove_all()
+    assert not (tmp_path / "wt" / "w0").exists()
+
+
+@pytest.mark.asyncio
+async def test_worktrees_merge_errors_are_not_conflicts(tmp_path):
+    import subprocess
+
+    repo = _git_repo(tmp_path / "repo")
+    wt = Worktrees(repo, tmp_path / "wt")
+
+    # uncommitted edit in the main tree: refuse to merge into it
+    a = await wt.prepare("w0", "aaaaaaaa-1")
+    (a / "a.txt").write_text("a\n")
+    (repo / "shared.txt").write_text("user edit\n")
+    with pytest.raises(MergeError):
+        await wt.finish("w0", "aaaaaaaa-1", "task a")
+    assert (repo / "shared.txt").read_text() == "user edit\n"
+    assert "aaaaaaaa-1" not in wt.conflicts
+    (repo / "shared.txt").write_text("base\n")
+
+    # an untracked file in the way is not a conflict either
+    b = await wt.prepare("w1", "bbbbbbbb-2")
+    (b / "b.txt").write_text("b\n")
+    (repo / "b.txt").write_text("untracked\n")
+    with pytest.raises(MergeError):
+        await wt.finish("w1", "bbbbbbbb-2", "task b")
+    assert (repo / "b.txt").read_text() == "untracked\n"
+
+    # the work survives on its branch for a manual merge
+    await wt.prepare("w0", "cccccccc-3")
+    await wt.remove_all()
+    branches = subprocess.run(
+        ["git", "branch", "--list", "ship/task-*"],
+        cwd=repo,
+        capture_output=True,
+        text=True,
+    ).stdout
+    assert "ship/task-aaaaaaaa" in branches
+    assert "ship/task-bbbbbbbb" in branches
+    assert "ship/task-cccccccc" not in branches
+
+
+# -- touched files tests --
+
+
+def test_claude_notes_edited_files(tmp_path):
+    client = ClaudeCodeClient(cwd=str(tmp_path))
+    blocks = [
+        {"type": "tool_use", "name": "Write", "input": {"file_path": "src/a.py"}},
+        {
+            "type": "tool_use",
+            "name": "Edit",
+            "input": {"file_path": str(tmp_path / "src" / "b.py")},
+        },
+        {"type": "tool_use", "name": "MultiEdit", "input": {"file_path": "src/a.py"}},
+        {
+            "type": "tool_use",
+            "name": "NotebookEdit",
+            "input": {"notebook_path": "nb.ipynb"},
+        },
+        {"type": "tool_use", "name": "Read", "input": {"file_path": "c.py"}},
+        {"type": "tool_use", "name": "Write", "input": {"file_path": "/etc/x"}},
+    ]
+    for b in blocks:
+        client._note_file(b)
+    assert client.last_files == ["src/a.py", "src/b.py", "nb.ipynb", "/etc/x"]
+
+
+@pytest.mark.asyncio
+async def test_git_diff_stat_limited_to_files(config, state):
+    w = Worker("w0", config, state)
+    fake = _FakeGitProc(b" 1 file changed, 2 insertions(+)\n")
+
+    with patch("asyncio.create_subprocess_exec", return_value=fake) as m:
+        result = await w._git_diff_stat("abc123", files=["a.py", "b.py"])
+
+    assert result == "1 files, +2/-0"
+    assert m.call_args.args[-3:] == ("--", "a.py", "b.py")
+
+
+@pytest.mark.asyncio
+async def test_update_task_unions_files(state):
+    t = Task(id="f", description="d", files=["a.py"], status=TaskStatus.PENDING)
+    await state.add_task(t)
+    await state.update_task("f", TaskStatus.RUNNING, files=["b.py", "a.py"])
+    assert state.tasks["f"].files == ["a.py", "b.py"]
+
+
+# -- conflict-aware scheduling tests --
+
+
+def _ft(tid: str, *files: str) -> Task:
+    return Task(id=tid, description=tid, files=list(files), status=TaskStatus.PENDING)
+
+
+def test_files_overlap_dirs():
+    assert files_overlap(["src/a.py"], ["src/a.py"])
+    assert files_overlap(["src/store"], ["src/store/db.py"])
+    assert not files_overlap(["src/store"], ["src/storage.py"])
+    assert not files_overlap([], ["a.py"])
+
+
+@pytest.mark.asyncio
+async def test_task_queue_holds_back_conflicts():
+    q = TaskQueue()
+    a = _ft("a", "src/store/")
+    b = _ft("b", "src/store/db.py")
+    c = _ft("c", "src/http.py")
+    for t in (a, b, c):
+        await q.put(t)
+
+    assert await q.get() is a
+    # b overlaps running a: c goes first
+    assert await q.get() is c
+    waiter = asyncio.create_task(q.get())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    await q.release(a)
+    assert await asyncio.wait_for(waiter, 1) is b
+    assert q.empty()
+
+
+@pytest.mark.asyncio
+async def test_task_queue_late_release_keeps_new_claim():
+    q = TaskQueue()
+    a = _ft("a", "src/store/")
+    await q.put(a)
+    assert await q.get() is a
+    # requeued (merge conflict, judge retry) before the first worker released
+    await q.put(a)
+    assert await q.get() is a
+    await q.release(a)  # the first worker, late
+
+    await q.put(_ft("b", "src/store/db.py"))
+    waiter = asyncio.create_task(q.get())
+    await asyncio.sleep(0)
+    assert not waiter.done()  # the second dispatch of a still holds its files
+    await q.release(a)
+    assert (await asyncio.wait_for(waiter, 1)).id == "b"
+
+
+def test_planner_parses_files_hint(config, state):
+    p = Planner(config, state)
+    text = (
+        '<project><tasks><task files="src/a.py, src/b/">Build the thing'
+        "</task></tasks></project>"
+    )
+    _, tasks, _ = p._parse_xml(text)
+    assert tasks[0].files == ["src/a.py", "src/b/"]
+
+
+# -- checkpoint tests --
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_rollback_only_touched_files(tmp_path):
+    import subprocess
+
+    repo = _git_repo(tmp_path / "repo")
+    (repo / "other.txt").write_text("other worker, untracked\n")
+    sha = await checkpoint.snapshot("t1", cwd=repo)
+    assert sha
+
+    ref = subprocess.run(
+        ["git", "rev-parse", checkpoint.ref_name("t1")],
+        cwd=repo,
+        capture_output=True,
+        text=True,
+    )
+    assert ref.stdout.strip() == sha
+
+    (repo / "shared.txt").write_text("half-done\n")
+    (repo / "new.py").write_text("broken\n")
+    (repo / "other.txt").write_text("other worker, edited\n")
+    undone = await checkpoint.rollback(sha, ["shared.txt", "new.py"], cwd=repo)
+
+    assert sorted(undone) == ["new.py", "shared.txt"]
+    assert (repo / "shared.txt").read_text() == "base\n"
+    assert not (repo / "new.py").exists()
+    assert (repo / "other.txt").read_text() == "other worker, edited\n"
+    # the real index is never touched
+    status = subprocess.run(
+        ["git", "status", "--porcelain"], cwd=repo, capture_output=True, text=True
+    )
+    assert status.stdout.strip() == "?? other.txt"
+
+    await checkpoint.drop("t1", cwd=repo)
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_rollback_keeps_ignored_files(tmp_path):
+    repo = _git_repo(tmp_path / "repo")
+    (repo / ".gitignore").write_text(".env\n*.local\nbuild/\n")
+    (repo / ".env").write_text("SECRET=1\n")
+    (repo / "build").mkdir()
+    (repo / "build" / "old.o").write_text("obj\n")
+    sha = await checkpoint.snapshot("t1", cwd=repo)
+
+    (repo / ".env").write_text("SECRET=broken\n")
+    (repo / "build" / "new.o").write_text("obj\n")
+    (repo / "scratch.local").write_text("tmp\n")
+    touched = [".env", "build/new.o", "scratch.local"]
+    undone = await checkpoint.rollback(sha, touched, cwd=repo)
+
+    # a pre-existing ignored file is restored, not deleted
+    assert (repo / ".env").read_text() == "SECRET=1\n"
+    # inside an ignored dir that existed: unknown, so left alone
+    assert (repo / "build" / "new.o").exists()
+    # ignored but created by the attempt: removed
+    assert not (repo / "scratch.local").exists()
+    assert sorted(undone) == [".env", "scratch.local"]
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_outside_repo(tmp_path):
+    assert await checkpoint.snapshot("t1", cwd=tmp_path) == ""
+
+
+# -- pipelined verification tests --
+
+
+@pytest.mark.asyncio
+async def test_verifier_prefetched_while_last_task_runs(tmp_path):
+    state = StateManager(str(tmp_path))
+    j = Judge(state=state, queue=TaskQueue(), num_workers=4)
+    await state.init_work("test.txt", "build a web app")
+    j.replan_count = j.max_replan_rounds
+    running = Task(id="r", description="last", files=[], status=TaskStatus.RUNNING)
+
+    challenges_xml = "".join(
+        f"<challenge>Verify thing {i}</challenge>" for i in range(6)
+    )
+    with patch("ship.judge.ClaudeCodeClient") as mock_cls:
+        mock_client = AsyncMock()
+        mock_client.last_usage = Usage()
+        mock_client.execute = AsyncMock(return_value=(challenges_xml, ""))
+        mock_cls.return_value = mock_client
+
+        # replan still available: no prefetch
+        j.replan_count = 0
+        j._maybe_prefetch([running])
+        assert j._verifier_task is None
+
+        j.replan_count = j.max_replan_rounds
+        j._maybe_prefetch([running])
+        assert j._verifier_task is not None
+        await j._verifier_task
+
+        gave_up = await j._run_adversarial_round(idle=4)
+
+    assert gave_up is False
+    assert mock_client.execute.await_count == 1
+    assert len(j._adv_task_ids) == 4
+
+
+# -- speculative replan tests --
+
+
+def test_near_duplicate():
+    assert near_duplicate("Add tests for the parser", "add tests for parser")
+    assert not near_duplicate("Add tests for the parser", "Write the HTTP server")
+
+
+@pytest.mark.asyncio
+async def test_speculative_replan_reconciles(tmp_path):
+    state = StateManager(str(tmp_path))
+    j = Judge(state=state, queue=TaskQueue(), num_workers=2, speculative_replan=0.5)
+    await state.init_work("test.txt", "build a web app")
+    done = Task(
+        id="d", description="Build the server", files=[], status=TaskStatus.COMPLETED
+    )
+    run = Task(
+        id="r",
+        description="Add tests for the parser",
+        files=[],
+        status=TaskStatus.RUNNING,
+    )
+    await state.add_task(done)
+    await state.add_task(run)
+
+    proposals = [
+        Task(
+            id="p1",
+            description="add tests for parser",
+            files=[],
+            status=TaskStatus.PENDING,
+        ),
+        Task(
+            id="p2",
+            description="Document the CLI flags",
+            files=[],
+            status=TaskStatus.PENDING,
+        ),
+    ]
+    with patch.object(j.replanner, "replan", AsyncMock(return_value=proposals)) as m:
+        j._maybe_speculate([done, run])
+        assert j._spec_replan is not None
+        queued = await j._finish_speculative()
+
+    m.assert_awaited_once_with(add=False)
+    assert [t.id for t in queued] == ["p2"]
+    assert j.replan_count == 1
+    assert "p1" not in state.tasks
+    assert (await j.queue.get()).id == "p2"
+
+
+# -- concurrent refine/replan tests --
+
+
+def _pt(tid: str, desc: str) -> Task:
+    return Task(id=tid, description=desc, files=[], status=TaskStatus.PENDING)
+
+
+@pytest.mark.asyncio
+async def test_refine_round_runs_both_and_dedupes(tmp_path):
+    state = StateManager(str(tmp_path))
+    j = Judge(state=state, queue=TaskQueue(), use_codex=True)
+    await state.init_work("test.txt", "build a web app")
+
+    started: list[str] = []
+
+    async def refine(add=True):
+        started.append("refine")
+        await asyncio.sleep(0.01)
+        assert "replan" in started  # both in flight at once
+        return [_pt("a", "Add tests for the parser"), _pt("b", "Fix the login bug")]
+
+    async def replan(add=True):
+        started.append("replan")
+        return [_pt("c", "add tests for parser"), _pt("d", "Write the deploy docs")]
+
+    with (
+        patch.object(j.refiner, "refine", refine),
+        patch.object(j.replanner, "replan", replan),
+    ):
+        queued = await j._refine_round()
+
+    assert [t.id for t in queued] == ["a", "b", "d"]
+    assert j.refine_count == 1 and j.replan_count == 1
+
+
+@pytest.mark.asyncio
+async def test_refine_round_refiner_timeout_keeps_replan(tmp_path):
+    state = StateManager(str(tmp_path))
+    j = Judge(state=state, queue=TaskQueue(), use_codex=True)
+    await state.init_work("test.txt", "build a web app")
+
+    with (
+        patch.object(
+            j.refiner, "refine", AsyncMock(side_effect=RuntimeError("timeout"))
+        ),
+        patch.object(j.replanner, "replan", AsyncMock(return_value=[])),
+    ):
+        assert await j._refine_round() is None
+
+    # refiner round not consumed, replanner round was
+    assert j.refine_count == 0
+    assert j.replan_count == 1
+
+
+# -- similarity index tests --
+
+
+def test_similarity_index_matches_reworded_duplicate():
+    idx = SimilarityIndex()
+    idx.add("Add unit tests for the config parser", key="a")
+    idx.add("Write the HTTP server", key="b")
+    assert idx.find("add unit test for config parser") == "a"
+    assert idx.find("Document the deploy process") is None
+    assert "write the http server" in idx
+    idx.remove("b")
+    assert "write the http server" not in idx
+    assert len(idx) == 1
+
+
+@pytest.mark.asyncio
+async def test_add_task_dedupe_skips_live_duplicates(tmp_path):
+    state = StateManager(str(tmp_path))
+    await state.init_work("test.txt", "build a web app")
+    done = Task(
+        id="d",
+        description="Add tests for the parser",
+        files=[],
+        status=TaskStatus.COMPLETED,
+    )
+    failed = Task(
+        id="f",
+        description="Write the HTTP server",
+        files=[],
+        status=TaskStatus.FAILED,
+    )
+    await state.add_task(done)
+    await state.add_task(failed)
+
+    dup = Task(
+        id="x", description="add tests for parser", files=[], status=TaskStatus.PENDING
+    )
+    assert not await state.add_task(dup, dedupe=True)
+    # a failed task may be proposed again
+    retry = Task(
+        id="y", description="write the http server", files=[], status=TaskStatus.PENDING
+    )
+    assert await state.add_task(retry, dedupe=True)
+    # without dedupe only the id is checked
+    assert await state.add_task(dup)
+
+    reloaded = StateManager(str(tmp_path))
+    assert reloaded.similar.find("Add tests for parser") in ("d", "x")
+
+
+# -- judge verdict tests --
+
+
+def test_parse_verdict():
+    assert parse_verdict("looks good\n<verdict>pass</verdict><reason></reason>") == (
+        "pass",
+        "",
+    )
+    assert parse_verdict(
+        "<verdict> FAIL </verdict>\n<reason>no tests\n  added</reason>"
+    ) == ("fail", "no tests added")
+    assert parse_verdict("it seems fine") == ("", "")
+
+
+async def _judge_with_reply(j: Judge, task: Task, reply: str) -> None:
+    with patch.object(j.claude, "execute", AsyncMock(return_value=(reply, ""))):
+        await j._judge_task(task)
+
+
+@pytest.mark.asyncio
+async def test_failed_verdict_queues_one_fix(tmp_path):
+    state = StateManager(str(tmp_path))
+    queue = TaskQueue()
+    j = Judge(state=state, queue=queue)
+    await state.init_work("test.txt", "build a web app")
+    task = Task(
+        id="t", description="Add a parser", files=["p.py"], status=TaskStatus.COMPLETED
+    )
+    await state.add_task(task)
+
+    await _judge_with_reply(
+        j, task, "<verdict>fail</verdict><reason>parser is a stub</reason>"
+    )
+    assert state.tasks["t"].verdict == "fail"
+    assert state.tasks["t"].verdict_reason == "parser is a stub"
+    fixes = [t for t in state.tasks.values() if t.fix_of == "t"]
+    assert len(fixes) == 1
+    fix = fixes[0]
+    assert "parser is a stub" in fix.description and fix.files == ["p.py"]
+    assert queue.qsize() == 1
+
+    # a failed fix does not spawn another fix
+    fix.status = TaskStatus.COMPLETED
+    await _judge_with_reply(j, fix, "<verdict>fail</verdict><reason>still</reason>")
+    assert state.tasks[fix.id].verdict == "fail"
+    assert len(state.tasks) == 2
+    assert queue.qsize() == 1
+
+
+@pytest.mark.asyncio
+async def test_passed_verdict_queues_nothing(tmp_path):
+    state = StateManager(str(tmp_path))
+    queue = TaskQueue()
+    j = Judge(state=state, queue=queue)
+    await state.init_work("test.txt", "build a web app")
+    task = Task(
+        id="t", description="Add a parser", files=[], status=TaskStatus.COMPLETED
+    )
+    await state.add_task(task)
+
+    await _judge_with_reply(j, task, "done\n<verdict>pass</verdict>")
+    assert state.tasks["t"].verdict == "pass"
+    assert len(state.tasks) == 1 and queue.empty()
+
+
+# -- model tier tests --
+
+
+def test_config_model_overrides(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MODEL_WORKER", "opus")
+    monkeypatch.delenv("MODEL_JUDGE", raising=False)
+    cfg = Config.load()
+    assert cfg.model("worker") == "opus"
+    assert cfg.model("judge") == "haiku"
+    assert cfg.model("planner") == "sonnet"
+
+
+@pytest.mark.asyncio
+async def test_judge_escalates_unparseable_verdict(tmp_path):
+    state = StateManager(str(tmp_path))
+    j = Judge(state=state, queue=TaskQueue())
+    await state.init_work("test.txt", "build a web app")
+    task = Task(
+        id="t", description="Add a parser", files=[], status=TaskStatus.COMPLETED
+    )
+    await state.add_task(task)
+    assert j.claude.model == "haiku" and j.escalated is not None
+
+    small = AsyncMock(return_value=("looks done to me", ""))
+    large = AsyncMock(return_value=("<verdict>pass</verdict>", ""))
+    with (
+        patch.object(j.claude, "execute", small),
+        patch.object(j.escalated, "execute", large),
+    ):
+        await j._judge_task(task)
+
+    assert small.await_count == 1 and large.await_count == 1
+    assert state.tasks["t"].verdict == "pass"
+
+
+@pytest.mark.asyncio
+async def test_judge_keeps_parsed_verdict(tmp_path):
+    state = StateManager(str(tmp_path))
+    j = Judge(state=state, queue=TaskQueue())
+    await state.init_work("test.txt", "build a web app")
+    task = Task(
+        id="t", description="Add a parser", files=[], status=TaskStatus.COMPLETED
+    )
+    await state.add_task(task)
+
+    assert j.escalated is not None
+    large = AsyncMock()
+    with (
+        patch.object(
+            j.claude, "execute", AsyncMock(return_value=("<verdict>pass</verdict>", ""))
+        ),
+        patch.object(j.escalated, "execute", large),
+    ):
+        await j._judge_task(task)
+
+    large.assert_not_awaited()
+    assert state.tasks["t"].verdict == "pass"
+
+
+# -- pre-check tests --
+
+
+@pytest.mark.asyncio
+async def test_precheck_cached_by_tree(tmp_path):
+    repo = _git_repo(tmp_path / "repo")
+    check = PreCheck("echo run >> ../runs.log; test -f ok", exclude=(".ship",))
+
+    first = await check.run(repo)
+    assert first is not None and not first.ok and not first.cached
+
+    # data dir churn does not change the tree
+    (repo / ".ship").mkdir()
+    (repo / ".ship" / "LOG.md").write_text("x\n")
+    again = await check.run(repo)
+    assert again is not None and again.cached and not again.ok
+
+    (repo / "ok").write_text("")
+    passed = await check.run(repo)
+    assert passed is not None and passed.ok and not passed.cached
+    assert (tmp_path / "runs.log").read_text().count("run") == 2
+
+
+@pytest.mark.asyncio
+async def test_precheck_timeout_is_inconclusive(tmp_path):
+    repo = _git_repo(tmp_path / "repo")
+    assert await PreCheck("sleep 5", timeout=1).run(repo) is None
+
+
+@pytest.mark.asyncio
+async def test_judge_skips_call_for_settled_verdict(tmp_path):
+    state = StateManager(str(tmp_path))
+    j = Judge(state=state, queue=TaskQueue())
+    await state.init_work("test.txt", "build a web app")
+    task = Task(
+        id="t", description="Add a parser", files=[], status=TaskStatus.COMPLETED
+    )
+    await state.add_task(task)
+
+    task.verdict, task.verdict_reason = "pass", "check passed: make test"
+    call = AsyncMock()
+    with patch.object(j.claude, "execute", call):
+        await j._judge_task(task)
+    call.assert_not_awaited()
+    assert state.tasks["t"].verdict == "pass"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("others_running", [False, True])
+async def test_shared_tree_check_failure_is_inconclusive(
+    config, tmp_path, monkeypatch, others_running
+):
+    repo = _git_repo(tmp_path / "repo")
+    monkeypatch.chdir(repo)
+    state = StateManager(str(tmp_path / ".ship"))
+    await state.init_work("test.txt", "build a web app")
+    for tid in ("a", "b"):
+        await state.add_task(
+            Task(id=tid, description=f"task {tid}", files=[], status=TaskStatus.PENDING)
+        )
+    if others_running:
+        await state.update_task("b", TaskStatus.RUNNING)
+    w = Worker("w0", config, state, precheck=PreCheck("false"))
+    done = "<summary>did it</summary><status>done</status>"
+    with patch.object(w.claude, "execute", AsyncMock(return_value=(done, "s"))):
+        await w._execute(state.tasks["a"])
+
+    task = state.tasks["a"]
+    if others_running:
+        # another worker may have broken the check: the judge decides
+        assert task.status is TaskStatus.COMPLETED and not task.verdict
+    else:
+        assert task.status is TaskStatus.FAILED and task.verdict == "fail"
+
+
+def test_retry_prompt_carries_check_output(config, state):
+    w = Worker("w0", config, state)
+    task = Task(
+        id="t",
+        description="Add a parser",
+        files=[],
+        status=TaskStatus.PENDING,
+        check_output="FAILED test_parse - AssertionError",
+    )
+    assert "FAILED test_parse" in w._build_prompt(task)
+    task.check_output = ""
+    assert "Previous Attempt" not in w._build_prompt(task)
+
+
+# -- panel rendering tests --
+
+
+def _panel_display(n: int, running: range) -> Display:
+    d = Display()
+    d.is_tty = True
+    d.set_worker_count(2)
+    d.set_tasks(
+        [
+            (
+                f"id{i}",
+                f"task {i}",
+                TaskStatus.RUNNING
+                if i in running
+                else TaskStatus.COMPLETED
+                if i < running.start
+                else TaskStatus.PENDING,
+                "",
+                "",
+                "",
+            )
+            for i in range(n)
+        ]
+    )
+    return d
+
+
+def test_panel_fits_terminal_for_large_plan():
+    d = _panel_display(300, range(100, 104))
+    lines = d._build_panel(cols=100, rows=30)
+    assert len(lines) <= 30
+    body = "\n".join(lines)
+    for i in range(100, 104):
+        assert f"[{i + 1}]" in body
+    assert "[105]" in body  # next pending
+    assert "task 0\n" not in body + "\n"  # completed tasks folded
+    assert "100 done" in body and "more pending" in body
+
+
+def test_panel_lists_small_plan_whole():
+    d = _panel_display(5, range(2, 3))
+    lines = d._build_panel(cols=100, rows=40)
+    assert sum("[" in line and "]" in line for line in lines) == 5
+
+
+def test_refresh_rewrites_only_changed_lines(capsys, monkeypatch):
+    d = _panel_display(5, range(2, 3))
+    monkeypatch.setattr(d, "_rows", lambda: 40)
+    d.refresh()
+    first = capsys.readouterr().out
+    assert "task 0" in first and "task 4" in first
+
+    d.refresh()
+    assert capsys.readouterr().out == ""
+
+    d.set_worker_progress("w0", 3, "task 2", "compiling")
+    d.refresh()
+    out = capsys.readouterr().out
+    assert "compiling" in out
+    assert "task 0" not in out and "task 4" not in out
+
+
+@pytest.mark.asyncio
+async def test_render_loop_coalesces_progress_bursts(monkeypatch):
+    d = _panel_display(5, range(2, 3))
+    calls: list[int] = []
+
+    def refresh() -> None:
+        d._dirty = False
+        calls.append(1)
+
+    monkeypatch.setattr(d, "refresh", refresh)
+    d.start_render_loop(100)
+    try:
+        for i in range(50):
+            d.set_worker_progress("w0", 3, "task 2", f"step {i}")
+        await asyncio.sleep(0.1)
+        assert len(calls) == 1
+        await asyncio.sleep(0.05)
+        assert len(calls) == 1  # nothing dirty: no redraw
+
+        d.request_refresh()
+        assert len(calls) == 1  # deferred to the next tick
+        await asyncio.sleep(0.05)
+        assert len(calls) == 2
+    finally:
+        d.finish()
+    assert d._render_task is None
+
+
+# -- progress log tests --
+
+
+def test_progress_log_appends_and_header_stays_small(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        display_mod, "_log_entries", deque(maxlen=display_mod.RECENT_ENTRIES)
+    )
+    progress = str(tmp_path / "PROGRESS.md")
+    log_path = display_mod.progress_log_path(progress)
+    assert log_path.endswith("PROGRESS-LOG.md")
+    monkeypatch.setattr(display_mod, "_log_path", log_path)
+
+    for i in range(50):
+        display_mod.log_entry(f"done: task {i}")
+    display_mod.write_progress_md(50, 50, 0, 0, 0, [], path=progress)
+
+    header = (tmp_path / "PROGRESS.md").read_text()
+    assert "task 49" in header and "task 39" not in header
+    assert not (tmp_path / "PROGRESS.md.tmp").exists()
+    log = (tmp_path / "PROGRESS-LOG.md").read_text()
+    assert log.count("\n") == 50 and "task 0" in log
+
+    context = display_mod.progress_context(progress, budget=50)
+    assert context.startswith("# PROGRESS")
+    assert "task 49" in context and "task 0\n" not in context
+
+
+def test_read_log_tail_drops_cut_line(tmp_path):
+    path = tmp_path / "log.md"
+    path.write_text("".join(f"line {i}\n" for i in range(100)))
+    tail = display_mod.read_log_tail(str(path), max_bytes=30)
+    assert tail.endswith("line 99\n")
+    assert all(line.startswith("line ") for line in tail.splitlines())
+
+
+# -- task id bookkeeping tests --
+
+
+@pytest.mark.asyncio
+async def test_panel_maps_workers_by_task_id(tmp_path):
+    state = StateManager(str(tmp_path))
+    j = Judge(
+        state=state, queue=TaskQueue(), progress_path=str(tmp_path / "PROGRESS.md")
+    )
+    await state.init_work("test.txt", "build a web app")
+    same = "Add a test"
+    a = Task(id="a", description=same, files=[], status=TaskStatus.RUNNING)
+    b = Task(id="b", description=same, files=[], status=TaskStatus.RUNNING)
+
+    j.set_worker_task("w0", "a", same)
+    j.set_worker_task("w1", "b", same)
+    with patch("ship.judge.display") as disp:
+        disp._plan_shown = True
+        j._update_tui([a, b])
+    panel = disp.set_tasks.call_args.args[0]
+    assert [(row[0], row[3]) for row in panel] == [("a", "w0"), ("b", "w1")]
+
+    j.clear_worker_task("w0")
+    assert j._task_workers == {"b": "w1"}
+    j.set_worker_task("w1", "c", "other")
+    assert j._task_workers == {"c": "w1"}
+
+
+def test_task_info_keyed_by_id():
+    d = Display()
+    d.show_plan(
+        [
+            ("a", "Add a test", TaskStatus.PENDING, "", "", ""),
+            ("b", "Add a test", TaskStatus.PENDING, "", "", ""),
+        ]
+    )
+    assert d.task_info("b")[0] == 2
+    assert d.task_info("new", "Later task") == (0, "Later task")
+
+
+# -- status socket tests --
+
+
+async def _status_request(path, cmd: str) -> tuple:
+    reader, writer = await asyncio.open_unix_connection(str(path))
+    writer.write(cmd.encode() + b"\n")
+    await writer.drain()
+    return reader, writer
+
+
+@pytest.mark.asyncio
+async def test_status_socket_snapshot_and_watch(tmp_path):
+    state = StateManager(str(tmp_path))
+    server = StatusServer(tmp_path / "ship.sock")
+    j = Judge(state=state, queue=TaskQueue(), num_workers=2, status=server)
+    await state.init_work("test.txt", "build a web app")
+    state.on_change = lambda t: server.publish(
+        "task", task_id=t.id, status=t.status.value
+    )
+    await state.add_task(
+        Task(id="a", description="Add a parser", files=[], status=TaskStatus.PENDING)
+    )
+    j.set_worker_task("w0", "a", "Add a parser")
+    j.note_progress("w0", "writing tests")
+
+    await server.start(j.status_snapshot)
+    try:
+        reader, writer = await _status_request(server.path, "snapshot")
+        snap = json.loads(await reader.readline())
+        assert await reader.readline() == b""
+        writer.close()
+        assert snap["counts"]["pending"] == 1
+        assert snap["workers"]["w0"] == {
+            "task_id": "a",
+            "task": "Add a parser",
+            "progress": "writing tests",
+        }
+        assert snap["replan"] == {"count": 0, "max": 1}
+
+        reader, writer = await _status_request(server.path, "watch")
+        assert "counts" in json.loads(await reader.readline())
+        await state.update_task("a", TaskStatus.RUNNING)
+        event = json.loads(await asyncio.wait_for(reader.readline(), timeout=2))
+        assert event["event"] == "task" and event["status"] == "running"
+        j.clear_worker_task("w0")
+        event = json.loads(await asyncio.wait_for(reader.readline(), timeout=2))
+        assert event == {**event, "event": "worker", "worker": "w0", "task_id": ""}
+        writer.close()
+    finally:
+        await server.stop()
+    assert not server.path.exists()
+
+
+@pytest.mark.asyncio
+async def test_status_socket_replaces_stale_file(tmp_path):
+    path = tmp_path / "ship.sock"
+    path.write_text("")
+    server = StatusServer(path)
+    await server.start(lambda: {"phase": "executing"})
+    try:
+        reader, writer = await _status_request(path, "")
+        assert json.loads(await reader.readline())["phase"] == "executing"
+        writer.close()
+        with pytest.raises(RuntimeError):
+            await StatusServer(path).start(dict)
+    finally:
+        await server.stop()
+
+
+# -- metrics tests --
+
+
+def test_metrics_render_openmetrics_and_prometheus():
+    reg = Registry()
+    done = reg.counter("ship_done", "tasks done", ("outcome",))
+    took = reg.histogram("ship_took_seconds", "task time", buckets=(1, 10))
+    reg.counter("ship_idle", "never incremented")
+    done.inc(outcome="completed")
+    done.inc(2, outcome="failed")
+    for v in (0.5, 3, 30):
+        took.observe(v)
+
+    om = reg.render()
+    assert om.endswith("# EOF\n")
+    assert "# TYPE ship_done counter" in om
+    assert 'ship_done_total{outcome="failed"} 2.0' in om
+    assert "# UNIT ship_took_seconds seconds" in om
+    assert 'ship_took_seconds_bucket{le="1.0"} 1.0' in om
+    assert 'ship_took_seconds_bucket{le="10.0"} 2.0' in om
+    assert 'ship_took_seconds_bucket{le="+Inf"} 3.0' in om
+    assert "ship_took_seconds_count 3.0" in om
+    assert "ship_took_seconds_sum 33.5" in om
+    assert "ship_idle_total 0.0" in om
+
+    prom = reg.render(openmetrics=False)
+    assert "# TYPE ship_done_total counter" in prom
+    assert "# EOF" not in prom and "# UNIT" not in prom
+
+    with pytest.raises(ValueError):
+        done.inc(outcome="completed", role="x")
+    with pytest.raises(ValueError):
+        reg.counter("ship_done", "again")
+
+
+def test_metrics_parse_addr():
+    assert parse_addr("9464") == ("127.0.0.1", 9464)
+    assert parse_addr("0.0.0.0:9464") == ("0.0.0.0", 9464)
+    for bad in ("", "host:", "70000", "-1"):
+        with pytest.raises(ValueError):
+            parse_addr(bad)
+
+
+@pytest.mark.asyncio
+async def test_metrics_exporter_http_and_textfile(tmp_path):
+    reg = Registry()
+    reg.gauge("ship_busy", "busy workers").set(2)
+    prom = tmp_path / "ship.prom"
+    exporter = MetricsExporter(reg, "127.0.0.1:0", str(prom), interval=60)
+    await exporter.start()
+    port = exporter.port
+    assert port and prom.exists()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            b"GET /metrics HTTP/1.1\r\n"
+            b"Accept: application/openmetrics-text; version=1.0.0\r\n\r\n"
+        )
+        await writer.drain()
+        response = (await reader.read()).decode()
+        writer.close()
+        assert response.startswith("HTTP/1.1 200 OK")
+        assert "application/openmetrics-text" in response
+        assert "ship_busy 2.0" in response and response.endswith("# EOF\n")
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /nope HTTP/1.1\r\n\r\n")
+        await writer.drain()
+        assert (await reader.read()).startswith(b"HTTP/1.1 404")
+        writer.close()
+    finally:
+        await exporter.stop()
+    assert "ship_busy 2.0" in prom.read_text()
+    assert not list(tmp_path.glob(".*.tmp"))
@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any
+
+SEGMENT_RE = re.compile(r"trace-(\d+)\.jl\.gz$")
+INDEX_NAME = "trace.idx"
+_BLOB_FIELDS = ("prompt", "response")
+
+
+@dataclass(slots=True)
+class TraceQuery:
+    """filter for trace entries; empty fields match everything
+
+    since/until compare against the entry's UTC "%Y-%m-%dT%H:%M:%S" ts
+    """
+
+    roles: tuple[str, ...] = ()
+    since: str = ""
+    until: str = ""
+    ok: bool | None = None
+    task: str = ""  # task id prefix
+
+    def matches(self, row: dict[str, Any]) -> bool:
+        role = row.get("role", "")
+        if self.roles and not any(role.startswith(r) for r in self.roles):
+            return False
+        ts = row.get("ts", "")
+        if self.since and ts < self.since:
+            return False
+        if self.until and ts > self.until:
+            return False
+        if self.ok is not None and bool(row.get("ok")) is not self.ok:
+            return False
+        if self.task and not row.get("task_id", "").startswith(self.task):
+            return False
+        return True
+
+
+def segment_paths(log_dir: Path) -> list[Path]:
+    """compressed trace segments, oldest first"""
+    found = []
+    for p in log_dir.glob("trace-*.jl.gz"):
+        m = SEGMENT_RE.search(p.name)
+        if m:
+            found.append((int(m.group(1)), p))
+    return [p for _, p in sorted(found)]
+
+
+def load_blob(log_dir: Path, digest: str) -> str:
+    try:
+        with gzip.open(log_dir / "blobs" / f"{digest}.gz", "rt") as f:
+            return f.read()
+    except (OSError, EOFError):
+        return f"(missing blob {digest[:12]})"
+
+
+def resolve_blobs(log_dir: Path, entry: dict[str, Any]) -> dict[str, Any]:
+    """inline prompt/response text stored out of line in blobs/"""
+    for field in _BLOB_FIELDS:
+        digest = entry.pop(f"{field}_blob", None)
+        if digest:
+            entry[field] = load_blob(log_dir, digest)
+    return entry
+
+
+def iter_entries(log_dir: Path) -> Iterator[dict[str, Any]]:
+    """stream every trace entry: legacy trace.jl, then segments in order
+
+    the newest segment may still be open for writing; a truncated tail
+    ends iteration quietly instead of raising
+    """
+    legacy = log_dir / "trace.jl"
+    if legacy.exists():
+        yield from _scan(legacy, compressed=False)
+    for path in segment_paths(log_dir):
+        yield from _scan(path, compressed=True)
+
+
+def _read_index(log_dir: Path, start: int = 0) -> tuple[list[dict[str, Any]], int]:
+    """index rows appended after byte offset start; returns (rows, new offset)
+
+    a partially written last line is left for the next call
+    """
+    rows: list[dict[str, Any]] = []
+    try:
+        with open(log_dir / INDEX_NAME, "rb") as f:
+            f.seek(start)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                start += len(raw)
+                try:
+                    rows.append(json.loads(raw))
+                except json.JSONDecodeError:
+                    continue
+    except OSError:
+        pass
+    return rows, start
+
+
+def _fetch(log_dir: Path, rows: list[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+    """read the entries index rows point at, one segment open at a time"""
+    seg_no = -1
+    f: gzip.GzipFile | None = None
+    try:
+        for row in rows:
+            if row["seg"] != seg_no or f is None or f.tell() > row["off"]:
+                if f is not None:
+                    f.close()
+                seg_no = row["seg"]
+                f = gzip.open(log_dir / f"trace-{seg_no:06d}.jl.gz", "rb")
+            try:
+                f.seek(row["off"])
+                line = f.readline()
+                yield json.loads(line)
+            except (EOFError, OSError, json.JSONDecodeError):
+                continue
+    finally:
+        if f is not None:
+            f.close()
+
+
+def query(log_dir: Path, q: TraceQuery) -> Iterator[dict[str, Any]]:
+    """stream entries matching q, oldest first
+
+    indexed segments are filtered on the sidecar index and only matching
+    entries are decompressed; the legacy trace.jl and unindexed segments
+    fall back to a full streaming scan
+    """
+    rows, _ = _read_index(log_dir)
+    indexed = {r["seg"] for r in rows}
+    legacy = log_dir / "trace.jl"
+    if legacy.exists():
+        for e in _scan(legacy, compressed=False):
+            if q.matches(e):
+                yield e
+    pending = [r for r in rows if q.matches(r)]
+    for path in segment_paths(log_dir):
+        m = SEGMENT_RE.search(path.name)
+        n = int(m.group(1)) if m else -1
+        if n in indexed:
+            yield from _fetch(log_dir, [r for r in pending if r["seg"] == n])
+        else:
+            for e in _scan(path, compressed=True):
+                if q.matches(e):
+                    yield e
+
+
+def follow(log_dir: Path, q: TraceQuery, poll: float = 1.0) -> Iterator[dict[str, Any]]:
+    """tail a live run: yield new matching entries as they are indexed"""
+    _, offset = _read_index(log_dir)
+    while True:
+        rows, offset = _read_index(log_dir, offset)
+        yield from _fetch(log_dir, [r for r in rows if q.matches(r)])
+        time.sleep(poll)
+
+
+def _scan(path: Path, compressed: bool) -> Iterator[dict[str, Any]]:
+    try:
+        f: IO[str] = gzip.open(path, "rt") if compressed else open(path)
+    except OSError:
+        return
+    with f:
+        try:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+        except (EOFError, OSError, gzip.BadGzipFile):
+            return
+
+
+class TraceWriter:
+    """background writer for the LLM call trace
+
+    entries go through a queue to a daemon thread, so the event loop
+    never touches disk. output is gzip segments rotated by uncompressed
+    size; prompts/responses of blob_min bytes or more are stored once
+    under blobs/<sha256>.gz and referenced by digest.
+    """
+
+    def __init__(
+        self,
+        log_dir: str = ".ship/log",
+        segment_bytes: int = 8 * 1024 * 1024,
+        blob_min: int = 4096,
+    ):
+        self.log_dir = Path(log_dir)
+        self.segment_bytes = segment_bytes
+        self.blob_min = blob_min
+        self._queue: queue.Queue[dict[str, Any] | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._segment: gzip.GzipFile | None = None
+        self._segment_path: Path | None = None
+        self._segment_no = 0
+        self._written = 0
+        self._index: IO[str] | None = None
+        self._index_rows: list[str] = []
+        self._atexit = False
+
+    def configure(self, log_dir: str) -> None:
+        """point the writer at a new log dir; pending entries go to the old one"""
+        self.flush()
+        with self._lock:
+            self._close_segment()
+            self.log_dir = Path(log_dir)
+
+    def write(self, entry: dict[str, Any]) -> None:
+        """enqueue an entry; never blocks on disk"""
+        self._ensure_thread()
+        self._queue.put(entry)
+
+    def flush(self) -> None:
+        """block until every queued entry is on disk"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+        with self._lock:
+            self._close_segment()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="ship-trace", daemon=True
+        )
+        self._thread.start()
+        if not self._atexit:
+            atexit.register(self.close)
+            self._atexit = True
+
+    def _run(self) -> None:
+        while True:
+            entry = self._queue.get()
+            try:
+                if entry is None:
+                    return
+                with self._lock:
+                    self._write_entry(entry)
+                    if self._queue.empty():
+                        self._flush()
+            except (OSError, ValueError) as e:
+                logging.warning(f"trace write failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write_entry(self, entry: dict[str, Any]) -> None:
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        for field in _BLOB_FIELDS:
+            text = entry.get(field)
+            if isinstance(text, str) and len(text) >= self.blob_min:
+                entry[f"{field}_blob"] = self._store_blob(text)
+                del entry[field]
+        data = (json.dumps(entry) + "\n").encode()
+        seg = self._open_segment(len(data))
+        offset = self._written
+        seg.write(data)
+        self._written += len(data)
+        self._write_index(entry, offset)
+
+    def _write_index(self, entry: dict[str, Any], offset: int) -> None:
+        """one small row per entry so queries skip decompressing misses
+
+        rows are written after the segment is flushed, so a reader never
+        sees an index row whose entry is not yet readable
+        """
+        if self._index is None:
+            self._index = open(self.log_dir / INDEX_NAME, "a")
+        row = {
+            "seg": self._segment_no,
+            "off": offset,
+            "ts": entry.get("ts", ""),
+            "role": entry.get("role", ""),
+            "ok": bool(entry.get("ok")),
+        }
+        if entry.get("task_id"):
+            row["task_id"] = entry["task_id"]
+        self._index_rows.append(json.dumps(row) + "\n")
+
+    def _flush(self) -> None:
+        if self._segment is not None:
+            self._segment.flush()
+        if self._index is not None and self._index_rows:
+            self._index.write("".join(self._index_rows))
+            self._index.flush()
+            self._index_rows.clear()
+
+    def _store_blob(self, text: str) -> str:
+        raw = text.encode()
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self.log_dir / "blobs" / f"{digest}.gz"
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            with gzip.open(tmp, "wb") as f:
+                f.write(raw)
+            tmp.replace(path)
+        return digest
+
+    def _open_segment(self, incoming: int) -> gzip.GzipFile:
+        """current segment, rotating once it would exceed segment_bytes
+
+        each process starts a fresh segment, so sizes never need to be
+        recovered from a compressed file on disk
+        """
+        if (
+            self._segment is not None
+            and self._written + incoming > self.segment_bytes
+            and self._written > 0
+        ):
+            self._close_segment()
+        if self._segment is None:
+            existing = segment_paths(self.log_dir)
+            last = SEGMENT_RE.search(existing[-1].name) if existing else None
+            self._segment_no = int(last.group(1)) + 1 if last else 1
+            self._segment_path = self.log_dir / f"trace-{self._segment_no:06d}.jl.gz"
+            self._segment = gzip.open(self._segment_path, "ab")
+            self._written = 0
+        return self._segment
+
+    def _close_segment(self) -> None:
+        self._flush()
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        if self._segment is not None:
+            try:
+                self._segment.close()
+            except OSError:
+                pass
+        self._segment = None
+        self._segment_path = None
+        self._written = 0
+
+
+# singleton
+tracer = TraceWriter()
@@ -15,6 +15,64 @@ class TaskStatus(str, Enum):
     FAILED = "failed"
 
 
+@dataclass(slots=True)
+class Usage:
+    """token, cost and duration totals from stream-json result events"""
+
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    cost_usd: float = 0.0
+    duration_ms: int = 0
+    turns: int = 0
+    calls: int = 0
+
+    @property
+    def tokens(self) -> int:
+        return (
+            self.input_tokens
+            + self.output_tokens
+            + self.cache_read_tokens
+            + self.cache_write_tokens
+        )
+
+    def add(self, other: Usage) -> None:
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cache_read_tokens += other.cache_read_tokens
+        self.cache_write_tokens += other.cache_write_tokens
+        self.cost_usd += other.cost_usd
+        self.duration_ms += other.duration_ms
+        self.turns += other.turns
+        self.calls += other.calls
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cache_read_tokens": self.cache_read_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "duration_ms": self.duration_ms,
+            "turns": self.turns,
+            "calls": self.calls,
+        }
+
+    @staticmethod
+    def from_dict(data: dict[str, Any]) -> Usage:
+        return Usage(
+            input_tokens=int(data.get("input_tokens", 0)),
+            output_tokens=int(data.get("output_tokens", 0)),
+            cache_read_tokens=int(data.get("cache_read_tokens", 0)),
+            cache_write_tokens=int(data.get("cache_write_tokens", 0)),
+            cost_usd=float(data.get("cost_usd", 0.0)),
+            duration_ms=int(data.get("duration_ms", 0)),
+            turns=int(data.get("turns", 0)),
+            calls=int(data.get("calls", 0)),
+        )
+
+
 @dataclass(slots=True)
 class Task:
     """represents a single executable task"""
@@ -34,6 +92,12 @@ class Task:
     depends_on: list[str] = field(default_factory=list)
     followups: list[str] = field(default_factory=list)
     worker: str = "auto"  # "auto" or specific worker id like "w0"
+    usage: Usage = field(default_factory=Usage)
+    turns: int = 0  # agent turns of the last worker attempt
+    verdict: str = ""  # judge: "pass", "fail", or "" when not judged
+    verdict_reason: str = ""
+    fix_of: str = ""  # id of the task whose failed verdict created this one
+    check_output: str = ""  # CHECK_CMD output of the last failed attempt
 
     def to_dict(self) -> dict[str, Any]:
         d: dict[str, Any] = {
@@ -50,6 +114,12 @@ class Task:
             "depends_on": self.depends_on,
             "followups": self.followups,
             "worker": self.worker,
+            "usage": self.usage.to_dict(),
+            "turns": self.turns,
+            "verdict": self.verdict,
+            "verdict_reason": self.verdict_reason,
+            "fix_of": self.fix_of,
+            "check_output": self.check_output,
         }
         if self.started_at:
             d["started_at"] = self.started_at.isoformat()
@@ -71,6 +141,8 @@ class WorkState:
     override_prompt: str = ""
     started_at: datetime = field(default_factory=datetime.now)
     last_updated_at: datetime = field(default_factory=datetime.now)
+    usage: Usage = field(default_factory=Usage)
+    usage_by_role: dict[str, Usage] = field(default_factory=dict)
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -83,4 +155,6 @@ class WorkState:
             "override_prompt": self.override_prompt,
             "started_at": self.started_at.isoformat(),
             "last_updated_at": self.last_updated_at.isoformat(),
+            "usage": self.usage.to_dict(),
+            "usage_by_role": {k: v.to_dict() for k, v in self.usage_by_role.items()},
         }
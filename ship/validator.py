@@ -3,6 +3,7 @@ from __future__ import annotations
 import re
 from dataclasses import dataclass
 
+from ship.cache import ResponseCache
 from ship.claude_code import ClaudeCodeClient, ClaudeError
 from ship.prompts import VALIDATOR
 
@@ -20,11 +21,14 @@ class Validator:
     def __init__(
         self,
         verbosity: int = 1,
+        cache: ResponseCache | None = None,
+        model: str = "sonnet",
     ):
         self.verbosity = verbosity
         self.claude = ClaudeCodeClient(
-            model="sonnet",
+            model=model,
             role="validator",
+            cache=cache,
         )
 
     async def validate(
@@ -68,6 +72,8 @@ class Validator:
             parsed = self._parse(result)
             if parsed.accept or parsed.gaps:
                 return parsed
+            # never replay an unusable answer from the cache
+            self.claude.forget(prompt)
             if attempt < max_retries and self.verbosity >= 1:
                 print("warning: validator rejected without gaps, retrying...")
 
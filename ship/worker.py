@@ -3,19 +3,31 @@ from __future__ import annotations
 import asyncio
 import logging
 import re
+import time
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 from ship.claude_code import ClaudeCodeClient, ClaudeError
+from ship.checkpoint import drop, ref_name, rollback, snapshot
 from ship.config import Config
 from ship.display import display, log_entry
-from ship.prompts import WORKER
+from ship.limits import Limits, adaptive_limits
+from ship.metrics import metrics
+from ship.precheck import PreCheck
+from ship.prompt_builder import PromptBuilder, file_cache, fit_tokens
+from ship.prompts import CHECK_FAILED, WORKER, WORKER_TASK
+from ship.scheduler import TaskQueue
+from ship.slots import HostSlots
 from ship.state import StateManager
 from ship.types_ import Task, TaskStatus
+from ship.worktree import MERGE_REQUEUES, MergeConflict, MergeError, Worktrees
 
 if TYPE_CHECKING:
     from ship.judge import Judge
 
+# token budget for spec content embedded in the shared prompt prefix
+SPEC_BUDGET = 12000
+
 
 class Worker:
     """executes tasks from queue using claude code CLI"""
@@ -29,6 +41,9 @@ class Worker:
         override_prompt: str = "",
         judge: Judge | None = None,
         spec_files: str = "",
+        slots: HostSlots | None = None,
+        worktrees: Worktrees | None = None,
+        precheck: PreCheck | None = None,
     ):
         self.worker_id = worker_id
         self.cfg = cfg
@@ -37,34 +52,42 @@ class Worker:
         self.override_prompt = override_prompt
         self.judge = judge
         self.spec_files = spec_files
+        self.slots = slots
+        self.worktrees = worktrees
+        self.precheck = precheck
         self.claude = ClaudeCodeClient(
-            model="sonnet",
+            model=cfg.model("worker"),
             max_turns=cfg.max_turns,
             role=f"worker-{worker_id}",
         )
 
-    async def run(self, queue: asyncio.Queue[Task]) -> None:
+    async def run(self, queue: TaskQueue) -> None:
         logging.info(f"{self.worker_id} starting")
 
         try:
             while True:
                 task = await queue.get()
                 try:
-                    await self._execute(task)
+                    if self._over_budget():
+                        # leave it pending: a resumed run picks it up
+                        logging.info(f"{self.worker_id} budget spent, skip: {task.id}")
+                        continue
+                    await self._execute(task, queue)
                 finally:
+                    await queue.release(task)
                     queue.task_done()
         except asyncio.CancelledError:
             logging.info(f"{self.worker_id} stopping")
             raise
 
-    async def _execute(self, task: Task) -> None:
+    async def _execute(self, task: Task, queue: TaskQueue | None = None) -> None:
         short_desc = task.description[:60]
         display.event(f"  [{self.worker_id}] {short_desc}", min_level=2)
 
         if self.judge:
-            self.judge.set_worker_task(self.worker_id, task.description)
+            self.judge.set_worker_task(self.worker_id, task.id, task.description)
 
-        tidx, tsummary = display.task_info(task.description)
+        tidx, tsummary = display.task_info(task.id, task.description)
         display.set_worker_progress(
             self.worker_id,
             tidx,
@@ -75,24 +98,19 @@ class Worker:
         await self.state.update_task(task.id, TaskStatus.RUNNING)
 
         progress_log: list[str] = []
+        limits = Limits(self.cfg.task_timeout, self.cfg.max_turns)
+        checkpoint = ""
+        started = time.monotonic()
+        outcome = "failed"
+        metrics.workers_busy.inc()
 
         try:
-            data = Path(self.cfg.data_dir)
-            prompt = WORKER.format(
-                context=(
-                    f"Project: {self.project_context}\n\n"
-                    if self.project_context
-                    else ""
-                ),
-                timeout_min=self.cfg.task_timeout // 60,
-                description=task.description,
-                plan_path=str(data / "PLAN.md"),
-                project_path=str(data / "PROJECT.md"),
-                spec_content=self._read_spec(),
-                log_path=str(data / "LOG.md"),
-            )
-            if self.override_prompt:
-                prompt = f"Override instructions: {self.override_prompt}\n\n{prompt}"
+            cwd: Path | None = None
+            if self.worktrees:
+                cwd = await self.worktrees.prepare(self.worker_id, task.id)
+                self.claude.cwd = str(cwd)
+            limits = await self._limits(task)
+            prompt = self._build_prompt(task, limits.timeout)
             if self.cfg.verbosity >= 3:
                 sep = "=" * 60
                 display.event(
@@ -100,7 +118,10 @@ class Worker:
                     min_level=3,
                 )
 
-            head_before = await self._git_head()
+            head_before = await self._git_head(cwd)
+            if self.cfg.checkpoint != "off" and not self.worktrees:
+                # worktrees are reset per task; the shared tree needs this
+                checkpoint = await snapshot(task.id)
 
             def on_progress(msg: str) -> None:
                 display.event(
@@ -113,14 +134,35 @@ class Worker:
                     tsummary,
                     msg,
                 )
+                if self.judge:
+                    self.judge.note_progress(self.worker_id, msg)
                 progress_log.append(msg)
 
-            result, session_id = await self.claude.execute(
-                prompt,
-                timeout=self.cfg.task_timeout,
-                on_progress=on_progress,
-            )
+            if self.slots:
+                display.set_worker_progress(
+                    self.worker_id,
+                    tidx,
+                    tsummary,
+                    "waiting for host slot\u2026",
+                )
+                async with self.slots.hold():
+                    result, session_id = await self.claude.execute(
+                        prompt,
+                        timeout=limits.timeout,
+                        on_progress=on_progress,
+                        task_id=task.id,
+                        max_turns=limits.max_turns,
+                    )
+            else:
+                result, session_id = await self.claude.execute(
+                    prompt,
+                    timeout=limits.timeout,
+                    on_progress=on_progress,
+                    task_id=task.id,
+                    max_turns=limits.max_turns,
+                )
 
+            await self.state.add_usage("worker", self.claude.last_usage, task.id)
             status, followups, summary = self._parse_output(result)
 
             if status == "partial":
@@ -130,29 +172,104 @@ class Worker:
                     error="worker reported partial",
                     result=result,
                     followups=followups,
+                    turns=self.claude.last_usage.turns,
+                    files=self.claude.last_files,
                 )
+                outcome = "partial"
                 log_entry(f"partial: {task.description[:60]}")
                 display.event(f"  [{self.worker_id}] partial", min_level=2)
                 logging.warning(f"{self.worker_id} partial: {task.description}")
+                await self._settle_checkpoint(task, checkpoint)
                 return
 
+            touched = self.claude.last_files
+            check = None
+            if self.precheck:
+                display.set_worker_progress(
+                    self.worker_id, tidx, tsummary, "running check\u2026"
+                )
+                shared = self._shared_tree()
+                check = await self.precheck.run(cwd)
+                if (
+                    check is not None
+                    and not check.ok
+                    and (shared or self._shared_tree())
+                ):
+                    # other workers' half-done edits may be what failed it
+                    logging.info(
+                        f"{self.worker_id} check failed on a shared tree, "
+                        f"leaving {task.id[:8]} to the judge"
+                    )
+                    check = None
+            if check is not None and not check.ok:
+                await self.state.update_task(
+                    task.id,
+                    TaskStatus.FAILED,
+                    error=f"check failed: {self.cfg.check_cmd}",
+                    result=result,
+                    turns=self.claude.last_usage.turns,
+                    files=touched,
+                    check_output=check.output,
+                )
+                await self.state.set_verdict(task.id, "fail", "check failed")
+                outcome = "check_failed"
+                log_entry(f"check failed: {task.description[:60]}")
+                display.event(f"  [{self.worker_id}] check failed")
+                await self._settle_checkpoint(task, checkpoint)
+                return
+
+            git_summary = await self._git_diff_stat(head_before, cwd, touched)
+            if self.worktrees:
+                try:
+                    await self.worktrees.finish(
+                        self.worker_id,
+                        task.id,
+                        f"ship: {summary or task.description[:60]}",
+                    )
+                except MergeConflict as e:
+                    outcome = "conflict"
+                    await self._merge_conflict(task, e, result, queue)
+                    return
+                except MergeError as e:
+                    # not the task's fault: say so loudly, no requeue
+                    await self.state.update_task(
+                        task.id,
+                        TaskStatus.FAILED,
+                        error=str(e),
+                        result=result,
+                        files=touched,
+                    )
+                    display.error(f"  [{self.worker_id}] merge failed: {e}")
+                    logging.error(f"{self.worker_id} {e}")
+                    return
+
             await self.state.update_task(
                 task.id,
                 TaskStatus.COMPLETED,
                 result=result,
                 summary=summary,
                 session_id=session_id,
+                turns=self.claude.last_usage.turns,
+                files=touched,
+                check_output="" if check else None,
             )
+            outcome = "completed"
+            if checkpoint:
+                await drop(task.id)
             if self.judge:
                 updated = Task(
                     id=task.id,
                     description=task.description,
-                    files=task.files,
+                    files=[*task.files, *touched],
                     status=TaskStatus.COMPLETED,
                     result=result,
+                    fix_of=task.fix_of,
                 )
+                if check:
+                    # a passing check settles it; the judge skips its call
+                    updated.verdict = "pass"
+                    updated.verdict_reason = f"check passed: {self.cfg.check_cmd}"
                 self.judge.notify_completed(updated)
-            git_summary = await self._git_diff_stat(head_before)
             suffix = f" ({git_summary})" if git_summary else ""
             label = summary or task.description[:60]
             log_entry(f"done: {label}{suffix}")
@@ -163,6 +280,7 @@ class Worker:
             logging.info(f"{self.worker_id} completed: {task.description}")
 
         except ClaudeError as e:
+            await self.state.add_usage("worker", self.claude.last_usage, task.id)
             error_msg = str(e) if str(e) else type(e).__name__
             summary = ""
             if e.partial:
@@ -179,41 +297,165 @@ class Worker:
                 error=error_msg,
                 result=result_text,
                 followups=followups,
+                files=self.claude.last_files,
             )
             if "timeout" in error_msg.lower():
-                display.event(
-                    f"  [{self.worker_id}] timeout after {self.cfg.task_timeout}s"
-                )
+                display.event(f"  [{self.worker_id}] timeout after {limits.timeout}s")
                 logging.warning(f"{self.worker_id} {error_msg}: {task.description}")
             else:
                 display.event(f"  [{self.worker_id}] error: {error_msg}")
                 logging.error(
                     f"{self.worker_id} failed: {task.description}: {error_msg}"
                 )
+            await self._settle_checkpoint(task, checkpoint)
 
         except Exception as e:
             error_msg = str(e) if str(e) else type(e).__name__
             await self.state.update_task(task.id, TaskStatus.FAILED, error=error_msg)
             display.event(f"  [{self.worker_id}] error: {error_msg}")
             logging.error(f"{self.worker_id} failed: {task.description}: {error_msg}")
+            await self._settle_checkpoint(task, checkpoint)
+
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
 
         finally:
+            elapsed = time.monotonic() - started
+            metrics.workers_busy.dec()
+            metrics.worker_busy.inc(elapsed, worker=self.worker_id)
+            metrics.tasks_finished.inc(outcome=outcome)
+            metrics.task_duration.observe(elapsed, outcome=outcome)
             display.clear_worker(self.worker_id)
             if self.judge:
                 self.judge.clear_worker_task(self.worker_id)
 
+    async def _settle_checkpoint(self, task: Task, checkpoint: str) -> None:
+        """after a failed attempt: undo its edits or keep them, per policy
+
+        rollback restores only the files this attempt edited, leaving
+        concurrent workers' changes alone; keep leaves the tree as is
+        with the pre-attempt state at refs/ship/checkpoints/<id>
+        """
+        if not checkpoint:
+            return
+        if self.cfg.checkpoint == "rollback":
+            undone = await rollback(checkpoint, self.claude.last_files)
+            if undone:
+                log_entry(f"rollback: {len(undone)} files of {task.id[:8]}")
+                display.event(
+                    f"  [{self.worker_id}] rolled back {len(undone)} files",
+                    min_level=2,
+                )
+            return
+        logging.info(f"{self.worker_id} attempt kept, checkpoint {ref_name(task.id)}")
+
+    async def _merge_conflict(
+        self,
+        task: Task,
+        err: MergeConflict,
+        result: str,
+        queue: TaskQueue | None,
+    ) -> None:
+        """requeue a task whose branch no longer merges; redo it on the new HEAD"""
+        assert self.worktrees is not None
+        if queue is not None and self.worktrees.conflicts[task.id] <= MERGE_REQUEUES:
+            await self.state.update_task(task.id, TaskStatus.PENDING, error=str(err))
+            # keep the retry away from whatever it collided with
+            task.files = list(dict.fromkeys([*task.files, *self.claude.last_files]))
+            await queue.put(task)
+            log_entry(f"merge conflict, requeued: {task.description[:50]}")
+            display.event(f"  [{self.worker_id}] merge conflict, requeued")
+            logging.warning(f"{self.worker_id} {err}: requeued {task.id}")
+            return
+        await self.state.update_task(
+            task.id, TaskStatus.FAILED, error=str(err), result=result
+        )
+        display.event(f"  [{self.worker_id}] merge conflict")
+        logging.warning(f"{self.worker_id} {err}: giving up on merge {task.id}")
+
+    async def _limits(self, task: Task) -> Limits:
+        """timeout and turn limit for this attempt
+
+        with cfg.adaptive, first attempts get limits learned from the
+        run's completed tasks; retries get the configured caps, since
+        the learned limits may be what cut the first attempt short
+        """
+        caps = Limits(self.cfg.task_timeout, self.cfg.max_turns)
+        if not self.cfg.adaptive or task.retries > 0:
+            return caps
+        history = await self.state.get_all_tasks()
+        limits = adaptive_limits(history, caps.timeout, caps.max_turns)
+        if limits != caps:
+            logging.info(
+                f"{self.worker_id} adaptive limits: "
+                f"{limits.timeout}s, {limits.max_turns} turns"
+            )
+        return limits
+
+    def _shared_tree(self) -> bool:
+        """other workers are editing the tree this worker's check runs in"""
+        if self.worktrees:
+            return False
+        return self.state.status_counts()[TaskStatus.RUNNING.value] > 1
+
+    def _over_budget(self) -> bool:
+        """per-run cost cap reached: stop dispatching new work"""
+        return bool(self.cfg.max_cost) and self.state.run_cost() >= self.cfg.max_cost
+
+    def _build_prompt(self, task: Task, timeout: int | None = None) -> str:
+        """shared prefix (override, spec, instructions) + task suffix
+
+        the prefix is byte-identical across workers and tasks so the
+        provider's prompt cache serves it; only the task varies
+        """
+        data = Path(self.cfg.data_dir)
+        if self.worktrees:
+            # the agent runs in a worktree: relative paths would miss
+            data = data.resolve()
+        override = (
+            f"Override instructions: {self.override_prompt}"
+            if self.override_prompt
+            else ""
+        )
+        body = WORKER.format(
+            context=(
+                f"Project: {self.project_context}\n\n" if self.project_context else ""
+            ),
+            plan_path=str(data / "PLAN.md"),
+            project_path=str(data / "PROJECT.md"),
+            spec_content=self._read_spec(),
+            log_path=str(data / "LOG.md"),
+        )
+        return (
+            PromptBuilder()
+            .prefix(override)
+            .prefix(body)
+            .suffix(
+                WORKER_TASK.format(
+                    description=task.description,
+                    timeout_min=(timeout or self.cfg.task_timeout) // 60,
+                )
+            )
+            .suffix(
+                CHECK_FAILED.format(cmd=self.cfg.check_cmd, output=task.check_output)
+                if task.check_output
+                else ""
+            )
+            .build()
+        )
+
     def _read_spec(self) -> str:
-        """read spec files into a string for the worker prompt"""
+        """spec files for the worker prompt, cached until they change"""
         if not self.spec_files:
             return "(no spec provided)"
         parts = []
         for name in self.spec_files.split(", "):
-            p = Path(name)
             try:
-                parts.append(p.read_text().strip())
+                parts.append(file_cache.read(name).strip())
             except OSError:
                 parts.append(f"(could not read {name})")
-        return "\n\n".join(parts)
+        return fit_tokens("\n\n".join(parts), SPEC_BUDGET)
 
     def _parse_output(self, text: str) -> tuple[str, list[str], str]:
         m = re.search(r"<status>(done|partial)</status>", text)
@@ -233,13 +475,14 @@ class Worker:
 
         return status, followups, summary
 
-    async def _git_head(self) -> str:
+    async def _git_head(self, cwd: Path | None = None) -> str:
         """snapshot current HEAD"""
         try:
             proc = await asyncio.create_subprocess_exec(
                 "git",
                 "rev-parse",
                 "HEAD",
+                cwd=cwd,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.DEVNULL,
             )
@@ -248,8 +491,17 @@ class Worker:
         except Exception:
             return ""
 
-    async def _git_diff_stat(self, old_head: str) -> str:
-        """compact diff stat: '5 files, +120/-30'"""
+    async def _git_diff_stat(
+        self,
+        old_head: str,
+        cwd: Path | None = None,
+        files: list[str] | None = None,
+    ) -> str:
+        """compact diff stat: '5 files, +120/-30'
+
+        limited to files when given, so edits other workers make at the
+        same time are not attributed to this task
+        """
         if not old_head:
             return ""
         try:
@@ -258,6 +510,8 @@ class Worker:
                 "diff",
                 "--shortstat",
                 old_head,
+                *(["--", *files] if files else []),
+                cwd=cwd,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.DEVNULL,
             )
@@ -265,10 +519,10 @@ class Worker:
             text = out.decode().strip()
             if not text:
                 return ""
-            files = re.search(r"(\d+) file", text)
+            nfiles = re.search(r"(\d+) file", text)
             ins = re.search(r"(\d+) insertion", text)
             dels = re.search(r"(\d+) deletion", text)
-            f = files.group(1) if files else "0"
+            f = nfiles.group(1) if nfiles else "0"
             i = ins.group(1) if ins else "0"
             d = dels.group(1) if dels else "0"
             return f"{f} files, +{i}/-{d}"
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+# conflicting merges put a task back on the queue this many times
+# before it fails into the judge's normal retry path
+MERGE_REQUEUES = 2
+
+
+def default_worktree_root(repo: Path) -> Path:
+    """$XDG_CACHE_HOME/ship/worktrees/<repo hash>
+
+    outside the repo, so `git add -A` in the main tree never sees the
+    worktrees as embedded repositories
+    """
+    base = os.getenv("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    digest = hashlib.sha256(str(repo.resolve()).encode()).hexdigest()[:12]
+    return Path(base) / "ship" / "worktrees" / f"{repo.resolve().name}-{digest}"
+
+
+def branch_name(task_id: str) -> str:
+    return f"ship/task-{task_id[:8]}"
+
+
+class MergeConflict(RuntimeError):
+    pass
+
+
+class MergeError(RuntimeError):
+    """the merge failed for a reason other than a conflict (dirty main
+    tree, untracked files in the way); redoing the task will not help"""
+
+
+class Worktrees:
+    """per-worker git worktrees on per-task branches
+
+    each worker reuses one worktree; prepare() resets it to the main
+    tree's HEAD on a fresh task branch (ignored files such as build
+    caches survive). finish() commits the task's changes and merges the
+    branch into the main tree under a lock, so merges happen one at a
+    time. a conflicting merge is aborted and raises MergeConflict; any
+    other failure raises MergeError and keeps the task branch (see
+    `unmerged`) for the user to merge by hand.
+    """
+
+    def __init__(self, repo: Path, root: Path | None = None):
+        self.repo = repo.resolve()
+        self.root = (root or default_worktree_root(self.repo)).resolve()
+        self._merge_lock = asyncio.Lock()
+        self.conflicts: dict[str, int] = {}
+        self.unmerged: set[str] = set()  # branches kept after a MergeError
+
+    async def _git(self, *args: str, cwd: Path | None = None) -> tuple[int, str]:
+        proc = await asyncio.create_subprocess_exec(
+            "git",
+            *args,
+            cwd=str(cwd or self.repo),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        out, _ = await proc.communicate()
+        return proc.returncode or 0, out.decode(errors="replace").strip()
+
+    async def _git_ok(self, *args: str, cwd: Path | None = None) -> str:
+        rc, out = await self._git(*args, cwd=cwd)
+        if rc != 0:
+            raise RuntimeError(f"git {args[0]} failed: {out}")
+        return out
+
+    async def check(self) -> str:
+        """ "" when isolation can work here, else the reason it cannot"""
+        rc, out = await self._git("rev-parse", "--show-toplevel")
+        if rc != 0:
+            return "not a git repository"
+        if Path(out).resolve() != self.repo:
+            return f"run from the repository root ({out})"
+        rc, _ = await self._git("rev-parse", "--verify", "-q", "HEAD")
+        if rc != 0:
+            return "repository has no commits"
+        return ""
+
+    def path(self, worker_id: str) -> Path:
+        return self.root / worker_id
+
+    async def prepare(self, worker_id: str, task_id: str) -> Path:
+        """worker's worktree, checked out on a fresh branch at main HEAD"""
+        path = self.path(worker_id)
+        branch = branch_name(task_id)
+        base = await self._git_ok("rev-parse", "HEAD")
+        if (path / ".git").exists():
+            old = await self._git_ok("rev-parse", "--abbrev-ref", "HEAD", cwd=path)
+            await self._git_ok("reset", "-q", "--hard", cwd=path)
+            await self._git_ok("clean", "-qfd", cwd=path)
+            await self._git_ok("checkout", "-q", "-B", branch, base, cwd=path)
+            if (
+                old != branch
+                and old.startswith("ship/task-")
+                and old not in self.unmerged
+            ):
+                # merged already, or discarded work of a failed attempt
+                await self._git("branch", "-q", "-D", old)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # a stale registration (dir deleted by hand) blocks `add`
+            await self._git("worktree", "prune")
+            await self._git_ok("worktree", "add", "-q", "-B", branch, str(path), base)
+        return path
+
+    async def finish(self, worker_id: str, task_id: str, message: str) -> bool:
+        """commit the task's changes and merge its branch into the main tree
+
+        returns False when the task changed nothing; raises MergeConflict
+        after aborting a conflicting merge, MergeError when the main tree
+        has uncommitted changes or git refuses the merge otherwise
+        """
+        path = self.path(worker_id)
+        branch = branch_name(task_id)
+        await self._git_ok("add", "-A", cwd=path)
+        rc, _ = await self._git("diff", "--cached", "--quiet", cwd=path)
+        if rc != 0:
+            await self._git_ok("commit", "-q", "--no-verify", "-m", message, cwd=path)
+
+        async with self._merge_lock:
+            count = await self._git_ok("rev-list", "--count", f"HEAD..{branch}")
+            if count == "0":
+                return False
+            dirty = await self._git_ok("status", "--porcelain", "--untracked-files=no")
+            if dirty:
+                self.unmerged.add(branch)
+                raise MergeError(
+                    f"main tree has uncommitted changes, {branch} kept unmerged:"
+                    f" {dirty[:500]}"
+                )
+            rc, out = await self._git(
+                "merge", "--no-ff", "--no-edit", "-m", f"merge {branch}", branch
+            )
+            if rc != 0:
+                conflicted = await self._git_ok(
+                    "diff", "--name-only", "--diff-filter=U"
+                )
+                rc, _ = await self._git("rev-parse", "-q", "--verify", "MERGE_HEAD")
+                if rc == 0:
+                    await self._git("merge", "--abort")
+                if not conflicted:
+                    self.unmerged.add(branch)
+                    raise MergeError(
+                        f"merge of {branch} failed, branch kept: {out[-500:]}"
+                    )
+                self.conflicts[task_id] = self.conflicts.get(task_id, 0) + 1
+                raise MergeConflict(f"merge of {branch} failed: {out[-500:]}")
+        self.conflicts.pop(task_id, None)
+        return True
+
+    async def remove_all(self) -> None:
+        """drop every worker worktree and its registration"""
+        if not self.root.exists():
+            return
+        for path in sorted(self.root.iterdir()):
+            rc, out = await self._git("worktree", "remove", "--force", str(path))
+            if rc != 0:
+                logging.warning(f"worktree remove {path.name}: {out}")
+        await self._git("worktree", "prune")
+        _, out = await self._git(
+            "branch", "--list", "--format=%(refname:short)", "ship/task-*"
+        )
+        for branch in out.split():
+            if branch in self.unmerged:
+                logging.warning(f"{branch} was not merged; kept for manual merge")
+                continue
+            await self._git("branch", "-q", "-D", branch)